@@ -4,11 +4,18 @@ import logging
 
 from core.auth.dependencies import get_current_user
 from core.services.account_deletion_service import AccountDeletionService
+from core.services.cache.known_users import get_known_users
+from core.services.cache.profile_cache import get_profile_cache
+from api.chat_controller import redis_memory
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-deletion_service = AccountDeletionService()
+deletion_service = AccountDeletionService(
+    redis_memory=redis_memory,
+    profile_cache=get_profile_cache(),
+    known_users=get_known_users()
+)
 
 
 @router.delete("/account", status_code=status.HTTP_200_OK)
@@ -1,5 +1,6 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, Path, status, Depends
 from pydantic import BaseModel, Field
+import asyncio
 import logging
 
 # Auth
@@ -13,15 +14,39 @@ from core.services.followup_service import FollowUpService
 from core.services.compliance_service import ComplianceService
 from core.services.profile_update_service import ProfileUpdateService
 from core.services.chat_history_service import ChatHistoryService
-from core.services.faiss_service import FaissService
 from core.services.memory.redis_chat_memory import RedisChatMemory
+from core.services.cache.profile_cache import get_profile_cache
+from core.services.cache.known_users import get_known_users
+from core.services.memory.conversation_summarizer import ConversationSummarizer
+from core.services.memory.semantic_memory import SemanticMemory
+from core.services.rag.hybrid_retriever import HybridRetriever
 from core.services.vector.embedding_service import EmbeddingService
+from core.services.vector.faiss_store import SESSION_ID_PATTERN
+from core.services.vector.vector_provider import get_faiss_service, get_lexical_index
 
 # Infrastructure & DB
-from infrastructure.llm.gemini_llm import GeminiLLM
+from infrastructure.llm.llm_provider import get_llm
+from infrastructure.llm.llm_scheduler import Priority
+from config.settings import (
+    DOCUMENT_DUPLICATE_SIMILARITY,
+    DOCUMENT_MMR_LAMBDA,
+    HYBRID_RRF_K,
+    HYBRID_SEARCH_CANDIDATES,
+    MEMORY_TOKEN_BUDGET,
+    MEMORY_TOP_K,
+    REDIS_MAX_CONNECTIONS,
+    REDIS_MAX_MESSAGES,
+    REDIS_RECHECK_INTERVAL,
+    REDIS_REHYDRATE_MESSAGES,
+    REDIS_SOCKET_TIMEOUT,
+    REDIS_URL,
+    SEMANTIC_MEMORY_ENABLED,
+    SUMMARY_KEEP_MESSAGES,
+    SUMMARY_TRIGGER_MESSAGES,
+)
 from db.mongodb import users_collection, chat_sessions_collection
 from db.users_repo import ensure_user_exists
-import os
+from db.user_loader import get_user_loader
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -29,42 +54,90 @@ logger = logging.getLogger(__name__)
 # ----------------------------
 # Initialize dependencies ONCE
 # ----------------------------
-llm = GeminiLLM()
+llm = get_llm(Priority.INTERACTIVE)
+
+# Batched, request-memoized reads of user documents
+user_loader = get_user_loader()
+
+chat_history_service = ChatHistoryService(chat_sessions_collection, llm=llm)
 
-# Initialize Redis memory
-redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
-redis_memory = RedisChatMemory(url=redis_url)
+# Initialize Redis memory; expired sessions are reloaded from MongoDB
+redis_memory = RedisChatMemory(
+    url=REDIS_URL,
+    max_messages=REDIS_MAX_MESSAGES,
+    max_connections=REDIS_MAX_CONNECTIONS,
+    socket_timeout=REDIS_SOCKET_TIMEOUT,
+    recheck_interval=REDIS_RECHECK_INTERVAL,
+    history_loader=chat_history_service.get_recent_messages,
+    rehydrate_messages=REDIS_REHYDRATE_MESSAGES
+)
 
-# Initialize FAISS service
-faiss_service = FaissService(base_path="faiss_store")
+# Document vectors and per-session BM25, shared with the upload endpoint
+faiss_service = get_faiss_service()
+lexical_index = get_lexical_index()
+
+# BM25 fused with vector search by rank, then diversified (MMR, duplicates
+# dropped, adjacent chunks merged)
+document_retriever = HybridRetriever(
+    faiss_service,
+    lexical_index,
+    candidates=HYBRID_SEARCH_CANDIDATES,
+    rrf_k=HYBRID_RRF_K,
+    mmr_lambda=DOCUMENT_MMR_LAMBDA,
+    duplicate_similarity=DOCUMENT_DUPLICATE_SIMILARITY
+)
 
 # Initialize embedding service
 embedding_service = EmbeddingService(llm=llm)
 
-chat_history_service = ChatHistoryService(chat_sessions_collection, llm=llm)
+# Folds long sessions into a rolling summary, off the request path
+conversation_summarizer = ConversationSummarizer(
+    llm=get_llm(Priority.BACKGROUND),
+    redis_memory=redis_memory,
+    trigger=SUMMARY_TRIGGER_MESSAGES,
+    keep_recent=SUMMARY_KEEP_MESSAGES
+)
+
+# Long-term memory across sessions; exchanges are embedded in the background
+semantic_memory = SemanticMemory(
+    embedder=EmbeddingService(llm=get_llm(Priority.BACKGROUND)),
+    vector_store=faiss_service.store,
+    token_budget=MEMORY_TOKEN_BUDGET,
+    top_k=MEMORY_TOP_K
+)
 
 chat_service = ChatService(
     llm=llm,
     emergency=EmergencyService(),
-    context_service=ContextService(users_collection),
+    context_service=ContextService(
+        users_collection, cache=get_profile_cache(), user_loader=user_loader
+    ),
     redis_memory=redis_memory,
     faiss_service=faiss_service,
     embedding_service=embedding_service,
+    retriever=document_retriever,
     followup=FollowUpService(),
     compliance=ComplianceService(),
-    chat_history=chat_history_service
+    chat_history=chat_history_service,
+    summarizer=conversation_summarizer,
+    semantic_memory=semantic_memory if SEMANTIC_MEMORY_ENABLED else None
 )
 
+# Users whose document exists; saves the per-message upsert
+known_users = get_known_users()
+
 profile_update_service = ProfileUpdateService(
-    llm=llm,
-    users_collection=users_collection
+    llm=get_llm(Priority.BACKGROUND),
+    users_collection=users_collection,
+    profile_cache=get_profile_cache(),
+    user_loader=user_loader
 )
 
 # ----------------------------
 # Request Models
 # ----------------------------
 class ChatRequest(BaseModel):
-    session_id: str | None = Field(default=None, min_length=1, max_length=100)
+    session_id: str | None = Field(default=None, min_length=1, max_length=100, pattern=SESSION_ID_PATTERN)
     symptoms: str = Field(..., min_length=1, max_length=1000)
 
 # ----------------------------
@@ -108,7 +181,9 @@ async def analyze(
 ):
     """Analyze symptoms endpoint with auto session creation."""
     try:
-        await ensure_user_exists(users_collection, firebase_uid)
+        await ensure_user_exists(
+            users_collection, firebase_uid, known_users=known_users, user_loader=user_loader
+        )
         
         # Ensure session exists or create it
         session_id, title, is_new = await ensure_session(
@@ -224,8 +299,12 @@ async def delete_all_chats(
         # 2. Redis
         await redis_memory.clear_all_for_user(firebase_uid)
 
-        # 3. FAISS indexes
-        faiss_service.delete_all_for_user(firebase_uid)
+        # 3. FAISS indexes (including long-term memory)
+        await semantic_memory.forget_user(firebase_uid)
+        # Store calls block on file locks; keep them off the event loop
+        await asyncio.to_thread(faiss_service.delete_all_for_user, firebase_uid)
+        if lexical_index is not None:
+            await asyncio.to_thread(lexical_index.forget_user, firebase_uid)
 
         return {
             "message": "All chat history deleted successfully",
@@ -258,12 +337,15 @@ async def get_chat_messages(
 
 @router.delete("/chats/{session_id}", status_code=status.HTTP_200_OK)
 async def delete_chat_session(
-    session_id: str,
+    session_id: str = Path(..., pattern=SESSION_ID_PATTERN),
     firebase_uid: str = Depends(get_current_user)
 ):
     await chat_history_service.delete(firebase_uid, session_id)
     await redis_memory.clear(firebase_uid, session_id)
-    faiss_service.delete(firebase_uid, session_id)
+    await asyncio.to_thread(faiss_service.delete, firebase_uid, session_id)
+    if lexical_index is not None:
+        await asyncio.to_thread(lexical_index.forget, firebase_uid, session_id)
+    await semantic_memory.forget_session(firebase_uid, session_id)
 
     return {
         "message": "Chat session deleted",
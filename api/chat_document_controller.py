@@ -1,18 +1,23 @@
 from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
 from core.auth.dependencies import get_current_user
 from core.services.ocr_service import OCRService
-from core.services.vector.faiss_store import FaissVectorStore
 from core.services.vector.embedding_service import EmbeddingService
 from core.services.documents.chat_document_service import ChatDocumentService
-from infrastructure.llm.gemini_llm import GeminiLLM
+from infrastructure.llm.llm_provider import get_llm
+from infrastructure.llm.llm_scheduler import Priority
+from core.services.vector.faiss_store import SESSION_ID_PATTERN
+from core.services.vector.vector_provider import get_faiss_service, get_lexical_index
 import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Document ingestion competes with report analysis, not with live chat
+embedder = EmbeddingService(llm=get_llm(Priority.REPORT))
+
 @router.post("/chat/upload-document", status_code=200)
 async def upload_doc(
-    session_id: str = Form(...),
+    session_id: str = Form(..., pattern=SESSION_ID_PATTERN),
     file: UploadFile = File(...),
     user_id: str = Depends(get_current_user)
 ):
@@ -33,21 +38,10 @@ async def upload_doc(
         if not text:
             raise HTTPException(status_code=400, detail="No text extracted from document")
 
-        # Initialize LLM and embedder
-        llm = GeminiLLM()
-        embedder = EmbeddingService(llm=llm)
-
-        # Get embedding dimension from sample embedding
-        sample_text = text[:500] if text else " "
-        sample_vec = await embedder.embed(sample_text)
-        dim = len(sample_vec) if sample_vec else 768
-
-        # Create vector store per user/session
-        index_path = f"faiss_store/{user_id}_{session_id}_docs.index"
-        vector_store = FaissVectorStore(dim=dim, index_path=index_path)
-
-        # Ingest document text into vector store with metadata
-        chat_doc_service = ChatDocumentService(vector_store=vector_store, embedder=embedder)
+        # Ingest document text into the session's partition of the shared store
+        chat_doc_service = ChatDocumentService(
+            vector_store=get_faiss_service(), embedder=embedder, lexical_index=get_lexical_index()
+        )
         document_id = await chat_doc_service.ingest_document(
             user_id=user_id, 
             chat_session_id=session_id, 
@@ -2,7 +2,8 @@ from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import StreamingResponse
 from core.auth.dependencies import get_current_user
 from core.services.doctor_pdf_service import DoctorSummaryPDFService
-from db.mongodb import users_collection, medical_reports_collection
+from db.mongodb import medical_reports_collection
+from db.user_loader import get_user_loader
 
 router = APIRouter()
 pdf_service = DoctorSummaryPDFService()
@@ -11,7 +12,7 @@ pdf_service = DoctorSummaryPDFService()
 async def export_doctor_summary(
     firebase_uid: str = Depends(get_current_user)
 ):
-    user = await users_collection.find_one({"firebase_uid": firebase_uid})
+    user = await get_user_loader().load(firebase_uid)
     if not user:
         raise HTTPException(404, "User not found")
 
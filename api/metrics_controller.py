@@ -0,0 +1,18 @@
+from fastapi import APIRouter, HTTPException, Response
+
+from core.observability.loop_monitor import loop_monitor
+from core.observability.metrics import render_latest
+
+router = APIRouter()
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
+
+@router.get("/debug/event-loop", include_in_schema=False)
+async def event_loop_report():
+    """Blocking call sites caught by the loop watchdog (LOOP_MONITOR_DEBUG only)."""
+    if not loop_monitor.debug:
+        raise HTTPException(404, "Not Found")
+    return loop_monitor.report()
@@ -10,9 +10,12 @@ from core.auth.dependencies import get_current_user
 from core.services.ocr_service import OCRService
 from core.services.report_analysis_service import ReportAnalysisService
 from core.services.profile_update_service import ProfileUpdateService
+from core.services.cache.profile_cache import get_profile_cache
+from db.user_loader import get_user_loader
 
 # Infrastructure
-from infrastructure.llm.gemini_llm import GeminiLLM
+from infrastructure.llm.llm_provider import get_llm
+from infrastructure.llm.llm_scheduler import Priority
 
 # DB
 from db.mongodb import medical_reports_collection, users_collection
@@ -24,11 +27,15 @@ logger = logging.getLogger(__name__)
 # ----------------------------
 # Initialize dependencies
 # ----------------------------
-llm = GeminiLLM()
 ocr_service = OCRService()
-analysis_service = ReportAnalysisService(llm)
+analysis_service = ReportAnalysisService(get_llm(Priority.REPORT))
 reports_repo = MedicalReportRepository(medical_reports_collection)
-profile_update_service = ProfileUpdateService(llm, users_collection)
+profile_update_service = ProfileUpdateService(
+    get_llm(Priority.BACKGROUND),
+    users_collection,
+    profile_cache=get_profile_cache(),
+    user_loader=get_user_loader()
+)
 
 # ----------------------------
 # API Endpoint
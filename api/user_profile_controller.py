@@ -5,12 +5,15 @@ from core.auth.dependencies import get_current_user
 from db.mongodb import users_collection
 from db.user_details import SavePersonalDetailsRequest
 from core.services.profile_photo_service import ProfilePhotoService
+from core.services.cache.profile_cache import get_profile_cache
 
 router = APIRouter(prefix="/user", tags=["User Profile"])
 
 # Initialize profile photo service
 photo_service = ProfilePhotoService()
 
+profile_cache = get_profile_cache()
+
 @router.post("/profile")
 async def save_profile(
     req: SavePersonalDetailsRequest,
@@ -31,6 +34,7 @@ async def save_profile(
             },
             upsert=True
         )
+        await profile_cache.bump(firebase_uid)
         return {"message": "Profile saved successfully"}
 
     except Exception:
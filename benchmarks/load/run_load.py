@@ -0,0 +1,305 @@
+"""
+Hermetic end-to-end load test for the MediBot API.
+
+Boots the FastAPI app in-process against local stand-ins (fake LLM,
+in-memory MongoDB, fakeredis, bypassed auth) and drives a weighted mix of
+/analyze-symptoms, /chat/upload-document, /analyze-report and /chats.
+Reports throughput and p50/p95/p99 latency per endpoint and saves the
+results as JSON for comparison between runs.
+
+Usage:
+    pip install -r benchmarks/requirements.txt
+    python benchmarks/load/run_load.py --users 20 --duration 30 --output load.json
+    python benchmarks/load/run_load.py --compare load.json   # diff against a saved run
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from stand_ins import FakeLLM, install_stand_ins, wire_app  # noqa: E402
+
+SYMPTOMS = [
+    "I have had a headache and mild fever for two days",
+    "What can I take for a sore throat?",
+    "My blood pressure reading was 145/95 this morning, should I worry?",
+    "Tell me more about that",
+    "I feel tired all the time and sleep badly",
+    "Is ibuprofen safe with my current medication?",
+    "My HbA1c came back at 6.1%, what does that mean?",
+    "What should I do now?",
+]
+
+REPORT_LINES = [
+    "COMPLETE BLOOD COUNT",
+    "Hemoglobin: 13.5 g/dL (13.0 - 17.0)",
+    "WBC: 11.2 x10^3/uL (4.0 - 10.0) HIGH",
+    "Platelets: 250 x10^3/uL (150 - 400)",
+    "LIPID PANEL",
+    "LDL-C: 162 mg/dL (< 100) HIGH",
+    "HDL-C: 45 mg/dL (> 40)",
+    "Triglycerides: 180 mg/dL (< 150) HIGH",
+    "HbA1c: 6.1 % (< 5.7) PREDIABETES RANGE",
+    "TSH: 2.1 mIU/L (0.4 - 4.0)",
+]
+
+DEFAULT_MIX = {
+    "analyze_symptoms": 60,
+    "upload_document": 10,
+    "analyze_report": 10,
+    "list_chats": 20,
+}
+
+
+def build_report_pdf(pages: int) -> bytes:
+    """A text PDF that looks like a lab report, `pages` pages long."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    for page in range(pages):
+        y = 800
+        c.drawString(40, y, f"LABORATORY REPORT - page {page + 1}")
+        for _ in range(4):
+            for line in REPORT_LINES:
+                y -= 16
+                c.drawString(40, y, line)
+        c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+class VirtualUser:
+    def __init__(self, index: int):
+        self.uid = f"bench-user-{index:04d}"
+        self.session_id = str(uuid.uuid4())
+        self.headers = {"X-Bench-User": self.uid}
+
+
+async def _call(client, op: str, user: VirtualUser, pdf: bytes):
+    if op == "analyze_symptoms":
+        return await client.post(
+            "/analyze-symptoms",
+            json={"session_id": user.session_id, "symptoms": random.choice(SYMPTOMS)},
+            headers=user.headers,
+        )
+    if op == "upload_document":
+        return await client.post(
+            "/chat/upload-document",
+            data={"session_id": user.session_id},
+            files={"file": ("report.pdf", pdf, "application/pdf")},
+            headers=user.headers,
+        )
+    if op == "analyze_report":
+        return await client.post(
+            "/analyze-report",
+            data={"consent": "false"},
+            files={"file": ("report.pdf", pdf, "application/pdf")},
+            headers=user.headers,
+        )
+    if op == "list_chats":
+        return await client.get("/chats", headers=user.headers)
+    raise ValueError(f"Unknown operation {op}")
+
+
+async def _user_loop(client, user, mix, pdf, deadline, samples, think_time):
+    ops, weights = zip(*mix.items())
+    while time.perf_counter() < deadline:
+        op = random.choices(ops, weights)[0]
+        start = time.perf_counter()
+        try:
+            response = await _call(client, op, user, pdf)
+            ok = response.status_code < 400
+        except Exception:
+            ok = False
+        samples.append((op, time.perf_counter() - start, ok))
+        if think_time:
+            await asyncio.sleep(random.uniform(0, think_time))
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def summarize(samples, elapsed: float) -> dict:
+    def stats(values, errors):
+        values = sorted(values)
+        return {
+            "requests": len(values),
+            "errors": errors,
+            "throughput_rps": round(len(values) / elapsed, 2),
+            "mean_ms": round(statistics.fmean(values) * 1000, 2) if values else 0.0,
+            "p50_ms": round(_percentile(values, 50) * 1000, 2),
+            "p95_ms": round(_percentile(values, 95) * 1000, 2),
+            "p99_ms": round(_percentile(values, 99) * 1000, 2),
+        }
+
+    per_op = {}
+    for op in sorted({s[0] for s in samples}):
+        op_samples = [s for s in samples if s[0] == op]
+        per_op[op] = stats([s[1] for s in op_samples], sum(1 for s in op_samples if not s[2]))
+    return {
+        "overall": stats([s[1] for s in samples], sum(1 for s in samples if not s[2])),
+        "endpoints": per_op,
+    }
+
+
+async def run(args) -> dict:
+    llm = FakeLLM(
+        latency=args.llm_latency,
+        tokens_per_second=args.llm_token_rate,
+        embed_latency=args.embed_latency,
+        blocking=args.blocking_llm,
+        quota_error_rate=args.llm_429_rate,
+    )
+    install_stand_ins(llm, args.workdir or tempfile.mkdtemp(prefix="medibot-load-"))
+
+    import httpx
+    import main
+    from core.observability.loop_monitor import loop_monitor
+    from core.observability.metrics import CACHE_REQUESTS, LOADER_BATCH_SIZE, SINGLE_FLIGHT
+
+    wire_app(main.app, args.redis_url)
+
+    mix = dict(DEFAULT_MIX)
+    for item in args.mix or []:
+        op, weight = item.split("=")
+        mix[op] = int(weight)
+    mix = {op: w for op, w in mix.items() if w > 0}
+
+    pdf = build_report_pdf(args.pdf_pages)
+    users = [VirtualUser(i) for i in range(args.users)]
+    samples: list[tuple[str, float, bool]] = []
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.lifespan(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://medibot.bench", timeout=120) as client:
+            # Warm-up: create every user's session before timing starts
+            await asyncio.gather(*(_call(client, "analyze_symptoms", u, pdf) for u in users))
+
+            start = time.perf_counter()
+            deadline = start + args.duration
+            await asyncio.gather(*(
+                _user_loop(client, u, mix, pdf, deadline, samples, args.think_time)
+                for u in users
+            ))
+            elapsed = time.perf_counter() - start
+        loop_report = loop_monitor.report()
+
+    single_flight = {}
+    for metric in SINGLE_FLIGHT.collect():
+        for sample in metric.samples:
+            if sample.name.endswith("_total") and sample.value:
+                single_flight[f"{sample.labels['operation']}.{sample.labels['result']}"] = int(sample.value)
+
+    user_loader = {}
+    for metric in CACHE_REQUESTS.collect():
+        for sample in metric.samples:
+            if sample.name.endswith("_total") and sample.labels["cache"] == "user_loader":
+                user_loader[f"memo_{sample.labels['result']}"] = int(sample.value)
+    for metric in LOADER_BATCH_SIZE.collect():
+        for sample in metric.samples:
+            if sample.labels.get("loader") != "users":
+                continue
+            if sample.name.endswith("_count"):
+                user_loader["batches"] = int(sample.value)
+            elif sample.name.endswith("_sum"):
+                user_loader["users_fetched"] = int(sample.value)
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "config": {
+            "users": args.users,
+            "duration_s": args.duration,
+            "mix": mix,
+            "think_time_s": args.think_time,
+            "llm_latency_s": args.llm_latency,
+            "llm_token_rate": args.llm_token_rate,
+            "embed_latency_s": args.embed_latency,
+            "blocking_llm": args.blocking_llm,
+            "llm_429_rate": args.llm_429_rate,
+            "pdf_pages": args.pdf_pages,
+            "redis": args.redis_url or "fakeredis",
+        },
+        "elapsed_s": round(elapsed, 3),
+        "llm_calls": llm.calls,
+        "single_flight": single_flight,
+        "user_loader": user_loader,
+        "event_loop": {"max_lag_ms": loop_report["max_lag_ms"]},
+        **summarize(samples, elapsed),
+    }
+
+
+def print_report(result: dict, baseline: dict | None = None):
+    header = f"{'endpoint':<18}{'reqs':>7}{'err':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header)
+    print("-" * len(header))
+    rows = list(result["endpoints"].items()) + [("overall", result["overall"])]
+    for name, s in rows:
+        line = (
+            f"{name:<18}{s['requests']:>7}{s['errors']:>6}{s['throughput_rps']:>9.1f}"
+            f"{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}"
+        )
+        base = (baseline or {}).get("endpoints", {}).get(name) if name != "overall" else (baseline or {}).get("overall")
+        if base and base.get("p95_ms"):
+            line += f"   p95 {100 * (s['p95_ms'] - base['p95_ms']) / base['p95_ms']:+.1f}%"
+        print(line)
+    print(f"max event-loop lag: {result['event_loop']['max_lag_ms']} ms")
+    if result.get("single_flight"):
+        print("single-flight: " + ", ".join(f"{k}={v}" for k, v in sorted(result["single_flight"].items())))
+    if result.get("user_loader"):
+        print("user loader: " + ", ".join(f"{k}={v}" for k, v in sorted(result["user_loader"].items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of measured load")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Max random pause between requests")
+    parser.add_argument("--mix", nargs="*", help="Override weights, e.g. analyze_symptoms=80 list_chats=0")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Fake LLM base latency (s)")
+    parser.add_argument("--llm-token-rate", type=float, default=200.0, help="Fake LLM output tokens/s")
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="Fake embedding latency (s)")
+    parser.add_argument("--blocking-llm", action="store_true", help="Fake LLM blocks the event loop like the sync SDK")
+    parser.add_argument("--llm-429-rate", type=float, default=0.0, help="Fraction of LLM calls that fail with 429")
+    parser.add_argument("--pdf-pages", type=int, default=2)
+    parser.add_argument("--redis-url", help="Use a local Redis instead of fakeredis")
+    parser.add_argument("--workdir", help="Directory for FAISS indexes (default: temp dir)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Write results JSON to this path")
+    parser.add_argument("--compare", help="Baseline results JSON to compare against")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+    output = Path(args.output).resolve() if args.output else None
+
+    result = asyncio.run(run(args))
+    print_report(result, baseline)
+
+    if output:
+        output.write_text(json.dumps(result, indent=2))
+        print(f"results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
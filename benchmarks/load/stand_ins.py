@@ -0,0 +1,179 @@
+"""
+Local stand-ins for the external services MediBot talks to.
+
+- FakeLLM: generate/stream/embed with configurable latency and token rate
+- In-memory MongoDB (mongomock-motor) patched into db.mongodb
+- fakeredis (or a real local Redis via --redis-url) for chat memory
+- Auth dependency bypassed; the user id comes from the X-Bench-User header
+
+`install_stand_ins()` must run BEFORE `main` is imported: controllers bind
+collections and construct their LLM clients at import time.
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+class FakeLLM:
+    """
+    Drop-in for GeminiLLM. Latency = base latency + output tokens / token rate.
+    With `blocking=True` the wait is a time.sleep on the event loop, which is
+    how the synchronous Gemini SDK calls inside `async def` used to behave.
+    `quota_error_rate` makes that fraction of calls fail with a 429.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.3,
+        tokens_per_second: float = 200.0,
+        output_tokens: int = 150,
+        embed_latency: float = 0.05,
+        dim: int = 768,
+        blocking: bool = False,
+        quota_error_rate: float = 0.0
+    ):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.output_tokens = output_tokens
+        self.embed_latency = embed_latency
+        self.dim = dim
+        self.blocking = blocking
+        self.quota_error_rate = quota_error_rate
+        self.calls = {"generate": 0, "stream": 0, "embed": 0, "quota_errors": 0}
+
+    async def _wait(self, seconds: float):
+        if self.blocking:
+            time.sleep(seconds)
+        else:
+            await asyncio.sleep(seconds)
+
+    def _quota_exceeded(self, raise_quota_errors: bool) -> bool:
+        """Simulate a 429 the way GeminiLLM reports it."""
+        if random.random() >= self.quota_error_rate:
+            return False
+        self.calls["quota_errors"] += 1
+        if raise_quota_errors:
+            from infrastructure.llm.gemini_llm import QuotaExceededError
+            raise QuotaExceededError("429 RESOURCE_EXHAUSTED (simulated)")
+        return True
+
+    def _text(self, tokens: int) -> str:
+        words = ("rest", "hydration", "monitor", "symptoms", "consult", "doctor", "fever", "sleep")
+        return " ".join(random.choice(words) for _ in range(tokens))
+
+    def _response_for(self, prompt: str) -> str:
+        if "title" in prompt[:200].lower():
+            return "Headache and fever follow-up"
+        if '"key_findings"' in prompt:
+            return json.dumps({
+                "summary": self._text(40),
+                "key_findings": {"hemoglobin": "13.5 g/dL"},
+                "what_is_normal": ["hemoglobin"],
+                "what_needs_attention": [],
+                "disclaimer": "This is not a medical diagnosis."
+            })
+        if "SUMMARY SO FAR" in prompt:
+            return json.dumps({"summary": self._text(60)})
+        if '"medical_summary"' in prompt:
+            return json.dumps({
+                "age": 34, "gender": None, "allergies": [], "chronic_conditions": [],
+                "active_medications": [], "medical_summary": self._text(30)
+            })
+        return self._text(self.output_tokens)
+
+    async def generate(self, prompt: str, raise_quota_errors: bool = False, **kwargs) -> str:
+        self.calls["generate"] += 1
+        if self._quota_exceeded(raise_quota_errors):
+            from infrastructure.llm.gemini_llm import QUOTA_EXCEEDED_RESPONSE
+            return QUOTA_EXCEEDED_RESPONSE
+        text = self._response_for(prompt)
+        await self._wait(self.latency + len(text.split()) / self.tokens_per_second)
+        return text
+
+    async def stream(self, prompt: str, raise_quota_errors: bool = False, **kwargs):
+        self.calls["stream"] += 1
+        if self._quota_exceeded(raise_quota_errors):
+            yield "Error generating response: 429 RESOURCE_EXHAUSTED (simulated)"
+            return
+        await self._wait(self.latency)
+        words = self._response_for(prompt).split()
+        for i in range(0, len(words), 8):
+            chunk = words[i:i + 8]
+            await self._wait(len(chunk) / self.tokens_per_second)
+            yield " ".join(chunk) + " "
+
+    async def embed(self, text: str, raise_quota_errors: bool = False, **kwargs) -> list[float]:
+        self.calls["embed"] += 1
+        if self._quota_exceeded(raise_quota_errors):
+            return []
+        await self._wait(self.embed_latency)
+        # Deterministic pseudo-embedding so identical text maps to one vector
+        rng = random.Random(hashlib.sha256(text.encode()).digest())
+        vec = [rng.gauss(0, 1) for _ in range(self.dim)]
+        norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+        return [v / norm for v in vec]
+
+
+def install_stand_ins(llm: FakeLLM, workdir: str):
+    """Patch settings, MongoDB and the LLM factory. Call before importing main."""
+    os.environ.setdefault("GEMINI_API_KEY", "load-test")
+    os.environ.setdefault("MODEL_NAME", "gemini-2.5-flash")
+    os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+
+    # FAISS indexes and uploads are written relative to the working directory
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+
+    from mongomock_motor import AsyncMongoMockClient
+    import db.mongodb as mongodb
+
+    mongodb.client = AsyncMongoMockClient()
+    mongodb.db = mongodb.client.medibot_db
+    mongodb.medical_reports_collection = mongodb.db.medical_reports
+    mongodb.users_collection = mongodb.db.users
+    mongodb.chat_sessions_collection = mongodb.db.chat_sessions
+    mongodb.faiss_indexes_collection = mongodb.db.faiss_indexes
+
+    import infrastructure.llm.gemini_llm as gemini_llm
+
+    gemini_llm.GeminiLLM = lambda *args, **kwargs: llm
+
+
+def wire_app(app, redis_url: str | None = None):
+    """Bypass auth and point chat memory, caches and single-flight at fakeredis (or a local Redis)."""
+    from fastapi import Header
+
+    from api import chat_controller
+    from core.auth.dependencies import get_current_user
+    from core.services.cache.known_users import get_known_users
+    from core.services.cache.profile_cache import get_profile_cache
+    from infrastructure.llm.llm_provider import get_single_flight
+
+    def bench_user(x_bench_user: str = Header("bench-user")) -> str:
+        return x_bench_user
+
+    app.dependency_overrides[get_current_user] = bench_user
+
+    if redis_url:
+        import redis.asyncio as redis
+        client = redis.from_url(redis_url, decode_responses=True)
+    else:
+        import fakeredis
+
+        client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    chat_controller.redis_memory.client = client
+    chat_controller.redis_memory._single_flight.redis = client
+    get_single_flight().redis = client
+    get_profile_cache().redis = client
+    get_known_users().redis = client
@@ -0,0 +1,355 @@
+"""
+Microbenchmarks for the CPU hot paths that run on every request or upload.
+
+Each case is timed with the GC disabled, auto-calibrated so a repeat takes
+at least --min-time seconds, and reported as the best and median time per
+operation over --repeats repeats. Memory is measured separately with
+tracemalloc: the peak bytes allocated during one operation and the number
+of memory blocks it leaves behind.
+
+Usage:
+    python benchmarks/micro_bench.py --output micro.json
+    python benchmarks/micro_bench.py --compare micro.json --threshold 15
+    python benchmarks/micro_bench.py --only faiss_search
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# Settings refuse to load without these; nothing here talks to the network
+os.environ.setdefault("GEMINI_API_KEY", "micro-bench")
+os.environ.setdefault("MODEL_NAME", "gemini-2.5-flash")
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+
+HISTORY = "\n".join(
+    f"User: I have had a headache for {i} days, it gets worse in the evening.\n"
+    f"Assistant: Headaches that worsen in the evening can be related to eye strain, "
+    f"dehydration or stress. How much water do you drink per day?"
+    for i in range(5)
+)
+
+PROFILE = {
+    "age": 42,
+    "gender": "female",
+    "allergies": ["penicillin", "peanuts"],
+    "chronic_conditions": ["hypertension", "asthma"],
+    "active_medications": ["amlodipine", "salbutamol inhaler"],
+    "medical_summary": "42-year-old with controlled hypertension and mild asthma.",
+    "reports_summary": [
+        {
+            "text": f"Lipid panel {i}: LDL-C mildly elevated, HbA1c in normal range.",
+            "source": "medical_report",
+            "added_at": datetime(2024, 1, 1) + timedelta(days=i),
+        }
+        for i in range(50)
+    ],
+}
+
+REPORT_ANALYSIS = {
+    "summary": "Mostly normal blood work with mildly elevated LDL cholesterol.",
+    "key_findings": {f"marker_{i}": f"{i * 1.5:.1f} mg/dL (ref 0 - 100)" for i in range(30)},
+}
+
+DOCUMENT_TEXT = (
+    "Hemoglobin 13.5 g/dL. LDL-C 162 mg/dL (high). HbA1c 6.1 %. "
+    "Patient reports intermittent headaches and fatigue. "
+) * 500  # ~50 KB, a long multi-page report
+
+MESSAGES = [
+    "Hi",
+    "I have had a mild headache since yesterday evening and some nausea",
+    "What if I have a heart attack? I read about it online",
+    "I'm having severe chest pain and can't breathe",
+    "My fever won't go away after three days and I feel very dizzy " * 10,
+]
+
+
+# ----------------------------------
+# Cases: each returns a zero-argument callable (one operation)
+# ----------------------------------
+def case_unified_prompt():
+    from prompts.medical_prompt import build_unified_chat_prompt
+
+    def op():
+        build_unified_chat_prompt(
+            user_message="What should I do about the headache now?",
+            conversation_history=HISTORY,
+            user_profile="Age: 42\nAllergies: penicillin, peanuts",
+            document_context=DOCUMENT_TEXT[:2500],
+        )
+    return op
+
+
+def case_unified_turn():
+    from prompts.medical_prompt import build_unified_chat_turn
+
+    def op():
+        build_unified_chat_turn(
+            user_message="What should I do about the headache now?",
+            conversation_history=HISTORY,
+            user_profile="Age: 42\nAllergies: penicillin, peanuts",
+            document_context=DOCUMENT_TEXT[:2500],
+        )
+    return op
+
+
+def case_assess_urgency():
+    from core.services.emergency_service import EmergencyService
+
+    service = EmergencyService()
+
+    def op():
+        for message in MESSAGES:
+            service.assess_urgency(message)
+    return op
+
+
+def case_chunk_document():
+    from core.services.documents.chat_document_service import ChatDocumentService
+
+    service = ChatDocumentService(vector_store=None, embedder=None)
+    return lambda: service._chunk(DOCUMENT_TEXT)
+
+
+def case_convert_datetime():
+    from prompts.profile_update_prompt import _convert_datetime_to_str
+
+    return lambda: _convert_datetime_to_str(PROFILE)
+
+
+def case_doctor_pdf():
+    from core.services.doctor_pdf_service import DoctorSummaryPDFService
+
+    service = DoctorSummaryPDFService()
+    return lambda: service.generate_pdf(profile=PROFILE, report_analysis=REPORT_ANALYSIS)
+
+
+def make_faiss_case(corpus_size: int, dim: int = 768):
+    def case():
+        import numpy as np
+        from core.services.faiss_service import FaissService
+
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((corpus_size, dim)).astype("float32")
+        metadata = [
+            {
+                "user_id": "bench-user",
+                "chat_session_id": "bench-session",
+                "document_id": f"doc-{i // 50}",
+                "chunk_id": i,
+                "text": f"chunk {i}",
+            }
+            for i in range(corpus_size)
+        ]
+        workdir = tempfile.mkdtemp(prefix="medibot-micro-")
+        store = FaissService(base_path=workdir)
+        store.add_documents("bench-user", "bench-session", vectors.tolist(), metadata)
+        query = rng.standard_normal(dim).astype("float32").tolist()
+        return lambda: store.search("bench-user", "bench-session", query, k=5)
+    return case
+
+
+def make_faiss_add_case(corpus_size: int, batch: int = 50, dim: int = 768):
+    """One more upload (`batch` chunks) into a session that already holds `corpus_size`."""
+    def case():
+        import numpy as np
+        from core.services.faiss_service import FaissService
+
+        rng = np.random.default_rng(0)
+        metadata = [{"document_id": "doc", "chunk_id": i, "text": f"chunk {i}"} for i in range(corpus_size)]
+        store = FaissService(base_path=tempfile.mkdtemp(prefix="medibot-micro-"))
+        store.add_documents("bench-user", "bench-session", rng.standard_normal((corpus_size, dim)).tolist(), metadata)
+        vectors = rng.standard_normal((batch, dim)).astype("float32").tolist()
+        return lambda: store.add_documents("bench-user", "bench-session", vectors, metadata[:batch])
+    return case
+
+
+def make_faiss_cold_case(corpus_size: int, mmap: bool, dim: int = 768):
+    """First search of a worker that has not loaded the partition yet."""
+    def case():
+        import numpy as np
+        from core.services.vector.faiss_store import FaissVectorStore
+
+        rng = np.random.default_rng(0)
+        workdir = tempfile.mkdtemp(prefix="medibot-micro-")
+        metadata = [{"document_id": "doc", "chunk_id": i, "text": f"chunk {i}"} for i in range(corpus_size)]
+        FaissVectorStore(workdir).add("bench-user", "bench-session", rng.standard_normal((corpus_size, dim)).tolist(), metadata)
+        query = rng.standard_normal(dim).astype("float32").tolist()
+        threshold = 0 if mmap else 2**62
+
+        def op():
+            store = FaissVectorStore(workdir, mmap_min_bytes=threshold)
+            store.search("bench-user", "bench-session", query, k=5)
+        return op
+    return case
+
+
+def make_metadata_case(corpus_size: int, columnar: bool):
+    """Open a partition's metadata cold and fetch the 5 chunks of one search hit."""
+    def case():
+        import pickle
+        from core.services.vector.chunk_metadata import ChunkMetadata
+
+        chunks = {
+            i: {
+                "user_id": "bench-user",
+                "chat_session_id": "bench-session",
+                "document_id": f"doc-{i // 50}",
+                "chunk_id": i % 50,
+                "text": DOCUMENT_TEXT[:1000],
+            }
+            for i in range(corpus_size)
+        }
+        path = os.path.join(tempfile.mkdtemp(prefix="medibot-micro-"), "bench_docs.index")
+        hits = [7, corpus_size // 3, corpus_size // 2, corpus_size - 9, corpus_size - 1]
+        if columnar:
+            ChunkMetadata(path).append(sorted(chunks.items()))
+
+            def op():
+                metadata = ChunkMetadata.open(path)
+                metadata.get_many(hits)
+                metadata.close()
+            return op
+
+        with open(path + ".meta", "wb") as f:
+            pickle.dump({"next_id": corpus_size, "chunks": chunks}, f)
+
+        def op():
+            with open(path + ".meta", "rb") as f:
+                stored = pickle.load(f)
+            [stored["chunks"][i] for i in hits]
+        return op
+    return case
+
+
+CASES = {
+    "build_unified_chat_prompt": case_unified_prompt,
+    "build_unified_chat_turn": case_unified_turn,
+    "assess_urgency": case_assess_urgency,
+    "chunk_document": case_chunk_document,
+    "convert_datetime_to_str": case_convert_datetime,
+    "doctor_pdf": case_doctor_pdf,
+    "faiss_search_1k": make_faiss_case(1_000),
+    "faiss_search_10k": make_faiss_case(10_000),
+    "faiss_search_50k": make_faiss_case(50_000),
+    "faiss_add_50_to_10k": make_faiss_add_case(10_000),
+    "faiss_cold_search_20k_read": make_faiss_cold_case(20_000, mmap=False),
+    "faiss_cold_search_20k_mmap": make_faiss_cold_case(20_000, mmap=True),
+    "metadata_load_pickle_10k": make_metadata_case(10_000, columnar=False),
+    "metadata_load_columnar_10k": make_metadata_case(10_000, columnar=True),
+}
+
+
+# ----------------------------------
+# Runner
+# ----------------------------------
+def _calibrate(op, min_time: float) -> int:
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            op()
+        if time.perf_counter() - start >= min_time or loops >= 1_000_000:
+            return loops
+        loops *= 2
+
+
+def measure(op, repeats: int, min_time: float) -> dict:
+    op()  # warm-up (imports, caches)
+    loops = _calibrate(op, min_time)
+
+    per_op = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            for _ in range(loops):
+                op()
+            per_op.append((time.perf_counter() - start) / loops)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    op()
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    retained_blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+
+    return {
+        "loops": loops,
+        "best_us": round(min(per_op) * 1e6, 3),
+        "median_us": round(statistics.median(per_op) * 1e6, 3),
+        "stdev_pct": round(100 * statistics.pstdev(per_op) / statistics.fmean(per_op), 2),
+        "peak_bytes": peak,
+        "retained_blocks": retained_blocks,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=7)
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per repeat")
+    parser.add_argument("--only", nargs="*", help="Run only cases whose name contains one of these")
+    parser.add_argument("--output", help="Write results JSON to this path")
+    parser.add_argument("--compare", help="Baseline results JSON")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in %% (best time)")
+    args = parser.parse_args()
+
+    baseline = json.loads(Path(args.compare).read_text())["cases"] if args.compare else {}
+    selected = {
+        name: factory for name, factory in CASES.items()
+        if not args.only or any(part in name for part in args.only)
+    }
+
+    results = {}
+    regressions = []
+    print(f"{'case':<28}{'best':>12}{'median':>12}{'±%':>7}{'peak KiB':>10}{'blocks':>8}")
+    for name, factory in selected.items():
+        r = measure(factory(), args.repeats, args.min_time)
+        results[name] = r
+        line = (
+            f"{name:<28}{r['best_us']:>10.1f}us{r['median_us']:>10.1f}us{r['stdev_pct']:>7.1f}"
+            f"{r['peak_bytes'] / 1024:>10.1f}{r['retained_blocks']:>8}"
+        )
+        if name in baseline:
+            change = 100 * (r["best_us"] - baseline[name]["best_us"]) / baseline[name]["best_us"]
+            line += f"  {change:+.1f}%"
+            if change > args.threshold:
+                regressions.append(name)
+                line += "  REGRESSION"
+        print(line)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cases": results,
+        }, indent=2))
+
+    if regressions:
+        print(f"regressions over {args.threshold}%: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Retrieval quality of document chat: dense vs BM25 vs hybrid (RRF), and
+hybrid with the post-retrieval stage (MMR, duplicate removal, adjacent spans).
+
+Ingests the labeled documents of benchmarks/data/retrieval_eval.json into one
+session through ChatDocumentService (the upload path), then runs every query
+through HybridRetriever with the dense side only, the lexical side only, and
+both fused. A query is a hit when one of the top-k chunks contains its
+`expect` string. Reports recall@k, MRR and the estimated prompt tokens of
+the returned chunks. `--duplicate-uploads` ingests every document twice, as
+when a user uploads the same report again.
+
+Embedders:
+- `hashed` (default, offline): normalized hashed character trigrams. A rough
+  stand-in that needs no API key; it is not a semantic model.
+- `gemini`: the app's EmbeddingService (needs GEMINI_API_KEY).
+
+Usage:
+    python benchmarks/retrieval_eval.py
+    python benchmarks/retrieval_eval.py --duplicate-uploads
+    python benchmarks/retrieval_eval.py --embedder gemini --k 5 --output retrieval.json
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+os.environ.setdefault("GEMINI_API_KEY", "retrieval-eval")
+os.environ.setdefault("MODEL_NAME", "gemini-2.5-flash")
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+
+DATASET = ROOT / "benchmarks" / "data" / "retrieval_eval.json"
+
+
+class HashedTrigramEmbedder:
+    def __init__(self, dim: int = 768):
+        self.dim = dim
+
+    async def embed(self, text: str) -> list[float]:
+        vec = [0.0] * self.dim
+        text = f"  {text.lower()}  "
+        for i in range(len(text) - 2):
+            digest = hashlib.blake2b(text[i:i + 3].encode(), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            vec[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+        return [v / norm for v in vec]
+
+
+def make_embedder(name: str):
+    if name == "hashed":
+        return HashedTrigramEmbedder()
+    from core.services.vector.embedding_service import EmbeddingService
+    from infrastructure.llm.llm_provider import get_llm
+
+    return EmbeddingService(llm=get_llm())
+
+
+async def evaluate(embedder_name: str, k: int, candidates: int, uploads: int = 1) -> dict:
+    from core.services.documents.chat_document_service import ChatDocumentService
+    from core.services.faiss_service import FaissService
+    from core.services.rag.bm25_index import SessionBM25Index
+    from core.services.rag.hybrid_retriever import HybridRetriever
+    from infrastructure.llm.token_estimator import estimate_tokens
+
+    dataset = json.loads(DATASET.read_text())
+    embedder = make_embedder(embedder_name)
+    workdir = tempfile.mkdtemp(prefix="medibot-retrieval-")
+    try:
+        store = FaissService(base_path=workdir)
+        lexical = SessionBM25Index(store)
+        ingest = ChatDocumentService(vector_store=store, embedder=embedder, lexical_index=lexical)
+        for _ in range(uploads):
+            for document in dataset["documents"]:
+                await ingest.ingest_document("eval-user", "eval-session", document["text"])
+
+        _, texts = store.chunk_texts("eval-user", "eval-session")
+        unanswerable = [q["query"] for q in dataset["queries"] if not any(q["expect"] in t for t in texts)]
+        if unanswerable:
+            raise SystemExit(f"Expected text not inside any single chunk for: {unanswerable}")
+
+        retrievers = {
+            "dense": (HybridRetriever(store, None, candidates=candidates, diversify=False), True),
+            "bm25": (HybridRetriever(store, lexical, candidates=candidates, diversify=False), False),
+            "hybrid": (HybridRetriever(store, lexical, candidates=candidates, diversify=False), True),
+            "hybrid+mmr": (HybridRetriever(store, lexical, candidates=candidates), True),
+        }
+        results = {}
+        for name, (retriever, use_embedding) in retrievers.items():
+            hits, reciprocal_ranks, tokens, misses = 0, 0.0, 0, []
+            for q in dataset["queries"]:
+                embedding = await embedder.embed(q["query"]) if use_embedding else []
+                chunks = retriever.search("eval-user", "eval-session", q["query"], embedding, k=k)
+                tokens += sum(estimate_tokens(c["text"]) for c in chunks)
+                rank = next((i for i, c in enumerate(chunks, 1) if q["expect"] in c["text"]), None)
+                if rank is None:
+                    misses.append(q["query"])
+                else:
+                    hits += 1
+                    reciprocal_ranks += 1 / rank
+            results[name] = {
+                "recall_at_k": round(hits / len(dataset["queries"]), 3),
+                "mrr": round(reciprocal_ranks / len(dataset["queries"]), 3),
+                "context_tokens": round(tokens / len(dataset["queries"])),
+                "misses": misses,
+            }
+        return {"chunks": len(texts), "queries": len(dataset["queries"]), "results": results}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embedder", choices=("hashed", "gemini"), default="hashed")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--candidates", type=int, default=20, help="Per-ranking candidates before fusion")
+    parser.add_argument("--duplicate-uploads", action="store_true", help="Ingest every document twice")
+    parser.add_argument("--verbose", action="store_true", help="List missed queries")
+    parser.add_argument("--output", help="Write results JSON to this path")
+    args = parser.parse_args()
+
+    report = asyncio.run(evaluate(args.embedder, args.k, args.candidates, 2 if args.duplicate_uploads else 1))
+    print(f"{report['queries']} queries over {report['chunks']} chunks, embedder={args.embedder}")
+    print(f"{'retriever':<12}{'recall@' + str(args.k):>10}{'MRR':>8}{'tokens':>8}")
+    for name, r in report["results"].items():
+        print(f"{name:<12}{r['recall_at_k']:>10.3f}{r['mrr']:>8.3f}{r['context_tokens']:>8}")
+        if args.verbose:
+            for query in r["misses"]:
+                print(f"    miss: {query}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"args": vars(args), **report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
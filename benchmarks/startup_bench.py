@@ -0,0 +1,174 @@
+"""
+Startup benchmark for the MediBot API.
+
+Measures:
+- wall time of `import main` in a fresh interpreter
+- `-X importtime` breakdown (slowest modules by cumulative time)
+- time-to-ready: uvicorn process start until `/health` answers 200
+
+Heavy native dependencies (faiss, numpy, pdfplumber, ...) must be loaded on
+first use; the report flags any of them that sneak back onto the import path.
+
+Usage:
+    python benchmarks/startup_bench.py --runs 5 --output startup.json
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+LAZY_MODULES = (
+    "faiss",
+    "numpy",
+    "pdfplumber",
+    "pytesseract",
+    "PIL",
+    "reportlab",
+    "firebase_admin",
+    "google.genai",
+)
+
+
+def _env() -> dict:
+    env = os.environ.copy()
+    env["PYTHONPATH"] = str(ROOT) + os.pathsep + env.get("PYTHONPATH", "")
+    # Settings refuse to load without these; real values are not needed to boot
+    env.setdefault("GEMINI_API_KEY", "startup-bench")
+    env.setdefault("MODEL_NAME", "gemini-2.5-flash")
+    env.setdefault("MONGO_URI", "mongodb://localhost:27017")
+    return env
+
+
+def measure_import(runs: int) -> dict:
+    """Wall time of `import main` in a fresh interpreter, in seconds."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-c", "import main"],
+            cwd=ROOT, env=_env(), check=True,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        timings.append(time.perf_counter() - start)
+    return {
+        "runs": runs,
+        "median_s": round(statistics.median(timings), 4),
+        "min_s": round(min(timings), 4),
+        "max_s": round(max(timings), 4),
+    }
+
+
+def measure_importtime(top: int) -> dict:
+    """Parse `-X importtime` output into the slowest modules and eager heavy imports."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, env=_env(), check=True,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+
+    modules = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            _, self_us, cumulative_us, name = (
+                part.strip() for part in line.replace("import time:", "|").split("|")
+            )
+            modules.append({
+                "module": name,
+                "self_ms": int(self_us) / 1000,
+                "cumulative_ms": int(cumulative_us) / 1000,
+            })
+        except ValueError:
+            continue  # header line
+
+    eager = sorted({
+        m["module"] for m in modules
+        if any(m["module"] == lazy or m["module"].startswith(lazy + ".") for lazy in LAZY_MODULES)
+    })
+    slowest = sorted(modules, key=lambda m: m["cumulative_ms"], reverse=True)[:top]
+    return {"slowest": slowest, "eager_heavy_modules": eager}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_time_to_ready(runs: int, timeout: float) -> dict:
+    """Seconds from spawning uvicorn until `/health` returns 200."""
+    timings = []
+    for _ in range(runs):
+        port = _free_port()
+        url = f"http://127.0.0.1:{port}/health"
+        start = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+            cwd=ROOT, env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            while time.perf_counter() - start < timeout:
+                try:
+                    with urllib.request.urlopen(url, timeout=0.5) as resp:
+                        if resp.status == 200:
+                            timings.append(time.perf_counter() - start)
+                            break
+                except OSError:
+                    time.sleep(0.01)
+            else:
+                raise RuntimeError(f"/health not ready within {timeout}s")
+        finally:
+            proc.terminate()
+            proc.wait(timeout=10)
+    return {
+        "runs": runs,
+        "median_s": round(statistics.median(timings), 4),
+        "min_s": round(min(timings), 4),
+        "max_s": round(max(timings), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Slowest modules to report")
+    parser.add_argument("--target", type=float, default=1.0, help="Time-to-ready budget in seconds")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--output", help="Write the JSON report to this path")
+    args = parser.parse_args()
+
+    report = {
+        "python": sys.version.split()[0],
+        "import_main": measure_import(args.runs),
+        "importtime": measure_importtime(args.top),
+        "time_to_ready": measure_time_to_ready(args.runs, args.timeout),
+        "target_s": args.target,
+    }
+    report["within_target"] = report["time_to_ready"]["median_s"] <= args.target
+
+    print(f"import main      : {report['import_main']['median_s']:.3f}s (median of {args.runs})")
+    print(f"time to /health  : {report['time_to_ready']['median_s']:.3f}s (target {args.target:.2f}s)")
+    print("slowest imports (cumulative):")
+    for m in report["importtime"]["slowest"]:
+        print(f"  {m['cumulative_ms']:9.1f} ms  {m['module']}")
+    if report["importtime"]["eager_heavy_modules"]:
+        print("heavy modules imported at startup:", ", ".join(report["importtime"]["eager_heavy_modules"]))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+    sys.exit(0 if report["within_target"] and not report["importtime"]["eager_heavy_modules"] else 1)
+
+
+if __name__ == "__main__":
+    main()
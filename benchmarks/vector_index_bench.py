@@ -0,0 +1,137 @@
+"""
+Compare the document index types (see core/services/vector/index_factory.py).
+
+Builds one partition per type through FaissVectorStore from the same
+synthetic corpus, then reports for each:
+- index memory per 100k chunks (serialized index size, extrapolated)
+- exact vectors kept on disk for re-ranking, per 100k chunks
+- recall@5 against exact search
+- search latency per query (p50 / p95), including metadata lookup
+
+The corpus is clustered (topics plus noise), which is closer to real
+embeddings than uniform noise and matters for quantizer quality.
+
+Usage:
+    python benchmarks/vector_index_bench.py --chunks 20000 --queries 200
+    python benchmarks/vector_index_bench.py --types flat sq_int8 --output index.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+os.environ.setdefault("GEMINI_API_KEY", "vector-bench")
+os.environ.setdefault("MODEL_NAME", "gemini-2.5-flash")
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+
+# (index type, rerank factor); rerank <= 1 returns approximate distances
+CONFIGS = [
+    ("flat", 1),
+    ("sq_fp16", 1),
+    ("sq_int8", 1),
+    ("sq_int8", 4),
+    ("ivfpq", 1),
+    ("ivfpq", 4),
+]
+
+
+def make_corpus(chunks: int, queries: int, dim: int, topics: int, seed: int = 0):
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((topics, dim)).astype("float32")
+    assignment = rng.integers(0, topics, chunks)
+    vectors = centers[assignment] + 0.6 * rng.standard_normal((chunks, dim)).astype("float32")
+    picked = rng.integers(0, chunks, queries)
+    query_vectors = vectors[picked] + 0.3 * rng.standard_normal((queries, dim)).astype("float32")
+    return vectors, query_vectors
+
+
+def _disk_bytes(path: str) -> int:
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def run(kind: str, rerank: int, vectors, queries, truth, k: int) -> dict:
+    import faiss
+    from core.services.vector.faiss_store import FaissVectorStore
+    from core.services.vector.index_factory import index_kind
+
+    workdir = tempfile.mkdtemp(prefix="medibot-index-")
+    try:
+        store = FaissVectorStore(workdir, index_type=kind, rerank=rerank)
+        metadata = [{"document_id": f"doc-{i // 50}", "chunk_id": i, "text": f"chunk {i}"} for i in range(len(vectors))]
+        start = time.perf_counter()
+        store.add("bench", "bench", vectors, metadata)
+        build_s = time.perf_counter() - start
+
+        path = store.index_path("bench", "bench")
+        partition = store._load(path)
+        per_chunk = len(faiss.serialize_index(partition.index)) / len(vectors)
+
+        latencies, found = [], 0
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            results = store.search("bench", "bench", query, k=k)
+            latencies.append(time.perf_counter() - start)
+            found += len({r["chunk_id"] for r in results} & expected)
+        latencies.sort()
+        return {
+            "built_as": index_kind(partition.index),
+            "build_s": round(build_s, 2),
+            "index_mb_per_100k": round(per_chunk * 100_000 / 2**20, 1),
+            "rerank_disk_mb_per_100k": round(_disk_bytes(path + ".vecs") / len(vectors) * 100_000 / 2**20, 1),
+            "recall_at_k": round(found / (k * len(queries)), 4),
+            "p50_ms": round(statistics.median(latencies) * 1000, 3),
+            "p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 3),
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--topics", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--types", nargs="*", help="Only these index types")
+    parser.add_argument("--output", help="Write results JSON to this path")
+    args = parser.parse_args()
+
+    import faiss
+
+    vectors, queries = make_corpus(args.chunks, args.queries, args.dim, args.topics)
+    exact = faiss.IndexFlatL2(args.dim)
+    exact.add(vectors)
+    _, truth_ids = exact.search(queries, args.k)
+    truth = [set(row.tolist()) for row in truth_ids]
+    vectors, queries = vectors.tolist(), queries.tolist()
+
+    results = {}
+    print(f"{'config':<16}{'built as':<10}{'MB/100k':>9}{'+disk':>8}{'recall@' + str(args.k):>10}{'p50 ms':>9}{'p95 ms':>9}")
+    for kind, rerank in CONFIGS:
+        if args.types and kind not in args.types:
+            continue
+        name = kind if rerank <= 1 else f"{kind}+rerank{rerank}"
+        r = results[name] = run(kind, rerank, vectors, queries, truth, args.k)
+        print(
+            f"{name:<16}{r['built_as']:<10}{r['index_mb_per_100k']:>9.1f}{r['rerank_disk_mb_per_100k']:>8.1f}"
+            f"{r['recall_at_k']:>10.3f}{r['p50_ms']:>9.3f}{r['p95_ms']:>9.3f}"
+        )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"args": vars(args), "configs": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
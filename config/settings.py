@@ -18,4 +18,77 @@ MODEL_NAME = os.getenv("MODEL_NAME")
 assert not MODEL_NAME.startswith("models/"), "Do NOT include 'models/' prefix"
 
 if not GEMINI_API_KEY:
-    raise RuntimeError("GEMINI_API_KEY is not set")
\ No newline at end of file
+    raise RuntimeError("GEMINI_API_KEY is not set")
+
+# Tracing
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))  # 0.0 - 1.0
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "jsonl")  # "jsonl" | "none"
+TRACE_FILE = os.getenv("TRACE_FILE", "traces/spans.jsonl")
+
+# Event-loop monitoring
+LOOP_MONITOR_INTERVAL = float(os.getenv("LOOP_MONITOR_INTERVAL", "0.5"))  # seconds between lag probes
+LOOP_BLOCK_THRESHOLD = float(os.getenv("LOOP_BLOCK_THRESHOLD", "0.1"))  # seconds
+LOOP_MONITOR_DEBUG = os.getenv("LOOP_MONITOR_DEBUG", "false").lower() == "true"
+
+# Gemini rate limits & scheduling
+GEMINI_REQUESTS_PER_MINUTE = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "1000"))
+GEMINI_TOKENS_PER_MINUTE = float(os.getenv("GEMINI_TOKENS_PER_MINUTE", "1000000"))
+LLM_DEADLINE_INTERACTIVE = float(os.getenv("LLM_DEADLINE_INTERACTIVE", "30"))  # seconds
+LLM_DEADLINE_REPORT = float(os.getenv("LLM_DEADLINE_REPORT", "90"))
+LLM_DEADLINE_BACKGROUND = float(os.getenv("LLM_DEADLINE_BACKGROUND", "600"))
+
+# Upload the static chat system prompt once as Gemini cached content
+GEMINI_CACHE_SYSTEM_PROMPT = os.getenv("GEMINI_CACHE_SYSTEM_PROMPT", "false").lower() == "true"
+GEMINI_CACHE_TTL = int(os.getenv("GEMINI_CACHE_TTL", "3600"))  # seconds
+
+# Per-turn chat prompt budget (history + profile + document + message)
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "6000"))
+PROMPT_HISTORY_MESSAGES = int(os.getenv("PROMPT_HISTORY_MESSAGES", "10"))
+
+# Rolling conversation summary: fold a session's Redis history into a
+# summary once it passes TRIGGER messages, keeping the newest KEEP
+SUMMARY_TRIGGER_MESSAGES = int(os.getenv("SUMMARY_TRIGGER_MESSAGES", "20"))
+SUMMARY_KEEP_MESSAGES = int(os.getenv("SUMMARY_KEEP_MESSAGES", "10"))
+
+# Long-term semantic memory over past sessions
+SEMANTIC_MEMORY_ENABLED = os.getenv("SEMANTIC_MEMORY_ENABLED", "true").lower() == "true"
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "400"))
+MEMORY_TOP_K = int(os.getenv("MEMORY_TOP_K", "3"))
+
+# Redis
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "2"))  # seconds
+REDIS_RECHECK_INTERVAL = float(os.getenv("REDIS_RECHECK_INTERVAL", "10"))  # seconds between pings while down
+REDIS_MAX_MESSAGES = int(os.getenv("REDIS_MAX_MESSAGES", "100"))  # per-session list cap
+# Messages reloaded from MongoDB when a session's Redis list has expired
+REDIS_REHYDRATE_MESSAGES = int(os.getenv("REDIS_REHYDRATE_MESSAGES", "20"))
+
+# Rendered profile context cache (invalidated by a per-user version counter)
+PROFILE_CONTEXT_CACHE_TTL = int(os.getenv("PROFILE_CONTEXT_CACHE_TTL", "900"))  # seconds
+
+# Seconds a worker trusts that a user's document exists without asking Redis
+KNOWN_USERS_TTL = float(os.getenv("KNOWN_USERS_TTL", "300"))
+
+# Document vector log size (bytes) at which it is folded into the index file
+VECTOR_WAL_COMPACT_BYTES = int(os.getenv("VECTOR_WAL_COMPACT_BYTES", str(8 * 1024 * 1024)))
+# Document index type: flat (exact), sq_fp16, sq_int8 or ivfpq (see index_factory)
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "flat")
+# Compressed indexes fetch VECTOR_RERANK * k candidates and re-rank them exactly (<= 1: off)
+VECTOR_RERANK = int(os.getenv("VECTOR_RERANK", "4"))
+VECTOR_IVF_NPROBE = int(os.getenv("VECTOR_IVF_NPROBE", "16"))
+# Index files at least this large (bytes) are memory-mapped instead of read into RAM
+VECTOR_MMAP_MIN_BYTES = int(os.getenv("VECTOR_MMAP_MIN_BYTES", str(32 * 1024 * 1024)))
+
+# Document retrieval: BM25 + vector results fused by reciprocal rank
+HYBRID_SEARCH_ENABLED = os.getenv("HYBRID_SEARCH_ENABLED", "true").lower() == "true"
+HYBRID_SEARCH_CANDIDATES = int(os.getenv("HYBRID_SEARCH_CANDIDATES", "20"))  # per ranking
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+# Post-retrieval: MMR relevance/diversity trade-off (1.0 = relevance only) and
+# the cosine similarity above which a chunk counts as a duplicate
+DOCUMENT_MMR_LAMBDA = float(os.getenv("DOCUMENT_MMR_LAMBDA", "0.7"))
+DOCUMENT_DUPLICATE_SIMILARITY = float(os.getenv("DOCUMENT_DUPLICATE_SIMILARITY", "0.95"))
+
+# Single-flight coalescing of identical LLM / embedding calls
+SINGLE_FLIGHT_LOCK_TTL = float(os.getenv("SINGLE_FLIGHT_LOCK_TTL", "60"))  # seconds
+SINGLE_FLIGHT_RESULT_TTL = float(os.getenv("SINGLE_FLIGHT_RESULT_TTL", "30"))
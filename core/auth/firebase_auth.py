@@ -1,14 +1,19 @@
 """Firebase Auth helper utilities."""
 
-import firebase_admin
-from firebase_admin import auth, credentials
 import httpx
 
 from config import settings
 
-cred = credentials.Certificate("firebase-service-account.json")
-if not firebase_admin._apps:  # type: ignore[attr-defined]
-    firebase_admin.initialize_app(cred)
+
+def _get_firebase_auth():
+    """Initialize the Firebase Admin SDK on first use and return its auth module."""
+    import firebase_admin
+    from firebase_admin import auth, credentials
+
+    if not firebase_admin._apps:  # type: ignore[attr-defined]
+        cred = credentials.Certificate("firebase-service-account.json")
+        firebase_admin.initialize_app(cred)
+    return auth
 
 
 class FirebaseAuthError(Exception):
@@ -17,7 +22,7 @@ class FirebaseAuthError(Exception):
 
 def verify_firebase_token(id_token: str) -> str:
     """Verify a Firebase ID token and return the stable UID."""
-    decoded = auth.verify_id_token(id_token)
+    decoded = _get_firebase_auth().verify_id_token(id_token)
     return decoded["uid"]
 
 
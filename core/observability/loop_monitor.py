@@ -0,0 +1,201 @@
+"""
+Event-loop lag monitor and blocking-call detector.
+
+The lag probe sleeps for a fixed interval and records how late it wakes up;
+any sync work inside `async def` (Gemini SDK calls, faiss.read_index,
+pytesseract, file I/O) shows up as scheduling delay for every request on
+the worker.
+
+In debug mode a watchdog thread also watches a heartbeat callback on the
+loop. When the heartbeat stalls longer than the threshold it captures the
+loop thread's stack, so the offending call site can be fixed. If the
+blocking call holds the GIL for its whole duration the stack is captured
+as soon as it is released, which still points at the caller.
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from pathlib import Path
+from typing import Optional
+
+from config import settings
+from core.observability.metrics import LOOP_BLOCKED, LOOP_LAG
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = str(Path(__file__).resolve().parents[2])
+
+
+class LoopMonitor:
+    def __init__(
+        self,
+        interval: float = 0.5,
+        block_threshold: float = 0.1,
+        debug: bool = False,
+        max_sites: int = 100
+    ):
+        self.interval = interval
+        self.block_threshold = block_threshold
+        self.debug = debug
+        self.max_sites = max_sites
+
+        self._probe_task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._beat = time.monotonic()
+        self._heartbeat_handle = None
+
+        self._lock = threading.Lock()
+        self._sites: dict[str, dict] = {}
+        self.max_lag = 0.0
+
+    # ----------------------------------
+    # Lifecycle
+    # ----------------------------------
+    def start(self):
+        """Start monitoring the running loop. Must be called from inside it."""
+        if self._probe_task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stop.clear()
+        self._probe_task = self._loop.create_task(self._probe())
+
+        if self.debug:
+            self._beat = time.monotonic()
+            self._schedule_heartbeat()
+            self._watchdog = threading.Thread(
+                target=self._watch, name="loop-watchdog", daemon=True
+            )
+            self._watchdog.start()
+            logger.info(
+                f"Loop blocking detector enabled (threshold {self.block_threshold * 1000:.0f}ms)"
+            )
+
+    async def stop(self):
+        self._stop.set()
+        if self._heartbeat_handle is not None:
+            self._heartbeat_handle.cancel()
+            self._heartbeat_handle = None
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            try:
+                await self._probe_task
+            except asyncio.CancelledError:
+                pass
+            self._probe_task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    # ----------------------------------
+    # Lag probe (always on)
+    # ----------------------------------
+    async def _probe(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            scheduled = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - scheduled - self.interval)
+            LOOP_LAG.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+
+    # ----------------------------------
+    # Blocking detector (debug only)
+    # ----------------------------------
+    def _schedule_heartbeat(self):
+        self._beat = time.monotonic()
+        if not self._stop.is_set():
+            self._heartbeat_handle = self._loop.call_later(
+                self.block_threshold / 4, self._schedule_heartbeat
+            )
+
+    def _watch(self):
+        captured_beat = None
+        captured_site = None
+        while not self._stop.wait(self.block_threshold / 4):
+            beat = self._beat
+            stalled = time.monotonic() - beat
+
+            if captured_site is not None and beat != captured_beat:
+                # The stall is over: record its full length, not just the
+                # time at which it was first noticed
+                self._update_stall(captured_site, beat - captured_beat)
+                captured_site = None
+
+            if stalled < self.block_threshold or beat == captured_beat:
+                continue
+
+            # One capture per stall; the heartbeat value identifies the stall
+            captured_beat = beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            captured_site = self._record(traceback.extract_stack(frame), stalled)
+
+    def _record(self, stack: traceback.StackSummary, stalled: float) -> Optional[str]:
+        LOOP_BLOCKED.inc()
+
+        project_frames = [
+            f for f in stack
+            if f.filename.startswith(PROJECT_ROOT) and f.filename != __file__
+        ]
+        site_frame = project_frames[-1] if project_frames else stack[-1]
+        site = f"{site_frame.filename.replace(PROJECT_ROOT, '.')}:{site_frame.lineno} in {site_frame.name}"
+        leaf = f"{stack[-1].filename}:{stack[-1].lineno} in {stack[-1].name}"
+
+        logger.warning(
+            f"Event loop blocked for >= {stalled * 1000:.1f}ms at {site} (leaf: {leaf})\n"
+            + "".join(traceback.format_list(stack[-8:]))
+        )
+
+        with self._lock:
+            entry = self._sites.get(site)
+            if entry is None:
+                if len(self._sites) >= self.max_sites:
+                    return None
+                entry = self._sites[site] = {
+                    "site": site,
+                    "count": 0,
+                    "max_ms": 0.0,
+                    "leaf": leaf,
+                    "stack": [],
+                }
+            entry["count"] += 1
+            entry["max_ms"] = max(entry["max_ms"], round(stalled * 1000, 1))
+            entry["stack"] = [
+                f"{f.filename.replace(PROJECT_ROOT, '.')}:{f.lineno} in {f.name}"
+                for f in project_frames or stack
+            ]
+        return site
+
+    def _update_stall(self, site: str, stalled: float):
+        with self._lock:
+            entry = self._sites.get(site)
+            if entry is not None:
+                entry["max_ms"] = max(entry["max_ms"], round(stalled * 1000, 1))
+
+    def report(self) -> dict:
+        """Lag summary plus blocking call sites, worst first."""
+        with self._lock:
+            sites = sorted(self._sites.values(), key=lambda e: e["max_ms"], reverse=True)
+            sites = [dict(e) for e in sites]
+        return {
+            "debug": self.debug,
+            "block_threshold_ms": self.block_threshold * 1000,
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+            "blocking_sites": sites,
+        }
+
+
+loop_monitor = LoopMonitor(
+    interval=settings.LOOP_MONITOR_INTERVAL,
+    block_threshold=settings.LOOP_BLOCK_THRESHOLD,
+    debug=settings.LOOP_MONITOR_DEBUG,
+)
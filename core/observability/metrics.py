@@ -0,0 +1,180 @@
+"""
+Prometheus metrics for the MediBot API.
+
+All collectors live here so every module shares one registry. Recording a
+sample is a dict lookup plus a locked float add, cheap enough to leave on
+in production.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+
+from core.observability.tracing import span
+
+# Latency buckets from 5ms (Redis round trip) to 60s (long Gemini generations)
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+REQUEST_LATENCY = Histogram(
+    "medibot_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+STAGE_LATENCY = Histogram(
+    "medibot_stage_duration_seconds",
+    "Latency of individual pipeline stages",
+    ["component", "stage"],
+    buckets=LATENCY_BUCKETS,
+)
+
+CACHE_REQUESTS = Counter(
+    "medibot_cache_requests_total",
+    "Cache lookups by cache name and result (hit/miss)",
+    ["cache", "result"],
+)
+
+LLM_ERRORS = Counter(
+    "medibot_llm_errors_total",
+    "LLM call failures by operation and kind (quota_exceeded/error)",
+    ["operation", "kind"],
+)
+
+LLM_TOKENS = Counter(
+    "medibot_llm_tokens_total",
+    "Gemini tokens reported by the API, by operation and kind (prompt/cached/output)",
+    ["operation", "kind"],
+)
+
+PROMPT_TOKENS = Histogram(
+    "medibot_prompt_tokens",
+    "Estimated input tokens per chat turn by prompt section",
+    ["section"],
+    buckets=(50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000),
+)
+
+PROMPT_TRIMMED = Counter(
+    "medibot_prompt_trimmed_total",
+    "Prompt content dropped to fit the token budget (turns, chunks, tokens) by section",
+    ["section"],
+)
+
+QUEUE_DEPTH = Gauge(
+    "medibot_queue_depth",
+    "Number of items waiting or in flight per queue",
+    ["queue"],
+    multiprocess_mode="livesum",
+)
+
+SINGLE_FLIGHT = Counter(
+    "medibot_single_flight_total",
+    "Deduplicated calls by operation and outcome (leader/collapsed_local/collapsed_remote)",
+    ["operation", "result"],
+)
+
+LOADER_BATCH_SIZE = Histogram(
+    "medibot_loader_batch_size",
+    "Keys fetched per batched lookup, by loader",
+    ["loader"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+
+LOOP_LAG = Histogram(
+    "medibot_event_loop_lag_seconds",
+    "Scheduling delay observed by the event-loop lag probe",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+LOOP_BLOCKED = Counter(
+    "medibot_event_loop_blocked_total",
+    "Event-loop stalls longer than LOOP_BLOCK_THRESHOLD caught by the watchdog",
+)
+
+
+@contextmanager
+def observe_stage(component: str, stage: str, **attributes):
+    """
+    Time the enclosed block into the stage latency histogram.
+    Also records a `component.stage` trace span, which is yielded so callers
+    can attach attributes such as prompt size or chunk count.
+    """
+    start = time.perf_counter()
+    try:
+        with span(f"{component}.{stage}", **attributes) as stage_span:
+            yield stage_span
+    finally:
+        STAGE_LATENCY.labels(component, stage).observe(time.perf_counter() - start)
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def is_quota_error(error: Exception) -> bool:
+    """Gemini surfaces quota exhaustion as a 429 in the exception text."""
+    return "429" in str(error) or "RESOURCE_EXHAUSTED" in str(error)
+
+
+def record_llm_error(operation: str, error: Exception):
+    kind = "quota_exceeded" if is_quota_error(error) else "error"
+    LLM_ERRORS.labels(operation, kind).inc()
+
+
+def record_llm_usage(operation: str, usage):
+    """Count billed tokens from a Gemini `usage_metadata` (None-safe)."""
+    if usage is None:
+        return
+    for kind, value in (
+        ("prompt", usage.prompt_token_count),
+        ("cached", usage.cached_content_token_count),
+        ("output", usage.candidates_token_count),
+    ):
+        if value:
+            LLM_TOKENS.labels(operation, kind).inc(value)
+
+
+async def metrics_middleware(request, call_next):
+    """
+    Record request latency per route template.
+    Unmatched paths share one label so scanners can't blow up cardinality.
+    """
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        REQUEST_LATENCY.labels(
+            request.method,
+            getattr(route, "path", "unmatched"),
+            str(status),
+        ).observe(time.perf_counter() - start)
+
+
+def render_latest() -> tuple[bytes, str]:
+    """
+    Serialize all metrics in the Prometheus text format.
+    With several uvicorn workers set PROMETHEUS_MULTIPROC_DIR so samples
+    from every worker are aggregated.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
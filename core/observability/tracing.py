@@ -0,0 +1,196 @@
+"""
+Lightweight per-request tracing.
+
+A request id is carried in a context variable, so every service awaited
+from the request handler sees it without threading it through arguments.
+Sampled requests record spans (name, start, duration, attributes) which are
+handed to a pluggable exporter when they end.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+_request_id = contextvars.ContextVar("medibot_request_id", default=None)
+_sampled = contextvars.ContextVar("medibot_trace_sampled", default=False)
+_current_span = contextvars.ContextVar("medibot_current_span", default=None)
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start", "duration_ms", "attributes")
+
+    def __init__(self, trace_id: str, parent_id: Optional[str], name: str, attributes: dict):
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time()
+        self.duration_ms = None
+        self.attributes = attributes
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """Returned for unsampled requests so call sites never branch."""
+
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class SpanExporter:
+    """Base exporter; subclasses ship finished spans somewhere."""
+
+    def export(self, span: Span):
+        pass
+
+    def shutdown(self):
+        pass
+
+
+class JsonLinesExporter(SpanExporter):
+    """
+    Appends one JSON object per span to a local file for offline analysis.
+    Writes happen on a daemon thread so the event loop never waits on disk.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span):
+        self._queue.put(span.to_dict())
+
+    def shutdown(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def _run(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    return
+                try:
+                    f.write(json.dumps(item, default=str) + "\n")
+                    # Drain whatever queued up meanwhile before flushing
+                    if self._queue.empty():
+                        f.flush()
+                except Exception as e:
+                    logger.warning(f"Failed to export span: {e}")
+
+
+class Tracer:
+    def __init__(self, exporter: SpanExporter, sample_rate: float):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    @contextmanager
+    def start_trace(self, request_id: Optional[str] = None):
+        """Bind a request id (and sampling decision) to the current context."""
+        request_id = request_id or uuid.uuid4().hex
+        sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        tokens = (
+            _request_id.set(request_id),
+            _sampled.set(sampled),
+            _current_span.set(None),
+        )
+        try:
+            yield request_id
+        finally:
+            _current_span.reset(tokens[2])
+            _sampled.reset(tokens[1])
+            _request_id.reset(tokens[0])
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Record a span for the enclosed block if the current request is sampled."""
+        if not _sampled.get():
+            yield NOOP_SPAN
+            return
+
+        parent = _current_span.get()
+        span = Span(_request_id.get(), parent.span_id if parent else None, name, attributes)
+        token = _current_span.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except Exception as e:
+            span.set_attribute("error", type(e).__name__)
+            raise
+        finally:
+            span.duration_ms = round((time.perf_counter() - start) * 1000, 3)
+            _current_span.reset(token)
+            try:
+                self.exporter.export(span)
+            except Exception as e:
+                logger.warning(f"Span export failed: {e}")
+
+
+def _build_exporter() -> SpanExporter:
+    if settings.TRACE_EXPORTER == "jsonl" and settings.TRACE_SAMPLE_RATE > 0:
+        return JsonLinesExporter(settings.TRACE_FILE)
+    return SpanExporter()
+
+
+tracer = Tracer(_build_exporter(), settings.TRACE_SAMPLE_RATE)
+
+
+def span(name: str, **attributes):
+    """Shortcut for `tracer.span(...)`."""
+    return tracer.span(name, **attributes)
+
+
+def get_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+async def tracing_middleware(request, call_next):
+    """
+    Start a trace per request. Honors an incoming X-Request-ID and echoes the
+    id back so clients can quote it when reporting a slow turn.
+    """
+    incoming_id = request.headers.get("x-request-id", "")[:64] or None
+    with tracer.start_trace(incoming_id) as request_id:
+        with tracer.span("http.request", method=request.method, path=request.url.path) as root:
+            response = await call_next(request)
+            root.set_attribute("status", response.status_code)
+            route = request.scope.get("route")
+            if route is not None:
+                root.set_attribute("route", route.path)
+        response.headers["X-Request-ID"] = request_id
+        return response
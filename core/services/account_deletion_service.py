@@ -1,7 +1,10 @@
+import asyncio
 import os
 from typing import List, Dict
 from fastapi import HTTPException
 
+from core.services.vector.vector_provider import get_faiss_service, get_lexical_index
+
 from db.mongodb import (
     client,
     users_collection,
@@ -13,10 +16,17 @@ from db.mongodb import (
 class AccountDeletionService:
     """
     Coordinates a hard delete of a user's account and all associated data.
-    - Removes filesystem FAISS index files recorded in metadata
+    - Removes filesystem FAISS index files recorded in metadata, plus the
+      user's files in faiss_store (session documents, long-term memory)
+    - Clears the user's Redis chat memory and cached profile context
     - Uses a MongoDB transaction to remove user, reports, chats, and FAISS metadata
     """
 
+    def __init__(self, redis_memory=None, profile_cache=None, known_users=None):
+        self.redis_memory = redis_memory
+        self.profile_cache = profile_cache
+        self.known_users = known_users
+
     async def _get_user_faiss_index_paths(self, firebase_uid: str) -> List[str]:
         paths: List[str] = []
         cursor = faiss_indexes_collection.find({"firebase_uid": firebase_uid}, {"index_path": 1})
@@ -57,6 +67,15 @@ class AccountDeletionService:
                 "errors": file_errors
             })
 
+        # Store calls block on file locks; keep them off the event loop
+        await asyncio.to_thread(get_faiss_service().delete_all_for_user, firebase_uid)
+        if get_lexical_index() is not None:
+            await asyncio.to_thread(get_lexical_index().forget_user, firebase_uid)
+        if self.redis_memory:
+            await self.redis_memory.clear_all_for_user(firebase_uid)
+        if self.profile_cache:
+            await self.profile_cache.forget(firebase_uid)
+
         # 3) Transactional DB delete (best effort; requires replica set)
         try:
             async with await client.start_session() as session:
@@ -72,6 +91,10 @@ class AccountDeletionService:
             await chat_sessions_collection.delete_many({"firebase_uid": firebase_uid})
             await faiss_indexes_collection.delete_many({"firebase_uid": firebase_uid})
 
+        # Only once the documents are gone: the next request re-creates the user
+        if self.known_users:
+            await self.known_users.discard(firebase_uid)
+
         return {
             "deleted_user": True,
             "deleted_reports": True,
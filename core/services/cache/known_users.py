@@ -0,0 +1,136 @@
+"""
+Users whose MongoDB document is known to exist.
+
+Lets `ensure_user_exists` skip its upsert (a write to the primary) for users
+already seen. Membership is kept per worker with a TTL and in a Redis set
+shared by all workers. The set is rotated daily (`known_users:{YYYYMMDD}`),
+so each active user is upserted at most about once a day.
+
+Account deletion removes the user from the Redis set and from the deleting
+worker, and bumps a deletion generation (`known_users:generation`). Every
+worker reads the generation at most once a second and drops its local tier
+when it changed, so a deleted user is trusted for about a second at most
+(up to `ttl` while Redis is down). The next request then misses both tiers
+and the document is re-created.
+"""
+
+import logging
+import time
+from collections import OrderedDict
+
+import redis.asyncio as redis
+
+from config.settings import KNOWN_USERS_TTL, REDIS_URL
+from core.observability.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+
+GENERATION_KEY = "known_users:generation"
+
+
+def _known_users_key() -> str:
+    return time.strftime("known_users:%Y%m%d", time.gmtime())
+
+
+class KnownUsersCache:
+    # After a Redis failure, rely on the in-process tier for this long
+    REDIS_RETRY_AFTER = 30.0
+    # How often the local tier is revalidated against the deletion generation
+    GENERATION_CHECK_INTERVAL = 1.0
+
+    def __init__(self, redis_client=None, ttl: float = 300.0, max_entries: int = 100_000):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local: OrderedDict[str, float] = OrderedDict()  # uid -> expiry
+        self._redis_down_until = 0.0
+        self._generation = None
+        self._generation_checked = 0.0
+
+    def _redis_available(self) -> bool:
+        return self.redis is not None and time.monotonic() >= self._redis_down_until
+
+    def _redis_failed(self, action: str, e: Exception):
+        self._redis_down_until = time.monotonic() + self.REDIS_RETRY_AFTER
+        logger.warning(f"Failed to {action}: {e}")
+
+    def _remember(self, uid: str):
+        self._local[uid] = time.monotonic() + self.ttl
+        self._local.move_to_end(uid)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+
+    async def _check_generation(self):
+        """Drop the local tier if any worker deleted a user since the last check."""
+        now = time.monotonic()
+        if now < self._generation_checked + self.GENERATION_CHECK_INTERVAL or not self._redis_available():
+            return
+        self._generation_checked = now
+        try:
+            generation = await self.redis.get(GENERATION_KEY)
+        except Exception as e:
+            self._redis_failed("check known users generation", e)
+            return
+        if generation != self._generation:
+            self._local.clear()
+            self._generation = generation
+
+    async def contains(self, uid: str) -> bool:
+        await self._check_generation()
+        expires = self._local.get(uid)
+        if expires is not None:
+            if expires > time.monotonic():
+                record_cache("known_users", True)
+                return True
+            del self._local[uid]
+
+        known = False
+        if self._redis_available():
+            try:
+                known = bool(await self.redis.sismember(_known_users_key(), uid))
+            except Exception as e:
+                self._redis_failed("check known users", e)
+        if known:
+            self._remember(uid)
+        record_cache("known_users", known)
+        return known
+
+    async def add(self, uid: str):
+        """Call once the user's document is known to exist."""
+        self._remember(uid)
+        if self._redis_available():
+            try:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    pipe.sadd(_known_users_key(), uid)
+                    pipe.expire(_known_users_key(), 2 * 24 * 3600)
+                    await pipe.execute()
+            except Exception as e:
+                self._redis_failed("add known user", e)
+
+    async def discard(self, uid: str):
+        """Call after the user's document is deleted."""
+        self._local.pop(uid, None)
+        if self.redis is None:
+            return
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.srem(_known_users_key(), uid)
+                pipe.incr(GENERATION_KEY)
+                await pipe.execute()
+        except Exception as e:
+            self._redis_failed("remove known user", e)
+
+
+_known_users = None
+
+
+def get_known_users() -> KnownUsersCache:
+    """One cache per worker process."""
+    global _known_users
+    if _known_users is None:
+        _known_users = KnownUsersCache(
+            redis.from_url(REDIS_URL, decode_responses=True),
+            ttl=KNOWN_USERS_TTL
+        )
+    return _known_users
@@ -0,0 +1,151 @@
+"""
+Cache of the rendered profile context used in every chat turn.
+
+Each user has a version counter in Redis (`profile:{uid}:version`), bumped
+with INCR by every profile write. The rendered context is cached per worker
+and in Redis (`profile:{uid}:context`) together with the version it was built
+from, so a chat turn costs one small Redis GET and no MongoDB round trip
+while the profile is unchanged. Writes on any worker invalidate all of them.
+Worker-local entries also expire after the TTL.
+
+Without Redis (or while it is down) the version can't be checked, so the
+cache is bypassed and the context is built from MongoDB every time.
+"""
+
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+import redis.asyncio as redis
+
+from config.settings import PROFILE_CONTEXT_CACHE_TTL, REDIS_URL
+from core.observability.metrics import record_cache
+from core.observability.tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+class ProfileContextCache:
+    # After a Redis failure, skip the cache for this long
+    REDIS_RETRY_AFTER = 30.0
+
+    def __init__(self, redis_client=None, ttl: int = 900, max_entries: int = 4096):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local: OrderedDict[str, tuple[str, str, float]] = OrderedDict()  # version, text, expiry
+        self._redis_down_until = 0.0
+
+    @staticmethod
+    def _version_key(uid: str) -> str:
+        return f"profile:{uid}:version"
+
+    @staticmethod
+    def _context_key(uid: str) -> str:
+        return f"profile:{uid}:context"
+
+    def _redis_available(self) -> bool:
+        return self.redis is not None and time.monotonic() >= self._redis_down_until
+
+    def _redis_failed(self, action: str, e: Exception):
+        self._redis_down_until = time.monotonic() + self.REDIS_RETRY_AFTER
+        logger.warning(f"Failed to {action}, bypassing profile cache: {e}")
+
+    # ----------------------------------
+    # Read path
+    # ----------------------------------
+    async def get_or_build(self, uid: str, build: Callable[[], Awaitable[str]]) -> str:
+        """Cached context for the user's current profile version, else `build()`."""
+        if not self._redis_available():
+            return await build()
+
+        try:
+            with span("profile_cache.get") as cache_span:
+                version = await self.redis.get(self._version_key(uid)) or "0"
+                local = self._local.get(uid)
+                if local and local[0] == version and local[2] > time.monotonic():
+                    self._local.move_to_end(uid)
+                    cache_span.set_attribute("tier", "local")
+                    record_cache("profile_context", True)
+                    return local[1]
+
+                cached = await self.redis.get(self._context_key(uid))
+                if cached:
+                    entry = json.loads(cached)
+                    if entry["version"] == version:
+                        self._remember(uid, version, entry["text"])
+                        cache_span.set_attribute("tier", "redis")
+                        record_cache("profile_context", True)
+                        return entry["text"]
+        except Exception as e:
+            self._redis_failed("read profile cache", e)
+            return await build()
+
+        record_cache("profile_context", False)
+        # The version was read before MongoDB: if the profile changes meanwhile,
+        # the bump supersedes what is stored here
+        text = await build()
+        self._remember(uid, version, text)
+        try:
+            await self.redis.set(
+                self._context_key(uid),
+                json.dumps({"version": version, "text": text}),
+                ex=self.ttl
+            )
+        except Exception as e:
+            self._redis_failed("write profile cache", e)
+        return text
+
+    def _remember(self, uid: str, version: str, text: str):
+        self._local[uid] = (version, text, time.monotonic() + self.ttl)
+        self._local.move_to_end(uid)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+
+    # ----------------------------------
+    # Invalidation
+    # ----------------------------------
+    async def bump(self, uid: str):
+        """Call after every profile write (once the write is done)."""
+        self._local.pop(uid, None)
+        if self.redis is None:
+            return
+        try:
+            await self.redis.incr(self._version_key(uid))
+        except Exception as e:
+            # Other workers may serve the old context until the TTL runs out
+            self._redis_failed("bump profile version", e)
+
+    async def forget(self, uid: str):
+        """
+        Account deletion. The version is bumped rather than deleted: falling
+        back to "0" would revalidate other workers' entries built at "0".
+        It expires once every local entry it could match has.
+        """
+        self._local.pop(uid, None)
+        if self.redis is None:
+            return
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.incr(self._version_key(uid))
+                pipe.expire(self._version_key(uid), 2 * self.ttl)
+                pipe.delete(self._context_key(uid))
+                await pipe.execute()
+        except Exception as e:
+            self._redis_failed("delete profile cache", e)
+
+
+_profile_cache = None
+
+
+def get_profile_cache() -> ProfileContextCache:
+    """One cache per worker process, shared by every controller."""
+    global _profile_cache
+    if _profile_cache is None:
+        _profile_cache = ProfileContextCache(
+            redis.from_url(REDIS_URL, decode_responses=True),
+            ttl=PROFILE_CONTEXT_CACHE_TTL
+        )
+    return _profile_cache
@@ -0,0 +1,154 @@
+"""
+Single-flight deduplication of identical concurrent work.
+
+Callers that ask for the same key while a call is already running share its
+result instead of starting their own. Within a process they await one
+future. Across workers a short-lived Redis lock elects one leader, which
+publishes its result under a result key the others poll for.
+
+Redis is optional: without it (or when it is down) only in-process callers
+are coalesced.
+"""
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Any, Awaitable, Callable
+
+from core.observability.metrics import SINGLE_FLIGHT
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class SingleFlight:
+    # After a Redis failure, skip the shared path for this long
+    REDIS_RETRY_AFTER = 30.0
+
+    def __init__(
+        self,
+        name: str,
+        redis_client=None,
+        lock_ttl: float = 60.0,
+        result_ttl: float = 30.0,
+        poll_interval: float = 0.05
+    ):
+        self.name = name
+        self.redis = redis_client
+        self.lock_ttl = lock_ttl
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._redis_down_until = 0.0
+
+    async def do(
+        self,
+        operation: str,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        cacheable: Callable[[Any], bool] = bool
+    ) -> Any:
+        """
+        Run `fn` once per `key` across concurrent callers.
+        Results are shared across workers only if `cacheable(result)` is true
+        and JSON serializable; errors are never shared between workers.
+        """
+        key = f"{operation}:{key}"
+        future = self._inflight.get(key)
+        if future is not None:
+            SINGLE_FLIGHT.labels(operation, "collapsed_local").inc()
+            # shield: one impatient caller must not cancel the shared call
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._run_shared(operation, key, fn, cacheable)
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved so an unshared failure doesn't log "never retrieved"
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    # ----------------------------------
+    # Cross-worker coordination
+    # ----------------------------------
+    def _redis_available(self) -> bool:
+        return self.redis is not None and time.monotonic() >= self._redis_down_until
+
+    def _redis_failed(self, e: Exception):
+        self._redis_down_until = time.monotonic() + self.REDIS_RETRY_AFTER
+        logger.warning(f"Single-flight Redis unavailable, coalescing in-process only: {e}")
+
+    async def _run_shared(self, operation, key, fn, cacheable):
+        if not self._redis_available():
+            SINGLE_FLIGHT.labels(operation, "leader").inc()
+            return await fn()
+
+        lock_key = f"sf:{self.name}:lock:{key}"
+        result_key = f"sf:{self.name}:result:{key}"
+        token = uuid.uuid4().hex
+        try:
+            cached = await self.redis.get(result_key)
+            if cached is not None:
+                SINGLE_FLIGHT.labels(operation, "collapsed_remote").inc()
+                return json.loads(cached)
+            acquired = await self.redis.set(lock_key, token, nx=True, px=int(self.lock_ttl * 1000))
+        except Exception as e:
+            self._redis_failed(e)
+            SINGLE_FLIGHT.labels(operation, "leader").inc()
+            return await fn()
+
+        if not acquired:
+            result = await self._wait_for_leader(lock_key, result_key)
+            if result is not _MISSING:
+                SINGLE_FLIGHT.labels(operation, "collapsed_remote").inc()
+                return result
+            # Leader failed or its result wasn't shareable: do the work ourselves
+
+        SINGLE_FLIGHT.labels(operation, "leader").inc()
+        try:
+            result = await fn()
+            if cacheable(result):
+                try:
+                    await self.redis.set(result_key, json.dumps(result), px=int(self.result_ttl * 1000))
+                except (TypeError, ValueError):
+                    pass  # not JSON serializable, keep it local
+                except Exception as e:
+                    self._redis_failed(e)
+            return result
+        finally:
+            if acquired:
+                await self._release(lock_key, token)
+
+    async def _wait_for_leader(self, lock_key: str, result_key: str):
+        deadline = time.monotonic() + self.lock_ttl
+        try:
+            while time.monotonic() < deadline:
+                await asyncio.sleep(self.poll_interval)
+                cached = await self.redis.get(result_key)
+                if cached is not None:
+                    return json.loads(cached)
+                if not await self.redis.exists(lock_key):
+                    # Lock released without a result; one last look for a racing write
+                    cached = await self.redis.get(result_key)
+                    return json.loads(cached) if cached is not None else _MISSING
+        except Exception as e:
+            self._redis_failed(e)
+        return _MISSING
+
+    async def _release(self, lock_key: str, token: str):
+        try:
+            # Only delete our own lock; it may have expired and been re-acquired
+            if await self.redis.get(lock_key) == token:
+                await self.redis.delete(lock_key)
+        except Exception as e:
+            self._redis_failed(e)
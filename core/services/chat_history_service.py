@@ -2,6 +2,8 @@ from datetime import datetime
 from typing import Optional
 import uuid
 
+from core.observability.tracing import span
+
 class ChatHistoryService:
     def __init__(self, collection, llm=None):
         self.collection = collection
@@ -31,7 +33,8 @@ User message: "{message}"
 
 Title:"""
             
-            title = await self.llm.generate(prompt)
+            with span("chat_history.generate_title", prompt_chars=len(prompt)):
+                title = await self.llm.generate(prompt)
             title = title.strip().strip('"\'')
             
             # Ensure it's not too long
@@ -59,13 +62,14 @@ Title:"""
         firebase_uid: str,
         session_id: str
     ) -> bool:
-        doc = await self.collection.find_one(
-            {
-                "firebase_uid": firebase_uid,
-                "session_id": session_id
-            },
-            {"_id": 1}
-        )
+        with span("chat_history.session_exists"):
+            doc = await self.collection.find_one(
+                {
+                    "firebase_uid": firebase_uid,
+                    "session_id": session_id
+                },
+                {"_id": 1}
+            )
         return doc is not None
 
     # ----------------------------------
@@ -86,7 +90,8 @@ Title:"""
             "created_at": now,
             "updated_at": now
         }
-        await self.collection.insert_one(session_doc)
+        with span("chat_history.create_session"):
+            await self.collection.insert_one(session_doc)
         return {
             "session_id": session_id,
             "title": title,
@@ -120,29 +125,30 @@ Title:"""
         role: str,
         content: str
     ):
-        await self.collection.update_one(
-            {
-                "firebase_uid": firebase_uid,
-                "session_id": session_id
-            },
-            {
-                "$push": {
-                    "messages": {
-                        "role": role,
-                        "content": content,
-                        "timestamp": datetime.utcnow()
-                    }
+        with span("chat_history.save_message", role=role, chars=len(content)):
+            await self.collection.update_one(
+                {
+                    "firebase_uid": firebase_uid,
+                    "session_id": session_id
                 },
-                "$set": {
-                    "updated_at": datetime.utcnow()
+                {
+                    "$push": {
+                        "messages": {
+                            "role": role,
+                            "content": content,
+                            "timestamp": datetime.utcnow()
+                        }
+                    },
+                    "$set": {
+                        "updated_at": datetime.utcnow()
+                    },
+                    "$setOnInsert": {
+                        "created_at": datetime.utcnow(),
+                        "title": "New Chat"
+                    }
                 },
-                "$setOnInsert": {
-                    "created_at": datetime.utcnow(),
-                    "title": "New Chat"
-                }
-            },
-            upsert=True
-        )
+                upsert=True
+            )
 
     # ----------------------------------
     # Get a specific session
@@ -157,6 +163,26 @@ Title:"""
             "session_id": session_id
         })
 
+    # ----------------------------------
+    # Get the newest messages of a session
+    # (Used to rehydrate Redis memory)
+    # ----------------------------------
+    async def get_recent_messages(
+        self,
+        firebase_uid: str,
+        session_id: str,
+        limit: int = 20
+    ) -> list:
+        with span("chat_history.get_recent_messages", limit=limit):
+            doc = await self.collection.find_one(
+                {
+                    "firebase_uid": firebase_uid,
+                    "session_id": session_id
+                },
+                {"_id": 0, "messages": {"$slice": -limit}}
+            )
+        return doc.get("messages", []) if doc else []
+
     # ----------------------------------
     # List all sessions for a user
     # ----------------------------------
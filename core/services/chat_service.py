@@ -1,5 +1,17 @@
+import asyncio
 import json
-from prompts.medical_prompt import build_unified_chat_prompt
+import logging
+from config.settings import PROMPT_HISTORY_MESSAGES, PROMPT_TOKEN_BUDGET
+from core.observability.metrics import PROMPT_TOKENS, observe_stage
+from core.observability.tracing import span
+from core.services.prompt_assembler import PromptAssembler
+from infrastructure.llm.token_estimator import estimate_tokens
+from prompts.medical_prompt import UNIFIED_CHAT_SYSTEM_PROMPT, build_unified_chat_turn
+
+logger = logging.getLogger(__name__)
+
+# The static instructions are sent as the system instruction; count them once
+SYSTEM_PROMPT_TOKENS = estimate_tokens(UNIFIED_CHAT_SYSTEM_PROMPT)
 
 
 class ChatService:
@@ -13,7 +25,10 @@ class ChatService:
         embedding_service,
         followup,
         compliance,
-        chat_history
+        chat_history,
+        summarizer=None,
+        semantic_memory=None,
+        retriever=None
     ):
         self.llm = llm
         self.emergency = emergency
@@ -24,6 +39,10 @@ class ChatService:
         self.followup = followup
         self.compliance = compliance
         self.chat_history = chat_history
+        self.summarizer = summarizer
+        self.semantic_memory = semantic_memory
+        self.retriever = retriever  # hybrid document search; plain FAISS if None
+        self.assembler = PromptAssembler(PROMPT_TOKEN_BUDGET)
 
     async def analyze(
         self,
@@ -39,52 +58,28 @@ class ChatService:
         - Returns plain conversational text
         """
 
-        # Save user message to Redis (plain text format)
-        await self.redis.save_message(firebase_uid, session_id, "user", message)
-        
-        # Save user message to MongoDB history
-        await self.chat_history.save_message(
-            firebase_uid=firebase_uid,
-            session_id=session_id,
-            role="user",
-            content=message
-        )
+        with span("chat.analyze", session_id=session_id, message_chars=len(message)):
+            return await self._analyze(firebase_uid, session_id, message)
+
+    async def _analyze(self, firebase_uid: str, session_id: str, message: str) -> dict:
+        # Persist the user message to Redis and MongoDB history
+        await self._save_turn(firebase_uid, session_id, "user", message)
 
         # Emergency override - use enhanced emergency detection
-        if self.emergency.is_emergency(message):
+        with observe_stage("chat", "emergency"):
+            is_emergency = self.emergency.is_emergency(message)
+        if is_emergency:
             return await self._handle_emergency(firebase_uid, session_id, message)
 
-        # Get conversation history from Redis (plain text)
-        conversation_history = await self.redis.get_conversation_history(
-            firebase_uid, session_id, limit=10
-        )
-        
-        # Get user profile context
-        profile_context = await self.context_service.build_context(firebase_uid)
-        
-        # Get document context if available
-        document_context = await self._get_document_context(
-            firebase_uid, session_id, message
-        )
-
-        # Build unified prompt with strong continuity enforcement
-        prompt = build_unified_chat_prompt(
-            user_message=message,
-            conversation_history=conversation_history,
-            user_profile=profile_context,
-            document_context=document_context
-        )
+        prompt = await self._build_prompt(firebase_uid, session_id, message)
 
         # Generate plain text response
-        response_text = await self._generate_plain_response(prompt)
+        with observe_stage("chat", "llm"):
+            response_text = await self._generate_plain_response(prompt)
 
-        # Save assistant response to Redis (plain text format)
-        await self.redis.save_message(firebase_uid, session_id, "assistant", response_text)
-        
-        # Save to MongoDB history
-        await self.chat_history.save_message(
-            firebase_uid, session_id, "assistant", response_text
-        )
+        # Save assistant response to Redis and MongoDB history
+        await self._save_turn(firebase_uid, session_id, "assistant", response_text)
+        self._remember_exchange(firebase_uid, session_id, message, response_text)
 
         return {
             "session_id": session_id,
@@ -103,56 +98,142 @@ class ChatService:
         Yields text tokens as they arrive from the LLM.
         """
 
-        # Save user message to Redis (plain text format)
-        await self.redis.save_message(firebase_uid, session_id, "user", message)
-        
-        # Save user message to MongoDB history
-        await self.chat_history.save_message(
-            firebase_uid=firebase_uid,
-            session_id=session_id,
-            role="user",
-            content=message
-        )
+        # Persist the user message to Redis and MongoDB history
+        await self._save_turn(firebase_uid, session_id, "user", message)
 
         # Emergency override - use enhanced emergency detection
         emergency_response = self.emergency.get_emergency_response(message)
         if emergency_response["is_emergency"]:
             response_text = emergency_response["message"]
             yield response_text
-            await self.redis.save_message(firebase_uid, session_id, "assistant", response_text)
-            await self.chat_history.save_message(firebase_uid, session_id, "assistant", response_text)
+            await self._save_turn(firebase_uid, session_id, "assistant", response_text)
             return
 
-        # Get conversation history from Redis (plain text)
-        conversation_history = await self.redis.get_conversation_history(
-            firebase_uid, session_id, limit=10
-        )
-        
-        # Get user profile context
-        profile_context = await self.context_service.build_context(firebase_uid)
-        
-        # Get document context if available
-        document_context = await self._get_document_context(
-            firebase_uid, session_id, message
-        )
-
-        # Build unified prompt with strong continuity enforcement
-        prompt = build_unified_chat_prompt(
-            user_message=message,
-            conversation_history=conversation_history,
-            user_profile=profile_context,
-            document_context=document_context
-        )
+        prompt = await self._build_prompt(firebase_uid, session_id, message)
 
         # Stream response
         full_response = ""
-        async for chunk in self.llm.stream(prompt):
-            full_response += chunk
-            yield chunk
+        with observe_stage("chat", "llm_stream"):
+            async for chunk in self.llm.stream(prompt, system_instruction=UNIFIED_CHAT_SYSTEM_PROMPT):
+                full_response += chunk
+                yield chunk
 
         # Save complete response to Redis and MongoDB after streaming
-        await self.redis.save_message(firebase_uid, session_id, "assistant", full_response)
-        await self.chat_history.save_message(firebase_uid, session_id, "assistant", full_response)
+        await self._save_turn(firebase_uid, session_id, "assistant", full_response)
+        self._remember_exchange(firebase_uid, session_id, message, full_response)
+
+    async def _save_turn(self, firebase_uid: str, session_id: str, role: str, content: str):
+        """Append one message to the Redis memory and the MongoDB session."""
+        with observe_stage("chat", "redis_save"):
+            await self.redis.save_message(firebase_uid, session_id, role, content)
+
+        with observe_stage("chat", "mongo_save"):
+            await self.chat_history.save_message(
+                firebase_uid=firebase_uid,
+                session_id=session_id,
+                role=role,
+                content=content
+            )
+
+        # Completed exchange: fold old turns into the summary if the list is long
+        if role == "assistant" and self.summarizer:
+            self.summarizer.schedule(firebase_uid, session_id)
+
+    def _remember_exchange(self, firebase_uid: str, session_id: str, message: str, response: str):
+        """Index the exchange into long-term memory, in the background."""
+        if self.semantic_memory and response.strip():
+            self.semantic_memory.schedule_add(firebase_uid, session_id, message, response)
+
+    async def _build_prompt(self, firebase_uid: str, session_id: str, message: str) -> str:
+        """
+        Gather history, profile and document context into the per-turn prompt.
+        The static instructions (UNIFIED_CHAT_SYSTEM_PROMPT) are not included;
+        they go to the LLM as the system instruction.
+        """
+        # Get recent conversation turns from Redis (plain text, oldest first).
+        # With a summarizer, take every message since the last fold (at most
+        # its trigger count): the summary covers the older ones, and the
+        # assembler trims this window to the token budget.
+        limit = PROMPT_HISTORY_MESSAGES
+        if self.summarizer is not None:
+            limit = max(limit, self.summarizer.trigger)
+        with observe_stage("chat", "redis_history"):
+            history = await self.redis.get_recent_messages(firebase_uid, session_id, limit=limit)
+            summary = await self.redis.get_summary(firebase_uid, session_id)
+
+        # Get user profile context
+        with observe_stage("chat", "profile_context"):
+            profile_context = await self.context_service.build_context(firebase_uid)
+
+        # One query embedding serves both document search and long-term memory
+        has_documents = self.faiss.has_documents(firebase_uid, session_id)
+        has_memories = bool(self.semantic_memory) and self.semantic_memory.has_memories(firebase_uid)
+        query_embedding = []
+        if has_documents or has_memories:
+            with observe_stage("chat", "embedding"):
+                query_embedding = await self.embedder.embed(message)
+
+        # Get document chunks if available, most relevant first
+        document_chunks = []
+        if has_documents:
+            document_chunks = await self._get_document_chunks(
+                firebase_uid, session_id, message, query_embedding
+            )
+
+        # Relevant exchanges from the user's earlier sessions (own token budget)
+        past_exchanges = []
+        if has_memories:
+            past_exchanges = await self.semantic_memory.recall(
+                firebase_uid, query_embedding, exclude_session=session_id
+            )
+        past_conversations = "\n\n".join(past_exchanges)
+
+        # Build unified prompt with strong continuity enforcement
+        with observe_stage("chat", "prompt_build") as stage_span:
+            context = self.assembler.assemble(
+                message=message,
+                history=history,
+                profile=profile_context,
+                document_chunks=document_chunks,
+                summary=summary,
+                reserved_tokens=estimate_tokens(past_conversations)
+            )
+            prompt = build_unified_chat_turn(
+                user_message=message,
+                conversation_history=context.history,
+                user_profile=context.profile,
+                document_context=context.document,
+                past_conversations=past_conversations
+            )
+            stage_span.set_attribute("history_chars", len(context.history))
+            stage_span.set_attribute("profile_chars", len(context.profile))
+            stage_span.set_attribute("document_chars", len(context.document))
+            stage_span.set_attribute("prompt_chars", len(prompt))
+            for name, count in context.dropped.items():
+                stage_span.set_attribute(f"dropped_{name}", count)
+            if context.dropped:
+                logger.info(f"Prompt trimmed to {PROMPT_TOKEN_BUDGET} token budget: {context.dropped}")
+            self._report_prompt_size(stage_span, {
+                **context.tokens,
+                "memory": estimate_tokens(past_conversations),
+                "message": estimate_tokens(message),
+                "turn": estimate_tokens(prompt),
+            })
+        return prompt
+
+    def _report_prompt_size(self, stage_span, tokens: dict):
+        """
+        Per-turn prompt size report: estimated tokens per section, plus the
+        static system prompt that is no longer part of the turn text.
+        """
+        tokens = {**tokens, "system": SYSTEM_PROMPT_TOKENS}
+        for name, count in tokens.items():
+            PROMPT_TOKENS.labels(name).observe(count)
+            stage_span.set_attribute(f"{name}_tokens", count)
+        logger.debug(
+            "Prompt tokens: "
+            + ", ".join(f"{name}={count}" for name, count in tokens.items())
+        )
 
     async def _handle_emergency(self, firebase_uid: str, session_id: str, user_message: str) -> dict:
         """Handle emergency situations with immediate response using enhanced detection."""
@@ -167,10 +248,7 @@ class ChatService:
             )
             message += resources_text
 
-        await self.redis.save_message(firebase_uid, session_id, "assistant", message)
-        await self.chat_history.save_message(
-            firebase_uid, session_id, "assistant", message
-        )
+        await self._save_turn(firebase_uid, session_id, "assistant", message)
 
         return {
             "session_id": session_id,
@@ -180,91 +258,37 @@ class ChatService:
             "matched_keywords": emergency_response["matched_keywords"]
         }
 
-    async def _get_document_context(
+    async def _get_document_chunks(
         self,
         firebase_uid: str,
         session_id: str,
-        message: str
-    ) -> str:
+        message: str,
+        query_embedding: list
+    ) -> list[str]:
         """
-        Get document context if documents exist for this session.
-        Returns formatted document chunks or "No document provided."
+        Get the session's document chunks most relevant to the query, best
+        first. Returns a single status line on a miss/failure.
         """
-        # Check if documents exist for this session
-        has_documents = self.faiss.has_documents(firebase_uid, session_id)
-        
-        if not has_documents:
-            return "No document provided."
-        
         try:
             # Search for relevant document chunks
-            query_embedding = await self.embedder.embed(message)
-            faiss_results = self._search_document_store(
-                firebase_uid, session_id, query_embedding
-            )
+            with observe_stage("chat", "faiss_search") as stage_span:
+                if self.retriever is not None:
+                    faiss_results = await asyncio.to_thread(
+                        self.retriever.search, firebase_uid, session_id, message, query_embedding, 5
+                    )
+                else:
+                    faiss_results = await asyncio.to_thread(
+                        self.faiss.search, firebase_uid, session_id, query_embedding, 5
+                    )
+                stage_span.set_attribute("chunk_count", len(faiss_results))
             
             if not faiss_results:
-                return "Document uploaded but no relevant sections found for this query."
-            
-            # Format document chunks
-            chunks = []
-            for chunk in faiss_results[:5]:
-                if isinstance(chunk, dict):
-                    chunks.append(chunk.get("text", str(chunk)))
-                else:
-                    chunks.append(str(chunk))
+                return ["Document uploaded but no relevant sections found for this query."]
             
-            return "\n\n".join(chunks)
+            # Chunk texts, keeping the search ranking
+            return [chunk.get("text", "") for chunk in faiss_results]
         except Exception as e:
-            return f"Document context unavailable: {str(e)}"
-
-    def _search_document_store(self, uid: str, session_id: str, query_embedding: list) -> list:
-        """
-        Search the document vector store for relevant chunks.
-        Handles both FaissService and FaissVectorStore patterns.
-        """
-        import os
-        import pickle
-        import faiss
-        import numpy as np
-
-        # Try document-specific index first (created by upload-document)
-        doc_index_path = f"{self.faiss.base_path}/{uid}_{session_id}_docs.index"
-        meta_path = doc_index_path + ".meta"
-
-        if os.path.exists(doc_index_path) and os.path.exists(meta_path):
-            try:
-                index = faiss.read_index(doc_index_path)
-                with open(meta_path, "rb") as f:
-                    metadata = pickle.load(f)
-
-                if not query_embedding:
-                    return []
-
-                D, I = index.search(
-                    np.array([query_embedding]).astype("float32"),
-                    15  # over-fetch for filtering
-                )
-
-                results = []
-                for idx in I[0]:
-                    if idx < 0 or idx >= len(metadata):
-                        continue
-                    meta = metadata[idx]
-                    if (
-                        meta.get("user_id") == uid and
-                        meta.get("chat_session_id") == session_id
-                    ):
-                        results.append(meta)
-                    if len(results) >= 5:
-                        break
-
-                return results
-            except Exception:
-                pass
-
-        # Fallback to standard faiss service search
-        return self.faiss.search(uid, session_id, query_embedding)
+            return [f"Document context unavailable: {str(e)}"]
 
     def _format_memory(self, messages: list) -> str:
         """
@@ -282,10 +306,9 @@ class ChatService:
         Generate a plain text response (not JSON).
         Uses a modified prompt to avoid JSON output.
         """
-        import logging
         try:
             # Try to get plain text response
-            response = await self.llm.generate(prompt)
+            response = await self.llm.generate(prompt, system_instruction=UNIFIED_CHAT_SYSTEM_PROMPT)
             # If response looks like JSON, extract the text
             if response.strip().startswith("{"):
                 try:
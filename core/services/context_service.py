@@ -1,16 +1,32 @@
+from core.observability.tracing import span
+
+
 class ContextService:
-    def __init__(self, users_collection):
+    def __init__(self, users_collection, cache=None, user_loader=None):
         self.users = users_collection
+        self.cache = cache
+        self.user_loader = user_loader
 
     async def build_context(self, firebase_uid: str) -> str:
         """
         Builds contextual information from the user's long-term medical profile.
+        Served from the profile cache while the profile version is unchanged.
         """
+        if self.cache:
+            return await self.cache.get_or_build(
+                firebase_uid, lambda: self._load_context(firebase_uid)
+            )
+        return await self._load_context(firebase_uid)
 
-        user = await self.users.find_one(
-            {"firebase_uid": firebase_uid},
-            {"_id": 0, "profile": 1}
-        )
+    async def _load_context(self, firebase_uid: str) -> str:
+        with span("context.profile_lookup"):
+            if self.user_loader:
+                user = await self.user_loader.load(firebase_uid)
+            else:
+                user = await self.users.find_one(
+                    {"firebase_uid": firebase_uid},
+                    {"_id": 0, "profile": 1}
+                )
 
         if not user or "profile" not in user:
             return "No prior medical history available."
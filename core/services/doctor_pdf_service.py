@@ -1,11 +1,13 @@
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
 from io import BytesIO
 from datetime import datetime
 
 class DoctorSummaryPDFService:
 
     def generate_pdf(self, profile: dict, report_analysis: dict) -> bytes:
+        # reportlab is only needed when a PDF is requested; keep it off startup
+        from reportlab.lib.pagesizes import A4
+        from reportlab.pdfgen import canvas
+
         buffer = BytesIO()
         c = canvas.Canvas(buffer, pagesize=A4)
         width, height = A4
@@ -1,9 +1,11 @@
+import asyncio
 import uuid
 
 class ChatDocumentService:
-    def __init__(self, vector_store, embedder):
+    def __init__(self, vector_store, embedder, lexical_index=None):
         self.vector_store = vector_store
         self.embedder = embedder
+        self.lexical_index = lexical_index
 
     async def ingest_document(
         self,
@@ -28,7 +30,11 @@ class ChatDocumentService:
                 "text": chunk
             })
 
-        self.vector_store.add(vectors, metadata)
+        ids = await asyncio.to_thread(
+            self.vector_store.add_documents, user_id, chat_session_id, vectors, metadata
+        )
+        if self.lexical_index is not None:
+            await asyncio.to_thread(self.lexical_index.add, user_id, chat_session_id, ids, chunks)
         return document_id
 
     def _chunk(self, text, size=500, overlap=50):
@@ -1,48 +1,63 @@
-import os
-import faiss
-import numpy as np
+from core.observability.tracing import span
+from core.services.vector.faiss_store import FaissVectorStore, is_reserved_session
+
+# faiss and numpy are imported on first use (inside FaissVectorStore) to keep
+# application startup fast.
+
+
+def _check_session(session_id: str):
+    if is_reserved_session(session_id):
+        raise ValueError(f"Session id {session_id!r} is reserved")
+
 
 class FaissService:
+    """
+    Entry point for session document vectors. Upload, chat and RAG all go
+    through the same FaissVectorStore, one partition per user session.
+    Methods do blocking file I/O; call them via asyncio.to_thread from
+    request handlers. Reserved (internal) session names are refused.
+    """
+
     def __init__(self, base_path="faiss_store"):
         self.base_path = base_path
-        os.makedirs(base_path, exist_ok=True)
-
-    def _index_path(self, uid, session_id):
-        return f"{self.base_path}/{uid}_{session_id}.index"
+        self.store = FaissVectorStore(base_path)
 
-    def add_documents(self, uid, session_id, embeddings):
-        dim = len(embeddings[0])
-        index = faiss.IndexFlatL2(dim)
-        index.add(np.array(embeddings).astype("float32"))
-        faiss.write_index(index, self._index_path(uid, session_id))
+    def add_documents(self, uid, session_id, embeddings, metadata=None) -> list[int]:
+        _check_session(session_id)
+        if metadata is None:
+            metadata = [{} for _ in embeddings]
+        return self.store.add(uid, session_id, embeddings, metadata)
 
-    def search(self, uid, session_id, query_embedding, k=5):
-        path = self._index_path(uid, session_id)
-        if not os.path.exists(path):
-            return []
-
-        index = faiss.read_index(path)
-        _, results = index.search(
-            np.array([query_embedding]).astype("float32"), k
-        )
-        return results[0].tolist()
+    def search(self, uid, session_id, query_embedding, k=5, document_ids=None) -> list[dict]:
+        """Top-k chunk metadata (with `score`) of the session, most relevant first."""
+        _check_session(session_id)
+        return self.store.search(uid, session_id, query_embedding, k=k, document_ids=document_ids)
 
     def has_documents(self, uid, session_id) -> bool:
         """Check if any documents exist for this user/session."""
-        # Check for standard index
-        path = self._index_path(uid, session_id)
-        if os.path.exists(path):
-            return True
-        # Check for document index (created by chat_document_controller)
-        doc_path = f"{self.base_path}/{uid}_{session_id}_docs.index"
-        return os.path.exists(doc_path)
+        _check_session(session_id)
+        with span("faiss.has_documents"):
+            return self.store.has_documents(uid, session_id)
+
+    def get_chunks(self, uid, session_id, ids) -> list:
+        _check_session(session_id)
+        return self.store.get_chunks(uid, session_id, ids)
+
+    def get_vectors(self, uid, session_id, ids):
+        _check_session(session_id)
+        return self.store.get_vectors(uid, session_id, ids)
+
+    def chunk_count(self, uid, session_id) -> int:
+        _check_session(session_id)
+        return self.store.chunk_count(uid, session_id)
+
+    def chunk_texts(self, uid, session_id, start=0) -> tuple[list[int], list[str]]:
+        _check_session(session_id)
+        return self.store.chunk_texts(uid, session_id, start=start)
 
     def delete(self, uid, session_id):
-        path = self._index_path(uid, session_id)
-        if os.path.exists(path):
-            os.remove(path)
-    
+        _check_session(session_id)
+        self.store.delete(uid, session_id)
+
     def delete_all_for_user(self, firebase_uid: str):
-        for file in os.listdir(self.base_path):
-            if file.startswith(f"{firebase_uid}_") and file.endswith(".index"):
-                os.remove(os.path.join(self.base_path, file))
\ No newline at end of file
+        self.store.delete_all_for_user(firebase_uid)
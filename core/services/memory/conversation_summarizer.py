@@ -0,0 +1,73 @@
+import asyncio
+import json
+import logging
+
+from core.observability.metrics import observe_stage
+from prompts.conversation_summary_prompt import build_conversation_summary_prompt
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationSummarizer:
+    """
+    Keeps the Redis history of a session bounded. Once the message list
+    grows past `trigger` messages, everything but the newest `keep_recent`
+    is folded into a rolling summary (in the background) and trimmed away.
+    """
+
+    def __init__(self, llm, redis_memory, trigger: int = 20, keep_recent: int = 10):
+        self.llm = llm
+        self.redis = redis_memory
+        self.trigger = trigger
+        self.keep_recent = keep_recent
+        self._tasks: dict[tuple[str, str], asyncio.Task] = {}
+
+    def schedule(self, user_id: str, session_id: str):
+        """Fold the session in the background if needed; never blocks the caller."""
+        key = (user_id, session_id)
+        if key in self._tasks:
+            return
+        task = asyncio.get_running_loop().create_task(self._run(user_id, session_id))
+        self._tasks[key] = task
+        task.add_done_callback(lambda _: self._tasks.pop(key, None))
+
+    async def _run(self, user_id: str, session_id: str):
+        try:
+            await self.fold(user_id, session_id)
+        except Exception:
+            logger.exception(f"Summarizing session {session_id} failed")
+
+    async def fold(self, user_id: str, session_id: str) -> bool:
+        """Summarize and trim the oldest messages. Returns True if the session was folded."""
+        if await self.redis.count_messages(user_id, session_id) <= self.trigger:
+            return False
+        if not await self.redis.acquire_summary_lock(user_id, session_id):
+            return False  # another worker is on it
+
+        try:
+            # Re-count under the lock; another worker may just have folded
+            count = await self.redis.count_messages(user_id, session_id)
+            fold_count = count - self.keep_recent
+            if count <= self.trigger or fold_count <= 0:
+                return False
+
+            messages = await self.redis.get_oldest_messages(user_id, session_id, fold_count)
+            previous = await self.redis.get_summary(user_id, session_id)
+
+            with observe_stage("memory", "summarize", folded=len(messages)):
+                raw = await self.llm.generate(
+                    build_conversation_summary_prompt(previous, "\n".join(messages))
+                )
+
+            try:
+                summary = str(json.loads(raw)["summary"]).strip()
+            except (json.JSONDecodeError, KeyError, TypeError):
+                # Keep the full history rather than lose it to a bad output
+                logger.warning(f"Invalid summary output for session {session_id}")
+                return False
+            if not summary:
+                return False
+
+            return await self.redis.apply_summary(user_id, session_id, summary, messages)
+        finally:
+            await self.redis.release_summary_lock(user_id, session_id)
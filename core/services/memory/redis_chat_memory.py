@@ -1,42 +1,130 @@
 import redis.asyncio as redis
 import logging
+import time
+
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.exceptions import TimeoutError as RedisTimeoutError
+from redis.exceptions import WatchError
+
+from core.observability.metrics import observe_stage
+from core.observability.tracing import span
+from core.services.cache.single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
+SESSION_TTL = 60 * 60 * 24  # 24h
+# Marks the one-time indexing of session keys written before the index existed
+BACKFILL_KEY = "chat_index:backfill"
+
+
 class RedisChatMemory:
-    def __init__(self, url: str):
-        self.client = redis.from_url(url, decode_responses=True)
+    def __init__(
+        self,
+        url: str,
+        max_messages: int = 100,
+        max_connections: int = 50,
+        socket_timeout: float = 2.0,
+        recheck_interval: float = 10.0,
+        history_loader=None,
+        rehydrate_messages: int = 20
+    ):
+        pool = redis.ConnectionPool.from_url(
+            url,
+            decode_responses=True,
+            max_connections=max_connections,
+            socket_timeout=socket_timeout,
+            socket_connect_timeout=socket_timeout,
+            health_check_interval=30,
+            retry_on_timeout=True,
+        )
+        self.client = redis.Redis(connection_pool=pool)
+        self.max_messages = max_messages
+        self.recheck_interval = recheck_interval
         self.connected = None  # Will be set on first operation
+        self._next_check = 0.0
+        # async (user_id, session_id, limit) -> [{"role", "content"}], oldest first.
+        # Redis acts as a read-through cache over it: an expired session is
+        # reloaded from there on the next access.
+        self.history_loader = history_loader
+        self.rehydrate_messages = rehydrate_messages
+        # Rehydration runs on the request path: followers wait at most a few
+        # seconds for another worker's load before doing it themselves
+        self._single_flight = SingleFlight(
+            "redis_memory", redis_client=self.client, lock_ttl=5.0, result_ttl=5.0
+        )
 
     async def _ensure_connection(self):
-        """Check if Redis is available"""
-        if self.connected is None:
-            try:
-                await self.client.ping()
-                self.connected = True
-                logger.info("Redis connection established")
-            except Exception as e:
-                self.connected = False
-                logger.warning(f"Redis unavailable: {e}. Continuing without Redis memory.")
+        """
+        Check if Redis is available.
+        While it is down, a ping is retried every `recheck_interval` seconds,
+        so memory comes back on its own once Redis does.
+        """
+        if self.connected:
+            return True
+        if self.connected is False and time.monotonic() < self._next_check:
+            return False
+        try:
+            await self.client.ping()
+            self.connected = True
+            logger.info("Redis connection established")
+        except Exception as e:
+            self._mark_unavailable(e)
         return self.connected
 
+    def _mark_unavailable(self, e: Exception):
+        if self.connected is not False:
+            logger.warning(f"Redis unavailable: {e}. Continuing without Redis memory.")
+        self.connected = False
+        self._next_check = time.monotonic() + self.recheck_interval
+
+    def _failed(self, action: str, e: Exception):
+        if isinstance(e, (RedisConnectionError, RedisTimeoutError)):
+            self._mark_unavailable(e)
+        else:
+            logger.warning(f"Failed to {action}: {e}")
+
+    @staticmethod
+    def _index_key(user_id: str) -> str:
+        """Set of the user's session ids, so deletion never scans the keyspace."""
+        return f"chat_index:{user_id}"
+
+    @staticmethod
+    def format_message(role: str, content: str) -> str:
+        role_label = "User" if role.lower() == "user" else "Assistant"
+        return f"{role_label}: {content}"
+
     async def save_message(self, user_id: str, session_id: str, role: str, content: str):
         """
         Save message as plain text in format: 'Role: content'
         No JSON blobs - just plain readable text.
+        Append, cap and TTL refresh go out as one MULTI round trip.
+        If the append created the list, the session had expired (or is new)
+        and its earlier messages are reloaded in front of this one.
         """
         if not await self._ensure_connection():
             return  # Silently skip if Redis unavailable
-        
+
         try:
             key = f"chat:{user_id}:{session_id}"
             # Store as plain text: "User: message" or "Assistant: message"
-            role_label = "User" if role.lower() == "user" else "Assistant"
-            plain_text = f"{role_label}: {content}"
-            await self.client.rpush(key, plain_text)
-            await self.client.expire(key, 60 * 60 * 24)  # 24h TTL
+            plain_text = self.format_message(role, content)
+            with span("redis.save_message", chars=len(plain_text)):
+                async with self.client.pipeline(transaction=True) as pipe:
+                    pipe.rpush(key, plain_text)
+                    pipe.ltrim(key, -self.max_messages, -1)
+                    pipe.expire(key, SESSION_TTL)
+                    # Keep the rolling summary alive as long as the messages
+                    pipe.expire(f"{key}:summary", SESSION_TTL)
+                    # Index the session; the index outlives every session it lists
+                    pipe.sadd(self._index_key(user_id), session_id)
+                    pipe.expire(self._index_key(user_id), SESSION_TTL)
+                    length, *_ = await pipe.execute()
         except Exception as e:
-            logger.warning(f"Failed to save message to Redis: {e}")
+            self._failed("save message to Redis", e)
+            return
+
+        if length == 1:
+            await self._rehydrate(user_id, session_id, present=1)
 
     async def get_recent_messages(self, user_id: str, session_id: str, limit=10):
         """
@@ -45,16 +133,20 @@ class RedisChatMemory:
         """
         if not await self._ensure_connection():
             return []  # Return empty list if Redis unavailable
-        
+
         try:
             key = f"chat:{user_id}:{session_id}"
-            messages = await self.client.lrange(key, -limit, -1)
+            with span("redis.get_recent_messages", limit=limit) as redis_span:
+                messages = await self.client.lrange(key, -limit, -1)
+                if not messages and await self._rehydrate(user_id, session_id, present=0):
+                    messages = await self.client.lrange(key, -limit, -1)
+                redis_span.set_attribute("count", len(messages))
             # Messages are already plain text strings
             return messages
         except Exception as e:
-            logger.warning(f"Failed to get messages from Redis: {e}")
+            self._failed("get messages from Redis", e)
             return []
-    
+
     async def get_conversation_history(self, user_id: str, session_id: str, limit=10) -> str:
         """
         Get formatted conversation history as a single string.
@@ -65,37 +157,234 @@ class RedisChatMemory:
             return "No previous conversation."
         return "\n".join(messages)
 
+    # ----------------------------------
+    # Rehydration from the durable history
+    # ----------------------------------
+    async def _rehydrate(self, user_id: str, session_id: str, present: int) -> int:
+        """
+        Reload the newest messages of an expired session in front of the
+        `present` ones already in the list. Concurrent misses for a session,
+        in this worker or others, share one load. Returns the number of
+        messages restored (by this call or the leader it waited for); the
+        list itself is then re-read from Redis, never reloaded from MongoDB.
+        """
+        if not self.history_loader:
+            return 0
+        try:
+            return await self._single_flight.do(
+                "rehydrate",
+                f"{user_id}:{session_id}",
+                lambda: self._load_history(user_id, session_id, present),
+                # Share every count, 0 included: followers on other workers
+                # only need to know the leader is done
+                cacheable=lambda _: True
+            )
+        except Exception as e:
+            self._failed("rehydrate Redis memory", e)
+            return 0
+
+    async def _load_history(self, user_id: str, session_id: str, present: int) -> int:
+        with observe_stage("memory", "rehydrate") as stage_span:
+            stored = await self.history_loader(user_id, session_id, self.rehydrate_messages)
+            older = [self.format_message(m["role"], m["content"]) for m in stored]
+            if not older:
+                return 0
+
+            try:
+                restored = await self._prepend(user_id, session_id, older, present)
+            except WatchError:
+                restored = 0  # list changed under us; a later miss retries
+            stage_span.set_attribute("restored", restored)
+        if restored:
+            logger.info(f"Rehydrated {restored} messages for session {session_id}")
+        return restored
+
+    async def _prepend(self, user_id: str, session_id: str, older: list[str], present: int) -> int:
+        key = f"chat:{user_id}:{session_id}"
+        async with self.client.pipeline(transaction=True) as pipe:
+            await pipe.watch(key)
+            current = await pipe.lrange(key, 0, -1)
+            if len(current) != present:
+                return 0  # the list moved on (or was reloaded) meanwhile
+            # The durable copy may already hold the messages just pushed
+            overlap = next(
+                k for k in range(min(len(older), len(current)), -1, -1)
+                if older[len(older) - k:] == current[:k]
+            )
+            older = older[:len(older) - overlap]
+            if not older:
+                return 0
+            pipe.multi()
+            pipe.lpush(key, *reversed(older))
+            pipe.ltrim(key, -self.max_messages, -1)
+            pipe.expire(key, SESSION_TTL)
+            pipe.sadd(self._index_key(user_id), session_id)
+            pipe.expire(self._index_key(user_id), SESSION_TTL)
+            await pipe.execute()
+        return len(older)
+
+    # ----------------------------------
+    # Rolling summary
+    # ----------------------------------
+    async def get_summary(self, user_id: str, session_id: str) -> str:
+        """Summary of the turns already folded out of the message list ("" if none)."""
+        if not await self._ensure_connection():
+            return ""
+
+        try:
+            with span("redis.get_summary"):
+                return await self.client.get(f"chat:{user_id}:{session_id}:summary") or ""
+        except Exception as e:
+            self._failed("get summary from Redis", e)
+            return ""
+
+    async def count_messages(self, user_id: str, session_id: str) -> int:
+        if not await self._ensure_connection():
+            return 0
+
+        try:
+            return await self.client.llen(f"chat:{user_id}:{session_id}")
+        except Exception as e:
+            self._failed("count Redis messages", e)
+            return 0
+
+    async def get_oldest_messages(self, user_id: str, session_id: str, count: int) -> list[str]:
+        if not await self._ensure_connection():
+            return []
+
+        try:
+            return await self.client.lrange(f"chat:{user_id}:{session_id}", 0, count - 1)
+        except Exception as e:
+            self._failed("get messages from Redis", e)
+            return []
+
+    async def acquire_summary_lock(self, user_id: str, session_id: str, ttl: int = 120) -> bool:
+        """Only one worker folds a session at a time."""
+        if not await self._ensure_connection():
+            return False
+
+        try:
+            key = f"chat:{user_id}:{session_id}:summary_lock"
+            return bool(await self.client.set(key, "1", nx=True, ex=ttl))
+        except Exception as e:
+            self._failed("acquire Redis summary lock", e)
+            return False
+
+    async def release_summary_lock(self, user_id: str, session_id: str):
+        try:
+            await self.client.delete(f"chat:{user_id}:{session_id}:summary_lock")
+        except Exception as e:
+            self._failed("release Redis summary lock", e)
+
+    async def apply_summary(self, user_id: str, session_id: str, summary: str, folded: list[str]) -> bool:
+        """
+        Store the new summary and drop the `folded` messages from the head of
+        the list. The list only grows at the tail, but the cap in save_message
+        may have trimmed part of the folded head meanwhile, so the head is
+        re-read under WATCH and only what is left of `folded` is removed.
+        """
+        key = f"chat:{user_id}:{session_id}"
+        try:
+            with span("redis.apply_summary", folded=len(folded)):
+                async with self.client.pipeline(transaction=True) as pipe:
+                    await pipe.watch(key)
+                    head = await pipe.lrange(key, 0, len(folded) - 1)
+                    remaining = next(
+                        len(folded) - skip for skip in range(len(folded) + 1)
+                        if head[:len(folded) - skip] == folded[skip:]
+                    )
+                    pipe.multi()
+                    pipe.set(f"{key}:summary", summary, ex=SESSION_TTL)
+                    pipe.ltrim(key, remaining, -1)
+                    await pipe.execute()
+            return True
+        except WatchError:
+            return False  # list changed under us; the next exchange retries
+        except Exception as e:
+            self._failed("store summary in Redis", e)
+            return False
+
+    # ----------------------------------
+    # Deletion
+    # ----------------------------------
+    @staticmethod
+    def _session_keys(user_id: str, session_id: str) -> list[str]:
+        key = f"chat:{user_id}:{session_id}"
+        return [key, f"{key}:summary", f"{key}:summary_lock"]
+
     async def clear(self, user_id: str, session_id: str):
         """Clear all messages for a session from Redis"""
         if not await self._ensure_connection():
             return  # Silently skip if Redis unavailable
-        
+
         try:
-            key = f"chat:{user_id}:{session_id}"
-            await self.client.delete(key)
+            async with self.client.pipeline(transaction=True) as pipe:
+                pipe.delete(*self._session_keys(user_id, session_id))
+                pipe.srem(self._index_key(user_id), session_id)
+                await pipe.execute()
             logger.info(f"Cleared Redis memory for session: {session_id}")
         except Exception as e:
-            logger.warning(f"Failed to clear Redis memory: {e}")
+            self._failed("clear Redis memory", e)
 
-    async def clear_all_for_user(self, user_id: str):
-        """Clear all sessions for a user from Redis"""
+    async def clear_all_for_user(self, user_id: str, batch_size: int = 500):
+        """
+        Clear all sessions for a user from Redis.
+        Cost is O(user's sessions): keys come from the per-user index rather
+        than a keyspace SCAN (which is only used until the backfill is done).
+        """
         if not await self._ensure_connection():
             return  # Silently skip if Redis unavailable
-        
+
+        try:
+            if await self.client.get(BACKFILL_KEY) != "done":
+                keys = [key async for key in self.client.scan_iter(match=f"chat:{user_id}:*", count=500)]
+            else:
+                session_ids = await self.client.smembers(self._index_key(user_id))
+                keys = [k for sid in session_ids for k in self._session_keys(user_id, sid)]
+            keys.append(self._index_key(user_id))
+
+            async with self.client.pipeline(transaction=False) as pipe:
+                for start in range(0, len(keys), batch_size):
+                    pipe.delete(*keys[start:start + batch_size])
+                deleted = await pipe.execute()
+
+            logger.info(f"Cleared {sum(deleted)} Redis keys for user: {user_id}")
+        except Exception as e:
+            self._failed("clear all Redis sessions", e)
+
+    async def backfill_session_index(self, batch_size: int = 1000) -> int:
+        """
+        One-time SCAN that indexes session keys written before the per-user
+        index existed. Runs once per deployment: the first worker to take
+        BACKFILL_KEY does it, and marks it done for good when it finishes.
+        Returns the number of sessions indexed (0 if nothing was done).
+        """
+        if not await self._ensure_connection():
+            return 0
+
         try:
-            pattern = f"chat:{user_id}:*"
-            cursor = 0
-            deleted_count = 0
-            
-            # Use SCAN to iterate through keys matching the pattern
-            while True:
-                cursor, keys = await self.client.scan(cursor, match=pattern, count=100)
-                if keys:
-                    await self.client.delete(*keys)
-                    deleted_count += len(keys)
-                if cursor == 0:
-                    break
-            
-            logger.info(f"Cleared {deleted_count} Redis sessions for user: {user_id}")
+            if not await self.client.set(BACKFILL_KEY, "running", nx=True, ex=3600):
+                return 0  # done already, or another worker is on it
+
+            indexed = 0
+            with span("redis.backfill_session_index") as backfill_span:
+                async with self.client.pipeline(transaction=False) as pipe:
+                    async for key in self.client.scan_iter(match="chat:*", count=batch_size):
+                        parts = key.split(":")
+                        if len(parts) != 3:
+                            continue  # summary / lock keys belong to a listed session
+                        _, user_id, session_id = parts
+                        pipe.sadd(self._index_key(user_id), session_id)
+                        pipe.expire(self._index_key(user_id), SESSION_TTL)
+                        indexed += 1
+                        if len(pipe) >= batch_size:
+                            await pipe.execute()
+                    await pipe.execute()
+                backfill_span.set_attribute("indexed", indexed)
+
+            await self.client.set(BACKFILL_KEY, "done")
+            logger.info(f"Indexed {indexed} existing Redis chat sessions")
+            return indexed
         except Exception as e:
-            logger.warning(f"Failed to clear all Redis sessions: {e}")
\ No newline at end of file
+            self._failed("backfill Redis session index", e)
+            return 0
@@ -0,0 +1,139 @@
+"""
+Long-term semantic memory: a per-user vector index of past chat exchanges.
+
+Every completed exchange (user message + assistant reply) is embedded in the
+background and appended to the user's `memory` partition of the shared
+FaissVectorStore (`{base_path}/{uid}___memory_docs.index`), with the session id
+as its document id. At prompt time the most similar exchanges from the
+user's *other* sessions are recalled under a fixed token budget, giving
+continuity across sessions without replaying long histories.
+
+Vectors are normalized, so the store's L2 distance ranks by cosine
+similarity (cos = 1 - d/2). Appends, caching and cross-worker locking are
+the store's: the write-ahead log and file lock make concurrent writes from
+several workers safe.
+"""
+
+import asyncio
+import logging
+
+from core.observability.metrics import observe_stage
+from core.services.vector.faiss_store import RESERVED_SESSION_PREFIX
+from infrastructure.llm.token_estimator import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Partition (session) of the vector store holding a user's memories; the
+# reserved prefix keeps it apart from every client session id
+MEMORY_SESSION = RESERVED_SESSION_PREFIX + "memory"
+
+
+def _normalized(vectors):
+    import faiss
+    import numpy as np
+
+    vectors = np.array(vectors, dtype="float32")
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+class SemanticMemory:
+    # Exchanges longer than this are cut before embedding and storing
+    MAX_EXCHANGE_CHARS = 2000
+
+    def __init__(
+        self,
+        embedder,
+        vector_store,
+        token_budget: int = 400,
+        top_k: int = 3,
+        min_score: float = 0.35
+    ):
+        self.embedder = embedder
+        self.vector_store = vector_store
+        self.token_budget = token_budget
+        self.top_k = top_k
+        self.min_score = min_score
+        self._tasks: set[asyncio.Task] = set()
+
+    def has_memories(self, uid: str) -> bool:
+        return self.vector_store.has_documents(uid, MEMORY_SESSION)
+
+    # ----------------------------------
+    # Write path (background)
+    # ----------------------------------
+    def schedule_add(self, uid: str, session_id: str, user_message: str, assistant_message: str):
+        """Embed and index one exchange in the background."""
+        task = asyncio.get_running_loop().create_task(
+            self._add_safely(uid, session_id, user_message, assistant_message)
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _add_safely(self, uid, session_id, user_message, assistant_message):
+        try:
+            await self.add(uid, session_id, user_message, assistant_message)
+        except Exception:
+            logger.exception(f"Indexing chat exchange for long-term memory failed (session {session_id})")
+
+    async def add(self, uid: str, session_id: str, user_message: str, assistant_message: str):
+        text = f"User: {user_message}\nAssistant: {assistant_message}"[:self.MAX_EXCHANGE_CHARS]
+        with observe_stage("memory", "embed_exchange"):
+            vector = await self.embedder.embed(text)
+        if not vector:
+            return
+        await asyncio.to_thread(self._append, uid, vector, {"document_id": session_id, "text": text})
+
+    def _append(self, uid, vector, meta):
+        try:
+            self.vector_store.add(uid, MEMORY_SESSION, _normalized([vector]).tolist(), [meta])
+        except ValueError as e:
+            logger.warning(f"Skipping memory write for {uid}: {e}")
+
+    # ----------------------------------
+    # Read path
+    # ----------------------------------
+    async def recall(self, uid: str, query_embedding: list[float], exclude_session: str) -> list[str]:
+        """
+        Most relevant past exchanges from other sessions, best first,
+        trimmed to the token budget.
+        """
+        if not query_embedding or not self.has_memories(uid):
+            return []
+        with observe_stage("memory", "recall") as stage_span:
+            hits = await asyncio.to_thread(self._search, uid, query_embedding, exclude_session)
+            recalled = []
+            used = 0
+            for text in hits:
+                tokens = estimate_tokens(text)
+                if used + tokens > self.token_budget:
+                    break
+                recalled.append(text)
+                used += tokens
+            stage_span.set_attribute("candidates", len(hits))
+            stage_span.set_attribute("recalled", len(recalled))
+            stage_span.set_attribute("tokens", used)
+        return recalled
+
+    def _search(self, uid, query_embedding, exclude_session) -> list[str]:
+        # Over-fetch: hits from the current session are skipped
+        results = self.vector_store.search(
+            uid, MEMORY_SESSION, _normalized([query_embedding])[0].tolist(), k=self.top_k * 4
+        )
+        hits = []
+        for result in results:
+            if 1 - result["score"] / 2 < self.min_score or result["document_id"] == exclude_session:
+                continue
+            hits.append(result["text"])
+            if len(hits) >= self.top_k:
+                break
+        return hits
+
+    # ----------------------------------
+    # Deletion
+    # ----------------------------------
+    async def forget_session(self, uid: str, session_id: str):
+        await asyncio.to_thread(self.vector_store.delete_documents, uid, MEMORY_SESSION, {session_id})
+
+    async def forget_user(self, uid: str):
+        await asyncio.to_thread(self.vector_store.delete, uid, MEMORY_SESSION)
@@ -1,17 +1,28 @@
 import io
 import os
 import platform
-import pdfplumber
-import pytesseract
-from PIL import Image
-
-# Configure Tesseract for cross-platform compatibility
-if platform.system() == "Windows":
-    # Windows: Use local installation path
-    pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-else:
-    # Linux/Cloud: Use system PATH
-    pytesseract.pytesseract.tesseract_cmd = 'tesseract'
+
+from core.observability.metrics import observe_stage
+
+# pdfplumber, pytesseract and PIL are imported on first use to keep startup fast.
+_tesseract = None
+
+
+def _get_tesseract():
+    """Import pytesseract once and configure it for cross-platform compatibility."""
+    global _tesseract
+    if _tesseract is None:
+        import pytesseract
+
+        if platform.system() == "Windows":
+            # Windows: Use local installation path
+            pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+        else:
+            # Linux/Cloud: Use system PATH
+            pytesseract.pytesseract.tesseract_cmd = 'tesseract'
+        _tesseract = pytesseract
+    return _tesseract
+
 
 class OCRService:
     async def extract(self, file_bytes: bytes, filename: str) -> str:
@@ -33,17 +44,23 @@ class OCRService:
         """
         Extract text from text-based PDFs.
         """
+        import pdfplumber
+
         text = ""
-        with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
+        with observe_stage("ocr", "pdf_extract"):
+            with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
+                for page in pdf.pages:
+                    page_text = page.extract_text()
+                    if page_text:
+                        text += page_text + "\n"
         return text.strip()
 
     async def extract_from_image(self, file_bytes: bytes) -> str:
         """
         Extract text from image files (jpg, png, scanned PDFs).
         """
-        image = Image.open(io.BytesIO(file_bytes))
-        return pytesseract.image_to_string(image).strip()
\ No newline at end of file
+        from PIL import Image
+
+        with observe_stage("ocr", "image_extract"):
+            image = Image.open(io.BytesIO(file_bytes))
+            return _get_tesseract().image_to_string(image).strip()
\ No newline at end of file
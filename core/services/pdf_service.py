@@ -1,8 +1,8 @@
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, ListFlowable
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.pagesizes import A4
-
 def generate_doctor_summary_pdf(data: dict, output_path: str):
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, ListFlowable
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.pagesizes import A4
+
     doc = SimpleDocTemplate(output_path, pagesize=A4)
     styles = getSampleStyleSheet()
     story = []
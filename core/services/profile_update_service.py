@@ -1,12 +1,26 @@
 import json
 from datetime import datetime
+from db.users_repo import new_user_fields
 from prompts.profile_update_prompt import build_profile_update_prompt
 
 
 class ProfileUpdateService:
-    def __init__(self, llm, users_collection):
+    def __init__(self, llm, users_collection, profile_cache=None, user_loader=None):
         self.llm = llm
         self.users = users_collection
+        self.profile_cache = profile_cache
+        self.user_loader = user_loader
+
+    async def _get_user(self, firebase_uid: str) -> dict:
+        if self.user_loader:
+            return await self.user_loader.load(firebase_uid) or {}
+        return await self.users.find_one({"firebase_uid": firebase_uid}) or {}
+
+    async def _profile_changed(self, firebase_uid: str):
+        if self.user_loader:
+            self.user_loader.clear(firebase_uid)
+        if self.profile_cache:
+            await self.profile_cache.bump(firebase_uid)
 
     # -------------------------------------------------
     # 1️⃣ Chat-based profile update (existing, fixed)
@@ -16,7 +30,7 @@ class ProfileUpdateService:
         firebase_uid: str,
         chat_history_text: str
     ):
-        user = await self.users.find_one({"firebase_uid": firebase_uid}) or {}
+        user = await self._get_user(firebase_uid)
         current_profile = user.get("profile", {})
 
         prompt = build_profile_update_prompt(
@@ -38,10 +52,12 @@ class ProfileUpdateService:
                 "$set": {
                     "profile": updated_profile,
                     "updated_at": datetime.utcnow()
-                }
+                },
+                "$setOnInsert": new_user_fields(firebase_uid, skip=("profile", "updated_at"))
             },
             upsert=True
         )
+        await self._profile_changed(firebase_uid)
 
         return updated_profile
 
@@ -75,9 +91,13 @@ class ProfileUpdateService:
                 },
                 "$set": {
                     "updated_at": datetime.utcnow()
-                }
+                },
+                "$setOnInsert": new_user_fields(
+                    firebase_uid, skip=("profile.reports_summary", "updated_at")
+                )
             },
             upsert=True
         )
+        await self._profile_changed(firebase_uid)
 
         return True
\ No newline at end of file
@@ -0,0 +1,161 @@
+"""
+Token-budgeted assembly of the per-turn chat prompt sections.
+
+The budget left after the user message is split across history, profile and
+document context by share. A section that needs less than its share hands
+the rest to the others. Each section is then cut to fit:
+- history: oldest turns are dropped first; a rolling summary of earlier
+  turns gets up to a third of the history budget, ahead of the turns
+- document: chunks are kept in relevance order, the last one truncated
+- profile: lines are kept in order (demographics and allergies come first)
+"""
+
+from dataclasses import dataclass, field
+
+from core.observability.metrics import PROMPT_TRIMMED
+from infrastructure.llm.token_estimator import estimate_tokens
+
+# Approximate inverse of estimate_tokens, used when truncating text
+CHARS_PER_TOKEN = 4
+
+
+@dataclass
+class AssembledContext:
+    history: str
+    profile: str
+    document: str
+    tokens: dict = field(default_factory=dict)
+    dropped: dict = field(default_factory=dict)
+
+
+class PromptAssembler:
+    SHARES = {"history": 0.4, "document": 0.4, "profile": 0.2}
+    # Section headers and placeholders of build_unified_chat_turn
+    TEMPLATE_OVERHEAD = 60
+    # Don't bother keeping a truncated document chunk smaller than this
+    MIN_CHUNK_TOKENS = 40
+
+    def __init__(self, token_budget: int):
+        self.token_budget = token_budget
+
+    def assemble(
+        self,
+        message: str,
+        history: list[str],
+        profile: str,
+        document_chunks: list[str],
+        summary: str = "",
+        reserved_tokens: int = 0
+    ) -> AssembledContext:
+        """
+        Fit history (oldest first, optionally preceded by a summary of earlier
+        turns), profile and ranked document chunks into the budget.
+        The message itself is always kept whole; `reserved_tokens` are taken
+        off the top for sections budgeted elsewhere (long-term memory).
+        """
+        history_tokens = [estimate_tokens(line) for line in history]
+        chunk_tokens = [estimate_tokens(chunk) for chunk in document_chunks]
+        summary_tokens = estimate_tokens(summary)
+        demands = {
+            "history": sum(history_tokens) + summary_tokens,
+            "document": sum(chunk_tokens),
+            "profile": estimate_tokens(profile),
+        }
+        available = self.token_budget - estimate_tokens(message) - self.TEMPLATE_OVERHEAD - reserved_tokens
+        allocation = self._allocate(demands, max(available, 0))
+
+        dropped = {}
+        history_text, history_used = self._fit_history(
+            history, history_tokens, summary, summary_tokens, allocation["history"], dropped
+        )
+        document_text, document_used = self._fit_document(
+            document_chunks, chunk_tokens, allocation["document"], dropped
+        )
+        profile_text, profile_used = self._fit_profile(profile, demands["profile"], allocation["profile"], dropped)
+
+        for section, count in dropped.items():
+            PROMPT_TRIMMED.labels(section).inc(count)
+
+        return AssembledContext(
+            history=history_text,
+            profile=profile_text,
+            document=document_text,
+            tokens={"history": history_used, "profile": profile_used, "document": document_used},
+            dropped=dropped,
+        )
+
+    def _allocate(self, demands: dict, available: int) -> dict:
+        """Share-weighted split; sections under their share release the surplus."""
+        allocation = {}
+        pending = dict(demands)
+        remaining = available
+        while pending:
+            total_share = sum(self.SHARES[s] for s in pending)
+            fair = {s: remaining * self.SHARES[s] / total_share for s in pending}
+            satisfied = [s for s in pending if pending[s] <= fair[s]]
+            if not satisfied:
+                allocation.update({s: int(fair[s]) for s in pending})
+                break
+            for s in satisfied:
+                allocation[s] = pending.pop(s)
+                remaining -= allocation[s]
+        return allocation
+
+    def _fit_history(self, lines, line_tokens, summary, summary_tokens, budget, dropped):
+        summary_budget = min(summary_tokens, budget // 3)
+        kept = 0
+        used = 0
+        # Walk newest to oldest so the oldest turns are the ones dropped
+        for tokens in reversed(line_tokens):
+            if used + tokens > budget - summary_budget:
+                break
+            used += tokens
+            kept += 1
+        if kept < len(lines):
+            dropped["history_turns"] = len(lines) - kept
+        turns = "\n".join(lines[len(lines) - kept:])
+        if not summary:
+            return turns, used
+
+        if summary_tokens > summary_budget:
+            summary = summary[:summary_budget * CHARS_PER_TOKEN].rstrip() + " ..."
+            dropped["summary_tokens"] = summary_tokens - summary_budget
+        used += summary_budget
+        return f"Summary of earlier conversation:\n{summary}\n\nRecent messages:\n{turns}", used
+
+    def _fit_document(self, chunks, chunk_tokens, budget, dropped):
+        kept = []
+        used = 0
+        for i, (chunk, tokens) in enumerate(zip(chunks, chunk_tokens)):
+            if used + tokens <= budget:
+                kept.append(chunk)
+                used += tokens
+                continue
+            room = budget - used
+            if room >= self.MIN_CHUNK_TOKENS:
+                kept.append(chunk[:room * CHARS_PER_TOKEN].rstrip() + " ...")
+                used = budget
+                dropped["document_truncated"] = 1
+                i += 1
+            if i < len(chunks):
+                dropped["document_chunks"] = len(chunks) - i
+            break
+        return "\n\n".join(kept), used
+
+    def _fit_profile(self, profile, tokens, budget, dropped):
+        if tokens <= budget:
+            return profile, tokens
+        kept = []
+        used = 0
+        for line in profile.split("\n"):
+            line_tokens = estimate_tokens(line)
+            if used + line_tokens > budget:
+                room = budget - used
+                if room > 0:
+                    kept.append(line[:room * CHARS_PER_TOKEN].rstrip() + " ...")
+                    used = budget
+                break
+            kept.append(line)
+            used += line_tokens
+        dropped["profile_tokens"] = tokens - used
+        return "\n".join(kept), used
@@ -0,0 +1,154 @@
+"""
+In-process BM25 over each session's document chunks.
+
+Dense embeddings are weak on exact tokens such as drug names, lab codes
+("HbA1c", "LDL-C") and values ("162 mg/dL"); a lexical index catches those.
+
+The index of a session is kept per worker. ChatDocumentService extends it at
+ingest time with the chunks it just stored; a worker that has not seen an
+upload (or was restarted) catches up from the chunk texts in the vector
+store, so every worker ends up with the same index.
+
+Each session has its own lock, and the store is read outside the lock on the
+session table. Searches in different sessions therefore run in parallel.
+"""
+
+import heapq
+import logging
+import math
+import re
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Words with inner dots, dashes or slashes stay whole ("ldl-c", "6.1", "mg/dl");
+# their parts are indexed too, so "LDL" also finds "LDL-C".
+_TOKEN = re.compile(r"[a-z0-9]+(?:[.\-/][a-z0-9]+)*")
+_PART = re.compile(r"[.\-/]")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have i in is it its my of on or "
+    "that the this to was were what when which with".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        if token in _STOPWORDS:
+            continue
+        tokens.append(token)
+        parts = _PART.split(token)
+        if len(parts) > 1 and not token.replace(".", "").isdigit():
+            tokens.extend(p for p in parts if len(p) > 1 or p.isdigit())
+    return tokens
+
+
+class BM25Index:
+    """Okapi BM25 over chunks keyed by vector id."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: dict[str, dict[int, int]] = {}  # term -> {vector id: term frequency}
+        self.lengths: dict[int, int] = {}
+        self.total_length = 0
+        self.next_id = 0  # one past the highest indexed vector id
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def add(self, ids: list[int], texts: list[str]):
+        for vector_id, text in zip(ids, texts):
+            tokens = tokenize(text)
+            self.lengths[vector_id] = len(tokens)
+            self.total_length += len(tokens)
+            for term in tokens:
+                postings = self.postings.setdefault(term, {})
+                postings[vector_id] = postings.get(vector_id, 0) + 1
+            self.next_id = max(self.next_id, vector_id + 1)
+
+    def search(self, query: str, k: int) -> list[tuple[int, float]]:
+        """(vector id, score) of the k best matching chunks, best first."""
+        if not self.lengths:
+            return []
+        count = len(self.lengths)
+        average = self.total_length / count or 1.0
+        scores: dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for vector_id, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[vector_id] / average)
+                scores[vector_id] = scores.get(vector_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+
+class SessionBM25Index:
+    """One BM25Index per (user, session), kept in line with the vector store."""
+
+    def __init__(self, vector_store, max_sessions: int = 256):
+        self.vector_store = vector_store
+        self.max_sessions = max_sessions
+        self._indexes: OrderedDict[tuple[str, str], BM25Index] = OrderedDict()
+        self._lock = threading.Lock()  # guards the two dicts only
+        self._session_locks: dict[tuple[str, str], threading.Lock] = {}
+
+    def _session_lock(self, key: tuple[str, str]) -> threading.Lock:
+        # An index is not safe to search while another thread adds to it
+        with self._lock:
+            lock = self._session_locks.get(key)
+            if lock is None:
+                lock = self._session_locks[key] = threading.Lock()
+            return lock
+
+    def add(self, uid: str, session_id: str, ids: list[int], texts: list[str]):
+        """Index chunks just written to the vector store (ingest time)."""
+        key = (uid, session_id)
+        with self._session_lock(key):
+            with self._lock:
+                index = self._indexes.get(key)
+            if index is not None and ids and ids[0] == index.next_id:
+                index.add(ids, texts)
+                self._store(key, index)
+                return
+            self._sync(key)
+
+    def search(self, uid: str, session_id: str, query: str, k: int = 20) -> list[tuple[int, float]]:
+        key = (uid, session_id)
+        with self._session_lock(key):
+            return self._sync(key).search(query, k)
+
+    def forget(self, uid: str, session_id: str):
+        with self._lock:
+            self._indexes.pop((uid, session_id), None)
+
+    def forget_user(self, uid: str):
+        with self._lock:
+            for key in [key for key in self._indexes if key[0] == uid]:
+                del self._indexes[key]
+
+    def _sync(self, key: tuple[str, str]) -> BM25Index:
+        """
+        The session's index, extended with chunks other workers stored.
+        Caller holds the session lock; the store is read without `_lock`.
+        """
+        with self._lock:
+            index = self._indexes.get(key)
+        stored = self.vector_store.chunk_count(*key)
+        if index is None or stored < len(index):
+            index = BM25Index()  # new, or the session was deleted and re-created
+        if stored > len(index):
+            ids, texts = self.vector_store.chunk_texts(*key, start=len(index))
+            index.add(ids, texts)
+        self._store(key, index)
+        return index
+
+    def _store(self, key: tuple[str, str], index: BM25Index):
+        with self._lock:
+            self._indexes[key] = index
+            self._indexes.move_to_end(key)
+            while len(self._indexes) > self.max_sessions:
+                self._indexes.popitem(last=False)
@@ -0,0 +1,83 @@
+"""
+Document retrieval that fuses dense (FAISS) and lexical (BM25) rankings.
+
+Each side returns its own top `candidates`; chunks are then ordered by
+reciprocal rank fusion, sum(1 / (rrf_k + rank)), which needs no score
+calibration between L2 distances and BM25 scores. A chunk found by both
+sides rises to the top; an exact-token match that the embedding missed still
+gets in. No extra LLM or embedding calls are made.
+
+The fused candidates then go through the post-retrieval stage (see
+post_retrieval): MMR over their vectors with near-duplicate removal, and
+adjacent chunks merged into spans.
+"""
+
+from core.observability.metrics import observe_stage
+from core.services.rag.post_retrieval import merge_adjacent, mmr_select
+
+
+def reciprocal_rank_fusion(rankings: list[list], rrf_k: int = 60) -> list[tuple[object, float]]:
+    """(key, fused score) over several best-first rankings of keys, best first."""
+    scores: dict = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class HybridRetriever:
+    def __init__(
+        self,
+        vector_store,
+        lexical_index=None,
+        candidates: int = 20,
+        rrf_k: int = 60,
+        diversify: bool = True,
+        mmr_lambda: float = 0.7,
+        duplicate_similarity: float = 0.95
+    ):
+        self.vector_store = vector_store
+        self.lexical_index = lexical_index
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self.diversify = diversify
+        self.mmr_lambda = mmr_lambda
+        self.duplicate_similarity = duplicate_similarity
+
+    def search(self, uid: str, session_id: str, query: str, query_embedding: list, k: int = 5) -> list[dict]:
+        """
+        Top-k chunk metadata of the session, best first. With `diversify`,
+        chunks are picked by MMR and adjacent ones merged into spans, so
+        fewer than k entries may come back. Blocking (file I/O); call via
+        asyncio.to_thread from request handlers.
+        """
+        dense = []
+        if query_embedding:
+            dense = self.vector_store.search(uid, session_id, query_embedding, k=self.candidates)
+        lexical_ids = []
+        if self.lexical_index is not None:
+            with observe_stage("retrieval", "bm25"):
+                lexical_ids = [i for i, _ in self.lexical_index.search(uid, session_id, query, k=self.candidates)]
+
+        chunks = {chunk["vector_id"]: chunk for chunk in dense}
+        # Lexical hits arrive as vector ids; read the missing metadata in one go
+        missing = [i for i in lexical_ids if i not in chunks]
+        for chunk in self.vector_store.get_chunks(uid, session_id, missing) if missing else []:
+            if chunk is not None:
+                chunks[chunk["vector_id"]] = chunk
+        fused = reciprocal_rank_fusion(
+            [[chunk["vector_id"] for chunk in dense], [i for i in lexical_ids if i in chunks]], self.rrf_k
+        )
+        if not self.diversify or len(fused) <= 1:
+            return [{**chunks[i], "rrf_score": score} for i, score in fused[:k]]
+        return self._diversify(uid, session_id, fused[:self.candidates], chunks, k)
+
+    def _diversify(self, uid: str, session_id: str, pool: list, chunks: dict, k: int) -> list[dict]:
+        ids = [i for i, _ in pool]
+        scores = [score for _, score in pool]
+        low, high = min(scores), max(scores)
+        relevance = [(score - low) / (high - low) if high > low else 1.0 for score in scores]
+        with observe_stage("retrieval", "mmr", candidates=len(pool)):
+            vectors = self.vector_store.get_vectors(uid, session_id, ids)
+            picked = mmr_select(relevance, vectors, k, self.mmr_lambda, self.duplicate_similarity)
+        return merge_adjacent([{**chunks[ids[j]], "rrf_score": scores[j]} for j in picked])
@@ -0,0 +1,79 @@
+"""
+Post-retrieval stage for document chunks: spend prompt tokens on distinct
+information.
+
+- `mmr_select`: maximal marginal relevance. Picks chunks one at a time,
+  trading relevance against similarity to the chunks already picked, and
+  drops near-duplicates (e.g. the same page uploaded twice) outright.
+- `merge_adjacent`: consecutive chunks of one document become one span,
+  with the overlap ChatDocumentService._chunk adds between them removed.
+"""
+
+
+def mmr_select(
+    relevance,
+    vectors,
+    k: int,
+    lambda_: float = 0.7,
+    duplicate_similarity: float = 0.95
+) -> list[int]:
+    """
+    Indices of up to k candidates in pick order. `relevance` is in [0, 1],
+    `vectors` holds one row per candidate; similarity is cosine.
+    """
+    import numpy as np
+
+    if not len(relevance):
+        return []
+    vectors = np.asarray(vectors, dtype="float32")
+    unit = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    similarity = unit @ unit.T
+    relevance = np.asarray(relevance, dtype="float32")
+
+    selected = [int(np.argmax(relevance))]
+    redundancy = similarity[selected[0]].copy()  # max similarity to any selected chunk
+    available = np.ones(len(relevance), dtype=bool)
+    available[selected[0]] = False
+    available &= redundancy < duplicate_similarity
+    while len(selected) < k and available.any():
+        scores = np.where(available, lambda_ * relevance - (1 - lambda_) * redundancy, -np.inf)
+        best = int(np.argmax(scores))
+        selected.append(best)
+        redundancy = np.maximum(redundancy, similarity[best])
+        available[best] = False
+        available &= redundancy < duplicate_similarity
+    return selected
+
+
+def _overlap(left: str, right: str, max_overlap: int) -> int:
+    for size in range(min(len(left), len(right), max_overlap), 0, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def merge_adjacent(chunks: list[dict], max_overlap: int = 50) -> list[dict]:
+    """
+    Merge chunks with consecutive `chunk_id`s of the same document into one
+    span (`chunk_ids` lists its chunks). Spans keep the order of their best
+    ranked chunk.
+    """
+    ranked = {id(chunk): rank for rank, chunk in enumerate(chunks)}
+    spans = []
+    for chunk in sorted(chunks, key=lambda c: (str(c.get("document_id")), c.get("chunk_id", -1))):
+        previous = spans[-1] if spans else None
+        if (
+            previous is not None
+            and previous.get("document_id") == chunk.get("document_id")
+            and chunk.get("chunk_id", -1) == previous["chunk_ids"][-1] + 1
+        ):
+            text = chunk.get("text", "")
+            previous["text"] += text[_overlap(previous["text"], text, max_overlap):]
+            previous["chunk_ids"].append(chunk["chunk_id"])
+            previous["rank"] = min(previous["rank"], ranked[id(chunk)])
+        else:
+            spans.append({**chunk, "chunk_ids": [chunk.get("chunk_id", -1)], "rank": ranked[id(chunk)]})
+    spans.sort(key=lambda span: span["rank"])
+    for span in spans:
+        del span["rank"]
+    return spans
@@ -1,3 +1,6 @@
+import asyncio
+
+
 class RAGService:
     def __init__(self, vector_store, embedder, llm):
         self.vector_store = vector_store
@@ -13,10 +16,8 @@ class RAGService:
     ):
         q_vec = await self.embedder.embed(question)
 
-        matches = self.vector_store.search(
-            vector=q_vec,
-            user_id=user_id,
-            chat_session_id=chat_session_id
+        matches = await asyncio.to_thread(
+            self.vector_store.search, user_id, chat_session_id, q_vec
         )
 
         document_context = "\n".join(m["text"] for m in matches)
@@ -1,4 +1,5 @@
 import json
+from core.observability.metrics import observe_stage
 
 class ReportAnalysisService:
     def __init__(self, llm):
@@ -27,10 +28,12 @@ JSON FORMAT:
   "disclaimer": "string"
 }}
 """
-        raw = await self.llm.generate(prompt)
+        with observe_stage("report", "llm"):
+            raw = await self.llm.generate(prompt)
 
         try:
-            return json.loads(raw)
+            with observe_stage("report", "parse"):
+                return json.loads(raw)
         except json.JSONDecodeError:
             # Safety fallback (VERY IMPORTANT)
             return {
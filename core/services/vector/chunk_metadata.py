@@ -0,0 +1,353 @@
+"""
+Columnar, memory-mapped chunk metadata for one vector-store partition.
+
+For an index at `{path}` the metadata lives next to it in three files:
+- `{path}.cols`: fixed-width records (vector id, text offset and length,
+  chunk number, document number), appended in id order
+- `{path}.text`: UTF-8 chunk texts, concatenated and append-only
+- `{path}.meta.json`: small header with the committed row count and text size,
+  the document id table, and fields shared by every chunk (user, session)
+- `{path}.vecs` (compressed partitions only): the exact float32 vectors, one
+  row per chunk, read back for re-ranking and retraining
+
+The data files are opened with mmap. A search therefore decodes only the
+k rows it returns, and an add appends instead of rewriting everything. An
+append becomes visible when the header is atomically replaced. Bytes past the
+committed sizes (from an interrupted append) are ignored and truncated away
+by the next append.
+
+Older partitions store a pickled `.meta` instead. `convert_pickle_metadata`
+turns one into this format; run this module to convert a whole directory:
+
+    python -m core.services.vector.chunk_metadata faiss_store
+"""
+
+import json
+import logging
+import mmap
+import os
+import pickle
+import sys
+from typing import Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+# Per-row fields with their own column; anything else must be shared by all rows
+ROW_FIELDS = ("text", "chunk_id", "document_id")
+
+
+def _columns():
+    import numpy as np
+
+    return np.dtype([
+        ("id", "<i8"),
+        ("offset", "<i8"),
+        ("length", "<i4"),
+        ("chunk_id", "<i4"),
+        ("document", "<i4"),
+    ])
+
+
+class ChunkMetadata:
+    def __init__(self, path: str):
+        self.path = path
+        self.header = {
+            "format": FORMAT_VERSION,
+            "count": 0,
+            "text_bytes": 0,
+            "next_id": 0,
+            "documents": [],
+            "common": {},
+            "vector_dim": 0,
+        }
+        self._cols = None
+        self._vecs = None
+        self._text = None
+        self._text_file = None
+        self._document_index: dict[str, int] = {}
+
+    # ----------------------------------
+    # Files
+    # ----------------------------------
+    @property
+    def header_path(self) -> str:
+        return self.path + ".meta.json"
+
+    @property
+    def cols_path(self) -> str:
+        return self.path + ".cols"
+
+    @property
+    def text_path(self) -> str:
+        return self.path + ".text"
+
+    @property
+    def vecs_path(self) -> str:
+        return self.path + ".vecs"
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(path + ".meta.json")
+
+    @staticmethod
+    def files(path: str) -> list[str]:
+        return [path + suffix for suffix in (".meta.json", ".cols", ".text", ".vecs")]
+
+    @classmethod
+    def open(cls, path: str) -> "ChunkMetadata":
+        metadata = cls(path)
+        if cls.exists(path):
+            with open(metadata.header_path, "r", encoding="utf-8") as f:
+                metadata.header = json.load(f)
+        metadata._map()
+        return metadata
+
+    def _map(self):
+        import numpy as np
+
+        self.close()
+        self._document_index = {doc: i for i, doc in enumerate(self.header["documents"])}
+        count = self.header["count"]
+        if count:
+            self._cols = np.memmap(self.cols_path, dtype=_columns(), mode="r", shape=(count,))
+        else:
+            self._cols = np.zeros(0, dtype=_columns())
+        if self.header["text_bytes"]:
+            self._text_file = open(self.text_path, "rb")
+            self._text = mmap.mmap(self._text_file.fileno(), self.header["text_bytes"], access=mmap.ACCESS_READ)
+        if self.vector_dim and count:
+            self._vecs = np.memmap(self.vecs_path, dtype="<f4", mode="r", shape=(count, self.vector_dim))
+
+    def close(self):
+        if self._text is not None:
+            self._text.close()
+            self._text_file.close()
+        self._cols = self._vecs = self._text = self._text_file = None
+
+    # ----------------------------------
+    # Read path
+    # ----------------------------------
+    def __len__(self) -> int:
+        return self.header["count"]
+
+    @property
+    def next_id(self) -> int:
+        return self.header["next_id"]
+
+    @property
+    def vector_dim(self) -> int:
+        """Dimension of the stored exact vectors; 0 if they are not stored."""
+        return self.header.get("vector_dim", 0)
+
+    def _rows(self, ids):
+        """Row numbers of `ids` (-1 where unknown). Ids are stored ascending."""
+        import numpy as np
+
+        ids = np.asarray(ids, dtype="int64")
+        if not len(self._cols):
+            return np.full(len(ids), -1)
+        stored = self._cols["id"]
+        rows = np.searchsorted(stored, ids)
+        rows[rows >= len(stored)] = 0
+        return np.where(stored[rows] == ids, rows, -1)
+
+    def get_many(self, ids: Iterable[int]) -> list[Optional[dict]]:
+        """Metadata for each id (None if unknown); only these rows are read."""
+        ids = list(ids)
+        results = []
+        for row in self._rows(ids).tolist():
+            if row < 0:
+                results.append(None)
+                continue
+            record = self._cols[row]
+            offset, length = int(record["offset"]), int(record["length"])
+            document = int(record["document"])
+            results.append({
+                **self.header["common"],
+                "vector_id": int(record["id"]),
+                "document_id": self.header["documents"][document] if document >= 0 else None,
+                "chunk_id": int(record["chunk_id"]),
+                "text": self._text[offset:offset + length].decode("utf-8") if length else "",
+            })
+        return results
+
+    def get(self, vector_id: int) -> Optional[dict]:
+        return self.get_many([vector_id])[0]
+
+    def texts_from(self, start: int = 0) -> tuple[list[int], list[str]]:
+        """(vector ids, texts) of every row from row `start` on."""
+        rows = self._cols[start:]
+        texts = [
+            self._text[offset:offset + length].decode("utf-8") if length else ""
+            for offset, length in zip(rows["offset"].tolist(), rows["length"].tolist())
+        ]
+        return rows["id"].tolist(), texts
+
+    def vectors(self, ids: Iterable[int]):
+        """Exact vectors of `ids` (which must be stored), in the given order."""
+        import numpy as np
+
+        rows = self._rows(list(ids))
+        if not self.vector_dim or np.any(rows < 0):
+            raise KeyError("Vectors are not stored for every requested id")
+        return np.asarray(self._vecs[rows], dtype="float32")
+
+    def all_vectors(self):
+        """(ids, exact vectors) of every row, both memory-mapped."""
+        return self._cols["id"], self._vecs
+
+    def ids_for_documents(self, document_ids: Iterable[str]):
+        import numpy as np
+
+        wanted = [self._document_index[d] for d in document_ids if d in self._document_index]
+        if not wanted:
+            return np.zeros(0, dtype="int64")
+        return np.asarray(self._cols["id"][np.isin(self._cols["document"], wanted)], dtype="int64")
+
+    # ----------------------------------
+    # Write path
+    # ----------------------------------
+    def append(self, entries: Iterable[tuple[int, dict]], vectors=None):
+        """
+        Append (vector id, metadata) pairs; ids must be above every stored id.
+        Partitions that store vectors need the matching rows in `vectors`.
+        """
+        import numpy as np
+
+        entries = list(entries)
+        if not entries:
+            return
+        if self.vector_dim and (vectors is None or vectors.shape != (len(entries), self.vector_dim)):
+            raise ValueError("This partition stores vectors; pass one per appended chunk")
+        header = json.loads(json.dumps(self.header))  # work on a copy until committed
+        document_index = dict(self._document_index)
+
+        rows = np.zeros(len(entries), dtype=_columns())
+        blob = bytearray()
+        for i, (vector_id, meta) in enumerate(entries):
+            self._merge_common(header, meta, first=header["count"] == 0 and i == 0)
+            text = (meta.get("text") or "").encode("utf-8")
+            document = meta.get("document_id")
+            if document is not None and document not in document_index:
+                document_index[document] = len(header["documents"])
+                header["documents"].append(document)
+            rows[i] = (
+                vector_id,
+                header["text_bytes"] + len(blob),
+                len(text),
+                meta.get("chunk_id", -1),
+                document_index[document] if document is not None else -1,
+            )
+            blob += text
+        if np.any(np.diff(rows["id"]) <= 0) or (header["count"] and rows["id"][0] <= self._cols["id"][-1]):
+            raise ValueError("Chunk ids must be appended in ascending order")
+
+        # Drop whatever an interrupted append left past the committed sizes
+        self._append_file(self.text_path, header["text_bytes"], bytes(blob))
+        if self.vector_dim:
+            self._append_file(
+                self.vecs_path, header["count"] * self.vector_dim * 4, vectors.astype("<f4").tobytes()
+            )
+        self._append_file(self.cols_path, header["count"] * rows.itemsize, rows.tobytes())
+
+        header["count"] += len(rows)
+        header["text_bytes"] += len(blob)
+        header["next_id"] = max(header["next_id"], int(rows["id"][-1]) + 1)
+        self._write_header(header)
+        self.header = header
+        self._map()
+
+    def attach_vectors(self, vectors):
+        """Start storing exact vectors: one row for every chunk stored so far."""
+        if vectors.shape[0] != len(self):
+            raise ValueError(f"Expected {len(self)} vectors, got {vectors.shape[0]}")
+        with open(self.vecs_path, "wb") as f:
+            f.write(vectors.astype("<f4").tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        header = {**self.header, "vector_dim": int(vectors.shape[1])}
+        self._write_header(header)
+        self.header = header
+        self._map()
+
+    @staticmethod
+    def _merge_common(header: dict, meta: dict, first: bool):
+        extra = {k: v for k, v in meta.items() if k not in ROW_FIELDS}
+        if first:
+            header["common"] = extra
+        elif extra != header["common"]:
+            raise ValueError(
+                f"Chunk fields {sorted(extra)} differ within one partition; "
+                f"only {', '.join(ROW_FIELDS)} may vary per chunk"
+            )
+
+    @staticmethod
+    def _append_file(path: str, committed: int, data: bytes):
+        with open(path, "ab") as f:
+            f.truncate(committed)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _write_header(self, header: dict):
+        tmp = self.header_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(header, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.header_path)
+
+
+# ----------------------------------
+# Conversion from pickled metadata
+# ----------------------------------
+class _PlainUnpickler(pickle.Unpickler):
+    """Loads only plain containers and scalars; refuses any class or callable."""
+
+    def find_class(self, module, name):
+        raise pickle.UnpicklingError(f"Refusing to load {module}.{name} from chunk metadata")
+
+
+def convert_pickle_metadata(path: str) -> ChunkMetadata:
+    """
+    Convert `{path}.meta` (a pickled list of chunk dicts indexed by vector
+    position, or a {"next_id", "chunks": {id: dict}} mapping) to the columnar
+    format, then remove it.
+    """
+    with open(path + ".meta", "rb") as f:
+        stored = _PlainUnpickler(f).load()
+    if isinstance(stored, list):
+        entries = list(enumerate(stored))
+        next_id = len(stored)
+    else:
+        entries = sorted(stored["chunks"].items())
+        next_id = stored["next_id"]
+
+    for file in ChunkMetadata.files(path):
+        if os.path.exists(file):
+            os.remove(file)
+    metadata = ChunkMetadata(path)
+    metadata.append(entries)
+    if metadata.next_id < next_id:
+        metadata.header["next_id"] = next_id
+        metadata._write_header(metadata.header)
+    os.remove(path + ".meta")
+    return metadata
+
+
+def convert_directory(base_path: str) -> int:
+    converted = 0
+    for file in sorted(os.listdir(base_path)):
+        if file.endswith("_docs.index.meta"):
+            path = os.path.join(base_path, file[:-len(".meta")])
+            convert_pickle_metadata(path).close()
+            converted += 1
+            logger.info(f"Converted {path}.meta")
+    return converted
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    directory = sys.argv[1] if len(sys.argv) > 1 else "faiss_store"
+    print(f"Converted {convert_directory(directory)} metadata files in {directory}")
@@ -1,63 +1,537 @@
-import faiss
-import numpy as np
+"""
+Document vector store shared by upload, chat and RAG.
+
+Each (user, session) pair is its own partition: `{base}/{uid}_{session}_docs.index`
+holds an IndexIDMap2 (exact flat by default, see index_factory), next to
+columnar, memory-mapped chunk metadata keyed by vector id (see
+chunk_metadata). Because the tenant is the partition, a search only ever
+scores the session's own vectors, with no over-fetch and filtering. Narrower filters (specific
+documents) run inside FAISS with an IDSelector.
+
+Adds do not rewrite the index: new vectors are appended to a write-ahead log
+(see vector_wal) and the metadata columns, and the metadata commit makes them
+visible. Once the log passes `compact_bytes` it is folded into the index
+file (written to a temp file and renamed into place) and emptied. Loading a
+partition replays the log records its metadata committed; records the index
+already contains (a crash between rename and truncation) are skipped, and
+uncommitted or torn ones are dropped by the next append.
+
+Compaction also moves the partition to the configured index type. Compressed
+partitions keep their exact vectors on disk with the metadata; a search
+re-ranks `rerank` times k approximate candidates by exact distance.
+
+Index files of at least `mmap_min_bytes` are memory-mapped instead of read
+into RAM, so their pages load lazily and are shared by all workers through
+the OS page cache. Mapped indexes are read-only: vectors added since the last
+compaction live in a small in-RAM delta index, searched alongside.
+
+Loaded partitions are cached per worker and revalidated against the files, so
+writes and deletions by other workers are picked up; a grown log is replayed
+incrementally. Partitions written by the previous stores (IVF index and/or
+pickled `.meta`) are converted on first load.
+"""
+
+import logging
 import os
-import pickle
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from config.settings import (
+    VECTOR_INDEX_TYPE,
+    VECTOR_IVF_NPROBE,
+    VECTOR_MMAP_MIN_BYTES,
+    VECTOR_RERANK,
+    VECTOR_WAL_COMPACT_BYTES,
+)
+from core.observability.metrics import observe_stage
+from core.services.vector.chunk_metadata import ChunkMetadata, convert_pickle_metadata
+from core.services.vector.index_factory import build_index, exact_vectors, index_kind, search_params, target_kind
+from core.services.vector.vector_wal import VectorWAL
+
+logger = logging.getLogger(__name__)
+
+# faiss and numpy are imported inside methods; both are slow to load and
+# only needed once a document is actually indexed or searched.
+
+# Session names with this prefix are internal partitions (long-term memory);
+# client session ids may not use it
+RESERVED_SESSION_PREFIX = "__"
+# Request validation: anything not starting with the prefix (no look-ahead in
+# pydantic's regex engine)
+SESSION_ID_PATTERN = r"^([^_]|_([^_]|$))"
+
+
+def is_reserved_session(session_id: str) -> bool:
+    return session_id.startswith(RESERVED_SESSION_PREFIX)
+
+
+class _Partition:
+    __slots__ = ("index", "delta", "mapped", "metadata", "version", "indexed_until", "wal_offset", "seen")
+
+    def __init__(self, index, metadata: ChunkMetadata, version=None, mapped: bool = False):
+        self.index = index
+        self.delta = None  # in-RAM additions while `index` is memory-mapped (read-only)
+        self.mapped = mapped
+        self.metadata = metadata
+        self.version = version  # (mtime_ns, size) of the index file it was loaded from
+        # One past the highest vector id indexed (ids are assigned ascending)
+        self.indexed_until = index.id_map.at(index.ntotal - 1) + 1 if index.ntotal else 0
+        self.wal_offset = 0  # log bytes applied to the index
+        self.seen = None  # (metadata header version, log size) at the last refresh
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal + (self.delta.ntotal if self.delta is not None else 0)
+
+    def reconstruct(self, vector_id: int):
+        try:
+            return self.index.reconstruct(vector_id)
+        except RuntimeError:
+            if self.delta is None:
+                raise
+            return self.delta.reconstruct(vector_id)
+
+    def add(self, vectors, ids):
+        import faiss
+
+        if not self.mapped:
+            self.index.add_with_ids(vectors, ids)
+            return
+        if self.delta is None:
+            self.delta = faiss.IndexIDMap2(faiss.IndexFlatL2(self.index.d))
+        self.delta.add_with_ids(vectors, ids)
+
 
 class FaissVectorStore:
-    def __init__(self, dim: int, index_path: str):
-        self.dim = dim
-        self.index_path = index_path
+    def __init__(
+        self,
+        base_path: str = "faiss_store",
+        max_cached: int = 256,
+        compact_bytes: int = VECTOR_WAL_COMPACT_BYTES,
+        index_type: str = VECTOR_INDEX_TYPE,
+        rerank: int = VECTOR_RERANK,
+        nprobe: int = VECTOR_IVF_NPROBE,
+        mmap_min_bytes: int = VECTOR_MMAP_MIN_BYTES
+    ):
+        target_kind(index_type, 0)  # fail fast on an unknown type
+        self.base_path = base_path
+        self.max_cached = max_cached
+        self.compact_bytes = compact_bytes
+        self.index_type = index_type
+        self.rerank = rerank
+        self.nprobe = nprobe
+        self.mmap_min_bytes = mmap_min_bytes
+        self._cache: OrderedDict[str, _Partition] = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._partition_locks: dict[str, threading.Lock] = {}
+        os.makedirs(base_path, exist_ok=True)
 
-        if os.path.exists(index_path):
-            self.index, self.metadata = self._load()
-        else:
-            quantizer = faiss.IndexFlatL2(dim)
-            self.index = faiss.IndexIVFFlat(quantizer, dim, 100)
-            self.index.train(np.random.random((3900, dim)).astype("float32"))
-            self.metadata = []
+    def index_path(self, uid: str, session_id: str) -> str:
+        return f"{self.base_path}/{uid}_{session_id}_docs.index"
+
+    def _partition_lock(self, path: str) -> threading.Lock:
+        # faiss indexes are not safe to search while another thread adds to them
+        with self._cache_lock:
+            lock = self._partition_locks.get(path)
+            if lock is None:
+                lock = self._partition_locks[path] = threading.Lock()
+            return lock
 
-    def add(self, vectors: list[list[float]], metadata: list[dict]):
-        vectors_np = np.array(vectors).astype("float32")
-        self.index.add(vectors_np)
-        self.metadata.extend(metadata)
-        self._save()
+    # ----------------------------------
+    # Write path
+    # ----------------------------------
+    def add(self, uid: str, session_id: str, vectors: list[list[float]], metadata: list[dict]) -> list[int]:
+        """Append chunks to the session's partition. Returns their vector ids."""
+        import faiss
+        import numpy as np
 
+        if not vectors:
+            return []
+        vectors_np = np.array(vectors, dtype="float32")
+        path = self.index_path(uid, session_id)
+        wal = VectorWAL(path)
+        with self._partition_lock(path), wal.lock():
+            partition = self._load(path)
+            if partition is None:
+                # New partition: the first batch becomes the index file itself
+                partition = _Partition(
+                    faiss.IndexIDMap2(faiss.IndexFlatL2(vectors_np.shape[1])), ChunkMetadata(path)
+                )
+                ids = np.arange(len(vectors_np), dtype="int64")
+                with observe_stage("faiss", "add", vectors=len(ids)):
+                    partition.metadata.append(zip(ids.tolist(), metadata))
+                    partition.index.add_with_ids(vectors_np, ids)
+                partition.indexed_until = len(ids)
+                self._compact(path, partition, wal)
+                return ids.tolist()
+
+            if partition.index.d != vectors_np.shape[1]:
+                raise ValueError(
+                    f"Embedding dimension {vectors_np.shape[1]} does not match the "
+                    f"session index ({partition.index.d})"
+                )
+            next_id = partition.metadata.next_id
+            ids = np.arange(next_id, next_id + len(vectors_np), dtype="int64")
+            with observe_stage("faiss", "add", vectors=len(ids)):
+                wal_offset = wal.append(partition.wal_offset, next_id, vectors_np)
+                # Commit point: the log record counts once its metadata is written
+                partition.metadata.append(
+                    zip(ids.tolist(), metadata), vectors_np if partition.metadata.vector_dim else None
+                )
+                partition.add(vectors_np, ids)
+            partition.wal_offset = wal_offset
+            partition.indexed_until = next_id + len(ids)
+            partition.seen = self._seen(path, wal)
+
+            if partition.wal_offset >= self.compact_bytes:
+                with observe_stage("faiss", "compact", vectors=partition.ntotal):
+                    self._compact(path, partition, wal)
+        return ids.tolist()
+
+    # ----------------------------------
+    # Read path
+    # ----------------------------------
     def search(
         self,
+        uid: str,
+        session_id: str,
         vector: list[float],
-        user_id: str,
-        chat_session_id: str,
-        k: int = 5
-    ):
-        D, I = self.index.search(
-            np.array([vector]).astype("float32"),
-            k * 3  # over-fetch for filtering
-        )
-
-        results = []
-        for idx in I[0]:
-            if idx >= len(self.metadata):
-                continue
-
-            meta = self.metadata[idx]
-            if (
-                meta["user_id"] == user_id and
-                meta["chat_session_id"] == chat_session_id
-            ):
-                results.append(meta)
-
-            if len(results) >= k:
-                break
-
-        return results
-
-    def _save(self):
-        faiss.write_index(self.index, self.index_path)
-        with open(self.index_path + ".meta", "wb") as f:
-            pickle.dump(self.metadata, f)
-
-    def _load(self):
-        index = faiss.read_index(self.index_path)
-        with open(self.index_path + ".meta", "rb") as f:
-            metadata = pickle.load(f)
-        return index, metadata
\ No newline at end of file
+        k: int = 5,
+        document_ids: Optional[set] = None
+    ) -> list[dict]:
+        """
+        Top-k chunks of the session, nearest first. Each result is the
+        chunk's metadata plus its L2 `score`. `document_ids` restricts the
+        search to those documents.
+        """
+        import faiss
+        import numpy as np
+
+        if not vector:
+            return []
+        path = self.index_path(uid, session_id)
+        with self._partition_lock(path):
+            partition = self._load(path)
+            if partition is None or partition.ntotal == 0:
+                return []
+            query = np.array([vector], dtype="float32")
+            if query.shape[1] != partition.index.d:
+                logger.warning(f"Query dimension {query.shape[1]} does not match index {path}")
+                return []
+
+            selector = None
+            if document_ids is not None:
+                selected = partition.metadata.ids_for_documents(document_ids)
+                if not len(selected):
+                    return []
+                selector = faiss.IDSelectorBatch(selected)
+            rerank = self.rerank > 1 and partition.metadata.vector_dim and index_kind(partition.index) != "flat"
+            candidates = k * self.rerank if rerank else k
+
+            with observe_stage("faiss", "search", k=k, index_size=partition.ntotal):
+                hits = []
+                for index in (partition.index, partition.delta):
+                    if index is None or index.ntotal == 0:
+                        continue
+                    distances, ids = index.search(
+                        query, min(candidates, index.ntotal), params=search_params(index, selector, self.nprobe)
+                    )
+                    hits += [(d, i) for d, i in zip(distances[0].tolist(), ids[0].tolist()) if i >= 0]
+                if partition.delta is not None:
+                    hits = sorted(hits)[:candidates]
+            if rerank and hits:
+                with observe_stage("faiss", "rerank", candidates=len(hits)):
+                    exact = partition.metadata.vectors(i for _, i in hits)
+                    exact_distances = ((exact - query) ** 2).sum(axis=1)
+                    hits = [(float(exact_distances[j]), hits[j][1]) for j in np.argsort(exact_distances)]
+            hits = hits[:k]
+            # Only the returned rows are read from the metadata files
+            chunks = partition.metadata.get_many(i for _, i in hits)
+            return [{**chunk, "score": d} for (d, _), chunk in zip(hits, chunks) if chunk is not None]
+
+    def has_documents(self, uid: str, session_id: str) -> bool:
+        return os.path.exists(self.index_path(uid, session_id))
+
+    def get_chunks(self, uid: str, session_id: str, ids: list[int]) -> list[Optional[dict]]:
+        """Chunk metadata by vector id (None where unknown)."""
+        path = self.index_path(uid, session_id)
+        with self._partition_lock(path):
+            partition = self._load(path)
+            return partition.metadata.get_many(ids) if partition else [None] * len(ids)
+
+    def get_vectors(self, uid: str, session_id: str, ids: list[int]):
+        """Exact vectors by id, one row each (flat partitions read them from the index)."""
+        import numpy as np
+
+        path = self.index_path(uid, session_id)
+        with self._partition_lock(path):
+            partition = self._load(path)
+            if partition is None:
+                raise KeyError(f"No vectors stored for session {session_id}")
+            if partition.metadata.vector_dim:
+                return partition.metadata.vectors(ids)
+            return np.stack([partition.reconstruct(i) for i in ids]) if ids else np.zeros((0, partition.index.d))
+
+    def chunk_count(self, uid: str, session_id: str) -> int:
+        path = self.index_path(uid, session_id)
+        with self._partition_lock(path):
+            partition = self._load(path)
+            return len(partition.metadata) if partition else 0
+
+    def chunk_texts(self, uid: str, session_id: str, start: int = 0) -> tuple[list[int], list[str]]:
+        """(vector ids, texts) of the session's chunks, in id order, from the `start`-th on."""
+        path = self.index_path(uid, session_id)
+        with self._partition_lock(path):
+            partition = self._load(path)
+            return partition.metadata.texts_from(start) if partition else ([], [])
+
+    # ----------------------------------
+    # Deletion
+    # ----------------------------------
+    def delete(self, uid: str, session_id: str):
+        path = self.index_path(uid, session_id)
+        wal = VectorWAL(path)
+        with self._partition_lock(path), wal.lock():
+            self._remove_files(path, wal)
+
+    def delete_documents(self, uid: str, session_id: str, document_ids: set) -> int:
+        """
+        Remove the chunks of `document_ids` from the partition; the rest keep
+        their vector ids. Rewrites the metadata and index, so it suits small
+        partitions (long-term memory). Returns the number of chunks removed.
+        """
+        import faiss
+        import numpy as np
+
+        path = self.index_path(uid, session_id)
+        wal = VectorWAL(path)
+        with self._partition_lock(path), wal.lock():
+            partition = self._load(path)
+            if partition is None:
+                return 0
+            metadata = partition.metadata
+            removed = metadata.ids_for_documents(document_ids)
+            if not len(removed):
+                return 0
+            stored = np.asarray(metadata.all_vectors()[0], dtype="int64")
+            keep = stored[~np.isin(stored, removed)]
+            if not len(keep):
+                self._remove_files(path, wal)
+                return len(removed)
+
+            if metadata.vector_dim:
+                vectors = metadata.vectors(keep)
+            else:
+                vectors = np.stack([partition.reconstruct(i) for i in keep.tolist()])
+            rewritten = ChunkMetadata(path + ".rewrite")
+            rewritten.append(
+                (i, {k: v for k, v in chunk.items() if k != "vector_id"})
+                for i, chunk in zip(keep.tolist(), metadata.get_many(keep))
+            )
+            if metadata.vector_dim:
+                rewritten.attach_vectors(vectors)
+            rewritten.header["next_id"] = metadata.next_id  # removed ids are never reused
+            rewritten._write_header(rewritten.header)
+            rewritten.close()
+            # Header last: until it is replaced, readers see the old row count.
+            # The old index may briefly hold removed ids; they have no metadata
+            # and drop out of search results.
+            files = ChunkMetadata.files(path)
+            for src, dst in zip(ChunkMetadata.files(rewritten.path)[::-1], files[::-1]):
+                if os.path.exists(src):
+                    os.replace(src, dst)
+                elif os.path.exists(dst):
+                    os.remove(dst)
+            metadata.close()
+            partition.metadata = ChunkMetadata.open(path)
+
+            index = faiss.IndexIDMap2(faiss.IndexFlatL2(vectors.shape[1]))
+            index.add_with_ids(np.ascontiguousarray(vectors, dtype="float32"), keep)
+            partition.index, partition.delta, partition.mapped = index, None, False
+            partition.indexed_until = partition.metadata.next_id
+            self._compact(path, partition, wal)
+            return len(removed)
+
+    def delete_all_for_user(self, uid: str):
+        """Every partition of the user (documents, long-term memory)."""
+        paths = {
+            os.path.join(self.base_path, file[:file.index(".index") + len(".index")])
+            for file in os.listdir(self.base_path)
+            if file.startswith(f"{uid}_") and ".index" in file
+        }
+        for path in sorted(paths):
+            wal = VectorWAL(path)
+            with self._partition_lock(path), wal.lock():
+                self._remove_files(path, wal)
+
+    def _remove_files(self, path: str, wal: VectorWAL):
+        """Caller holds the partition and log locks."""
+        self._forget(path)
+        leftovers = (path + ".tmp", *ChunkMetadata.files(path + ".rewrite"))
+        for p in (path, path + ".meta", *ChunkMetadata.files(path), *leftovers, wal.path):
+            if os.path.exists(p):
+                os.remove(p)
+
+    # ----------------------------------
+    # Storage
+    # ----------------------------------
+    @staticmethod
+    def _file_version(path: str):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _seen(self, path: str, wal: VectorWAL):
+        return self._file_version(ChunkMetadata.files(path)[0]), wal.size()
+
+    def _load(self, path: str) -> Optional[_Partition]:
+        """Cached partition, refreshed if another worker changed its files."""
+        import faiss
+
+        version = self._file_version(path)
+        if version is None:
+            self._forget(path)
+            return None
+
+        wal = VectorWAL(path)
+        seen = self._seen(path, wal)
+        with self._cache_lock:
+            partition = self._cache.get(path)
+        if partition is None or partition.version != version:
+            if partition is not None:
+                partition.metadata.close()
+            index, mapped = self._read_index(path, version[1])
+            if os.path.exists(path + ".meta"):
+                convert_pickle_metadata(path).close()
+            metadata = ChunkMetadata.open(path)
+            if not isinstance(index, faiss.IndexIDMap2):
+                index, version = self._convert_legacy(path, index, len(metadata))
+                mapped = False
+            partition = _Partition(index, metadata, version, mapped)
+        elif partition.seen != seen:
+            partition.metadata.close()
+            partition.metadata = ChunkMetadata.open(path)
+        if partition.seen != seen:
+            self._replay(partition, wal)
+            partition.seen = seen
+        self._remember(path, partition)
+        return partition
+
+    def _read_index(self, path: str, size: int):
+        """(index, memory-mapped?) Large files are mapped rather than read."""
+        import faiss
+
+        if size < self.mmap_min_bytes:
+            return faiss.read_index(path), False
+        with observe_stage("faiss", "map_index", bytes=size):
+            index = faiss.read_index(path, faiss.IO_FLAG_MMAP_IFC)  # flat and SQ codes
+            if isinstance(index, faiss.IndexIDMap2) and index_kind(index) == "ivfpq":
+                index = faiss.read_index(path, faiss.IO_FLAG_MMAP)  # inverted lists
+        return index, True
+
+    @staticmethod
+    def _replay(partition: _Partition, wal: VectorWAL):
+        """Apply committed log records past `wal_offset` to the in-memory index."""
+        import numpy as np
+
+        for end, first_id, vectors in wal.read(partition.wal_offset):
+            last_id = first_id + len(vectors)
+            if last_id > partition.metadata.next_id:
+                break  # not committed (yet): a crashed or in-flight add
+            if first_id >= partition.indexed_until:
+                partition.add(vectors, np.arange(first_id, last_id, dtype="int64"))
+                partition.indexed_until = last_id
+            partition.wal_offset = end
+
+    def _convert_legacy(self, path: str, index, chunks: int):
+        """Old partitions: an IVF index whose positions are the vector ids."""
+        import faiss
+        import numpy as np
+
+        count = min(index.ntotal, chunks)
+        if hasattr(index, "make_direct_map"):
+            index.make_direct_map()
+        vectors = index.reconstruct_n(0, count) if count else np.zeros((0, index.d), dtype="float32")
+        converted = faiss.IndexIDMap2(faiss.IndexFlatL2(index.d))
+        converted.add_with_ids(vectors, np.arange(count, dtype="int64"))
+        version = self._write_index(path, converted)
+        logger.info(f"Converted legacy vector index {path} ({count} chunks)")
+        return converted, version
+
+    def _rebuild(self, path: str, partition: _Partition):
+        """Move the partition to the configured index type; retrain int8 ranges."""
+        import numpy as np
+
+        kind = index_kind(partition.index)
+        target = target_kind(self.index_type, partition.ntotal)
+        if target == kind and kind != "sq_int8":
+            return
+        metadata = partition.metadata
+        if kind == "flat":
+            ids, vectors = exact_vectors(partition.index)
+            if partition.delta is not None:
+                delta_ids, delta_vectors = exact_vectors(partition.delta)
+                ids, vectors = np.concatenate([ids, delta_ids]), np.concatenate([vectors, delta_vectors])
+            if len(ids) != len(metadata) or np.any(ids != metadata.all_vectors()[0]):
+                logger.warning(f"Index and metadata of {path} differ; keeping its {kind} index")
+                return
+            if not metadata.vector_dim:
+                metadata.attach_vectors(vectors)
+        elif metadata.vector_dim:
+            ids, vectors = metadata.all_vectors()
+        else:
+            logger.warning(f"No exact vectors stored for {path}; keeping its {kind} index")
+            return
+        with observe_stage("faiss", "rebuild", kind=target, vectors=len(ids)):
+            partition.index = build_index(
+                target, np.ascontiguousarray(vectors, dtype="float32"), np.asarray(ids, dtype="int64")
+            )
+        partition.delta, partition.mapped = None, False
+
+    def _compact(self, path: str, partition: _Partition, wal: VectorWAL):
+        """Fold the log into the index file. Caller holds the log lock."""
+        import faiss
+
+        self._rebuild(path, partition)
+        if partition.delta is not None:
+            # Mapped indexes cannot grow: merge into an in-RAM copy of the file
+            index = faiss.read_index(path)
+            delta_ids, delta_vectors = exact_vectors(partition.delta)
+            index.add_with_ids(delta_vectors, delta_ids)
+            partition.index, partition.delta, partition.mapped = index, None, False
+        partition.version = self._write_index(path, partition.index)
+        if partition.version[1] >= self.mmap_min_bytes:
+            partition.index, partition.mapped = self._read_index(path, partition.version[1])
+        wal.reset()
+        partition.wal_offset = 0
+        partition.seen = self._seen(path, wal)
+        self._remember(path, partition)
+
+    def _write_index(self, path: str, index):
+        import faiss
+
+        faiss.write_index(index, path + ".tmp")
+        with open(path + ".tmp", "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        return self._file_version(path)
+
+    def _remember(self, path: str, partition: _Partition):
+        with self._cache_lock:
+            self._cache[path] = partition
+            self._cache.move_to_end(path)
+            # Evicted partitions are not closed here: another thread may still
+            # be searching one under its partition lock. Their maps are
+            # released once the last reference goes.
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+
+    def _forget(self, path: str):
+        """Drop and close the cached partition. Caller holds its partition lock."""
+        with self._cache_lock:
+            partition = self._cache.pop(path, None)
+        if partition is not None:
+            partition.metadata.close()
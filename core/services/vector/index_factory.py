@@ -0,0 +1,89 @@
+"""
+Index types for document partitions.
+
+- `flat`: exact float32 vectors (4 bytes per dimension)
+- `sq_fp16`: scalar quantizer, float16 (2 bytes per dimension), no training
+- `sq_int8`: scalar quantizer, 8 bits per dimension, trained on the partition
+- `ivfpq`: inverted lists with product quantization (d/8 bytes per vector),
+  for large partitions. Training needs IVFPQ_MIN_TRAIN vectors; smaller
+  partitions use `sq_int8` until they reach it.
+
+Every type is wrapped in an IndexIDMap2 so vector ids stay those of the
+chunk metadata. Compressed types return approximate distances; the store can
+re-rank their candidates against the exact vectors kept on disk.
+"""
+
+import math
+
+INDEX_TYPES = ("flat", "sq_fp16", "sq_int8", "ivfpq")
+IVFPQ_MIN_TRAIN = 10_000  # 39 training points per PQ centroid (256 per sub-quantizer)
+
+
+def target_kind(configured: str, count: int) -> str:
+    """Index type a partition of `count` vectors should use."""
+    if configured not in INDEX_TYPES:
+        raise ValueError(f"Unknown vector index type {configured!r}; expected one of {INDEX_TYPES}")
+    if configured == "ivfpq" and count < IVFPQ_MIN_TRAIN:
+        return "sq_int8"
+    return configured
+
+
+def index_kind(index) -> str:
+    import faiss
+
+    inner = faiss.downcast_index(index.index)
+    if isinstance(inner, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(inner, faiss.IndexScalarQuantizer):
+        return "sq_fp16" if inner.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else "sq_int8"
+    return "flat"
+
+
+def build_index(kind: str, vectors, ids):
+    """An IndexIDMap2 of `kind` trained on and holding `vectors`."""
+    import faiss
+
+    dim = vectors.shape[1]
+    if kind == "flat":
+        inner = faiss.IndexFlatL2(dim)
+    elif kind == "sq_fp16":
+        inner = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_fp16)
+    elif kind == "sq_int8":
+        inner = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit)
+    elif kind == "ivfpq":
+        nlist = max(1, min(4 * int(math.sqrt(len(vectors))), len(vectors) // 39))
+        inner = faiss.IndexIVFPQ(faiss.IndexFlatL2(dim), dim, nlist, _pq_subquantizers(dim), 8)
+    else:
+        raise ValueError(f"Unknown vector index type {kind!r}")
+    if not inner.is_trained:
+        inner.train(vectors)
+    index = faiss.IndexIDMap2(inner)
+    index.add_with_ids(vectors, ids)
+    return index
+
+
+def _pq_subquantizers(dim: int) -> int:
+    # ~1 byte per 8 dimensions; must divide the dimension
+    m = max(1, dim // 8)
+    while dim % m:
+        m -= 1
+    return m
+
+
+def search_params(index, selector=None, nprobe: int = 16):
+    """Search parameters for `index`; IVF indexes need their own type."""
+    import faiss
+
+    if index_kind(index) == "ivfpq":
+        return faiss.SearchParametersIVF(sel=selector, nprobe=nprobe)
+    if selector is not None:
+        return faiss.SearchParameters(sel=selector)
+    return None
+
+
+def exact_vectors(index):
+    """(ids, float32 vectors) of a flat partition index, in insertion order."""
+    import faiss
+
+    ids = faiss.vector_to_array(index.id_map)
+    return ids, index.index.reconstruct_n(0, index.ntotal)
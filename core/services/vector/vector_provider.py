@@ -0,0 +1,26 @@
+"""
+One document vector store and one BM25 index per worker process, shared by
+the chat, document upload and account deletion paths.
+"""
+
+from config.settings import HYBRID_SEARCH_ENABLED
+from core.services.faiss_service import FaissService
+from core.services.rag.bm25_index import SessionBM25Index
+
+_faiss_service = None
+_lexical_index = None
+
+
+def get_faiss_service() -> FaissService:
+    global _faiss_service
+    if _faiss_service is None:
+        _faiss_service = FaissService(base_path="faiss_store")
+    return _faiss_service
+
+
+def get_lexical_index() -> SessionBM25Index | None:
+    """Per-session BM25 over the store's chunks; None when hybrid search is off."""
+    global _lexical_index
+    if _lexical_index is None and HYBRID_SEARCH_ENABLED:
+        _lexical_index = SessionBM25Index(get_faiss_service())
+    return _lexical_index
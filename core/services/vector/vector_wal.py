@@ -0,0 +1,95 @@
+"""
+Append-only write-ahead log of vectors added to a partition since its index
+file was last written.
+
+`{path}.wal` is a sequence of records, each holding a run of consecutive
+vector ids:
+
+    magic "VWAL" | count <u4 | first id <i8 | dim <u4 | count*dim float32 | crc32 <u4
+
+The CRC covers everything before it, so a record torn by a crash is detected
+and the log is read up to the last complete record. Which records count is
+decided by the caller (the store only applies ids its metadata committed).
+Writers serialize on an exclusive flock of the log, across threads and
+worker processes.
+"""
+
+import fcntl
+import os
+import struct
+import zlib
+from contextlib import contextmanager
+from typing import Iterator
+
+MAGIC = b"VWAL"
+_HEADER = struct.Struct("<4sIqI")
+_CRC = struct.Struct("<I")
+
+
+class VectorWAL:
+    def __init__(self, path: str):
+        self.path = path + ".wal"
+
+    def size(self) -> int:
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+
+    @contextmanager
+    def lock(self):
+        """Exclusive across processes; held for appends and compaction."""
+        with open(self.path, "ab") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def append(self, offset: int, first_id: int, vectors) -> int:
+        """
+        Write one record at `offset`, dropping anything after it (uncommitted
+        or torn records). Returns the new end offset. Caller holds the lock.
+        """
+        count, dim = vectors.shape
+        record = _HEADER.pack(MAGIC, count, first_id, dim) + vectors.astype("<f4").tobytes()
+        record += _CRC.pack(zlib.crc32(record))
+        with open(self.path, "ab") as f:
+            f.truncate(offset)
+            f.write(record)
+            f.flush()
+            os.fsync(f.fileno())
+        return offset + len(record)
+
+    def read(self, offset: int = 0) -> Iterator[tuple[int, int, "object"]]:
+        """(end offset, first id, vectors) for each complete record after `offset`."""
+        import numpy as np
+
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        position = 0
+        while position + _HEADER.size <= len(data):
+            magic, count, first_id, dim = _HEADER.unpack_from(data, position)
+            end = position + _HEADER.size + count * dim * 4
+            if magic != MAGIC or end + _CRC.size > len(data):
+                return
+            (crc,) = _CRC.unpack_from(data, end)
+            if crc != zlib.crc32(data[position:end]):
+                return
+            vectors = np.frombuffer(data, dtype="<f4", count=count * dim, offset=position + _HEADER.size)
+            position = end + _CRC.size
+            yield offset + position, first_id, vectors.reshape(count, dim)
+
+    def reset(self):
+        """Empty the log after its records were compacted. Caller holds the lock."""
+        with open(self.path, "ab") as f:
+            f.truncate(0)
+            os.fsync(f.fileno())
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
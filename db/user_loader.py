@@ -0,0 +1,119 @@
+"""
+DataLoader-style access to `users` documents.
+
+- Within a request, each user is fetched at most once: results are memoized
+  in a request-scoped context variable (bound by `user_loader_middleware`).
+- Across requests, lookups issued within `batch_window` seconds of each other
+  are sent as one `find({"firebase_uid": {"$in": [...]}})`.
+
+Returned documents are shared between callers and must be treated as
+read-only. Code that writes a user calls `clear(uid)` so the rest of the
+request sees the new document.
+"""
+
+import asyncio
+import contextvars
+from typing import Optional
+
+from core.observability.metrics import LOADER_BATCH_SIZE, record_cache
+from core.observability.tracing import span
+
+_request_memo = contextvars.ContextVar("medibot_user_memo", default=None)
+
+
+class UserLoader:
+    def __init__(self, collection, batch_window: float = 0.002, max_batch: int = 100):
+        self.collection = collection
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self._pending: dict[str, asyncio.Future] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def load(self, firebase_uid: str) -> Optional[dict]:
+        """The user's document, or None if there is none."""
+        memo = _request_memo.get()
+        if memo is not None:
+            future = memo.get(firebase_uid)
+            if future is not None:
+                record_cache("user_loader", True)
+                return await asyncio.shield(future)
+        record_cache("user_loader", False)
+
+        future = self._enqueue(firebase_uid)
+        if memo is not None:
+            memo[firebase_uid] = future
+        # shield: a cancelled caller must not cancel the lookup others share
+        return await asyncio.shield(future)
+
+    def clear(self, firebase_uid: str):
+        """Forget the request's copy of a user after writing it."""
+        memo = _request_memo.get()
+        if memo is not None:
+            memo.pop(firebase_uid, None)
+
+    # ----------------------------------
+    # Batching
+    # ----------------------------------
+    def _enqueue(self, firebase_uid: str) -> asyncio.Future:
+        future = self._pending.get(firebase_uid)
+        if future is not None:
+            return future  # already in the next batch
+
+        loop = asyncio.get_running_loop()
+        future = self._pending[firebase_uid] = loop.create_future()
+        if len(self._pending) >= self.max_batch:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.batch_window, self._dispatch)
+        return future
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        if not batch:
+            return
+        task = asyncio.get_running_loop().create_task(self._fetch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _fetch(self, batch: dict[str, asyncio.Future]):
+        LOADER_BATCH_SIZE.labels("users").observe(len(batch))
+        try:
+            with span("user_loader.fetch", batch=len(batch)):
+                cursor = self.collection.find({"firebase_uid": {"$in": list(batch)}})
+                docs = await cursor.to_list(length=len(batch))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        found = {doc["firebase_uid"]: doc for doc in docs}
+        for uid, future in batch.items():
+            if not future.done():
+                future.set_result(found.get(uid))
+
+
+async def user_loader_middleware(request, call_next):
+    """Give each request its own memo of loaded users."""
+    token = _request_memo.set({})
+    try:
+        return await call_next(request)
+    finally:
+        _request_memo.reset(token)
+
+
+_user_loader = None
+
+
+def get_user_loader() -> UserLoader:
+    """One loader per worker process, so concurrent requests share batches."""
+    global _user_loader
+    if _user_loader is None:
+        from db.mongodb import users_collection
+
+        _user_loader = UserLoader(users_collection)
+    return _user_loader
@@ -1,22 +1,47 @@
 from datetime import datetime
 
-async def ensure_user_exists(users_collection, firebase_uid: str):
+
+def new_user_fields(firebase_uid: str, skip: tuple = ()) -> dict:
+    """
+    `$setOnInsert` fields of a new user document. Every upsert of a user
+    passes them, so whichever write creates the document creates it whole.
+    `skip` drops the paths the same update already sets.
+    """
+    now = datetime.utcnow()
+    fields = {
+        "firebase_uid": firebase_uid,
+        "profile.age": None,
+        "profile.gender": None,
+        "profile.allergies": [],
+        "profile.chronic_conditions": [],
+        "profile.active_medications": [],
+        "profile.medical_summary": "",
+        "created_at": now,
+        "updated_at": now
+    }
+    return {
+        path: value for path, value in fields.items()
+        if not any(path == s or path.startswith(s + ".") for s in skip)
+    }
+
+
+async def ensure_user_exists(users_collection, firebase_uid: str, known_users=None, user_loader=None):
+    # Users seen recently already have their document; skip the upsert
+    if known_users and await known_users.contains(firebase_uid):
+        return
+
+    # A (batched) read is cheaper than a write, and the request memoizes it
+    if user_loader and await user_loader.load(firebase_uid) is not None:
+        if known_users:
+            await known_users.add(firebase_uid)
+        return
+
     await users_collection.update_one(
         {"firebase_uid": firebase_uid},
-        {
-            "$setOnInsert": {
-                "firebase_uid": firebase_uid,
-                "profile": {
-                    "age": None,
-                    "gender": None,
-                    "allergies": [],
-                    "chronic_conditions": [],
-                    "active_medications": [],
-                    "medical_summary": ""
-                },
-                "created_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow()
-            }
-        },
+        {"$setOnInsert": new_user_fields(firebase_uid)},
         upsert=True
-    )
\ No newline at end of file
+    )
+    if user_loader:
+        user_loader.clear(firebase_uid)
+    if known_users:
+        await known_users.add(firebase_uid)
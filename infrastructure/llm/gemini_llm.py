@@ -1,74 +1,207 @@
 
+import asyncio
+import hashlib
 import json
-from google import genai
-from config.settings import GEMINI_API_KEY
+import logging
+import time
+from typing import Optional
+from config.settings import GEMINI_API_KEY, GEMINI_CACHE_SYSTEM_PROMPT, GEMINI_CACHE_TTL
+from core.observability.metrics import (
+    QUEUE_DEPTH,
+    STAGE_LATENCY,
+    is_quota_error,
+    observe_stage,
+    record_llm_error,
+    record_llm_usage,
+)
+from core.observability.tracing import span
+
+# In-flight Gemini calls across all operations of this worker
+_inflight = QUEUE_DEPTH.labels("gemini_inflight")
+
+QUOTA_EXCEEDED_RESPONSE = json.dumps({
+    "error": "quota_exceeded",
+    "message": "Gemini API quota exceeded. Please check your plan or try again later."
+})
+
+
+class QuotaExceededError(RuntimeError):
+    """Gemini answered 429 / RESOURCE_EXHAUSTED."""
+
 
 class GeminiLLM:
+    MODEL = "gemini-2.5-flash"
+
     def __init__(self):
-        self.client = genai.Client(api_key=GEMINI_API_KEY)
+        self._client = None
+        # system instruction hash -> (cached content name or None, valid until)
+        self._cached_contents: dict[str, tuple[Optional[str], float]] = {}
+        self._cache_lock = asyncio.Lock()
+
+    @property
+    def client(self):
+        """
+        GenAI client, created on first use.
+        The SDK takes a few hundred ms to import, so it is kept off the startup path.
+        """
+        if self._client is None:
+            from google import genai
+            self._client = genai.Client(api_key=GEMINI_API_KEY)
+        return self._client
 
-    async def generate(self, prompt: str) -> str:
+    async def _with_system_instruction(self, config: dict, system_instruction: Optional[str]) -> dict:
+        """
+        Attach the static system instruction to a request config.
+        With GEMINI_CACHE_SYSTEM_PROMPT it is uploaded once as cached content
+        and referenced by name; otherwise (or if caching fails) it is sent inline.
+        """
+        if not system_instruction:
+            return config
+        if GEMINI_CACHE_SYSTEM_PROMPT:
+            name = await self._cached_content(system_instruction)
+            if name:
+                return {**config, "cached_content": name}
+        return {**config, "system_instruction": system_instruction}
+
+    async def _cached_content(self, system_instruction: str) -> Optional[str]:
+        key = hashlib.sha256(system_instruction.encode("utf-8")).hexdigest()
+        entry = self._cached_contents.get(key)
+        if entry and entry[1] > time.monotonic():
+            return entry[0]
+
+        async with self._cache_lock:
+            entry = self._cached_contents.get(key)
+            if entry and entry[1] > time.monotonic():
+                return entry[0]
+            try:
+                cache = await self.client.aio.caches.create(
+                    model=self.MODEL,
+                    config={
+                        "display_name": f"medibot-system-{key[:12]}",
+                        "system_instruction": system_instruction,
+                        "ttl": f"{GEMINI_CACHE_TTL}s",
+                    }
+                )
+                # Refresh a minute before the server-side TTL runs out
+                entry = (cache.name, time.monotonic() + max(GEMINI_CACHE_TTL - 60, 60))
+                logging.info(f"Created Gemini cached content {cache.name} for system prompt")
+            except Exception as e:
+                # e.g. prompt below the model's caching minimum; retry in 10 minutes
+                logging.warning(f"Gemini context caching unavailable, sending system prompt inline: {e}")
+                entry = (None, time.monotonic() + 600)
+            self._cached_contents[key] = entry
+            return entry[0]
+
+    async def generate(
+        self,
+        prompt: str,
+        raise_quota_errors: bool = False,
+        system_instruction: Optional[str] = None
+    ) -> str:
         """
         Generates a STRICT JSON response from Gemini.
         This method is REQUIRED by ChatService.
+
+        On quota exhaustion an error JSON blob is returned, unless
+        `raise_quota_errors` is set (the LLM scheduler retries those itself).
         """
+        _inflight.inc()
         try:
-            response = self.client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=prompt,
-                config={
+            config = await self._with_system_instruction(
+                {
                     "response_mime_type": "application/json",
                     "temperature": 0.2
-                }
+                },
+                system_instruction
             )
+            with observe_stage("gemini", "generate", prompt_chars=len(prompt)) as stage_span:
+                response = await self.client.aio.models.generate_content(
+                    model=self.MODEL,
+                    contents=prompt,
+                    config=config
+                )
+                stage_span.set_attribute("response_chars", len(response.text or ""))
+            record_llm_usage("generate", response.usage_metadata)
             return response.text
         except Exception as e:
-            import logging
+            record_llm_error("generate", e)
             logging.error(f"Gemini generation failed: {e}")
             # Check for quota exhaustion (429)
-            if hasattr(e, 'args') and e.args and '429' in str(e.args[0]):
-                return json.dumps({
-                    "error": "quota_exceeded",
-                    "message": "Gemini API quota exceeded. Please check your plan or try again later."
-                })
+            if is_quota_error(e):
+                if raise_quota_errors:
+                    raise QuotaExceededError(str(e)) from e
+                return QUOTA_EXCEEDED_RESPONSE
             # Let ChatService handle other errors
             raise RuntimeError(f"Gemini generation failed: {e}")
+        finally:
+            _inflight.dec()
 
-    async def stream(self, prompt: str):
+    async def stream(
+        self,
+        prompt: str,
+        raise_quota_errors: bool = False,
+        system_instruction: Optional[str] = None
+    ):
         """
         Stream text response from Gemini, yielding tokens as they arrive.
         Returns an async generator that yields text chunks.
+        With `raise_quota_errors`, a 429 before the first chunk raises
+        QuotaExceededError so the caller can retry.
         """
+        start = time.perf_counter()
+        chunk_count = 0
+        usage = None
+        _inflight.inc()
         try:
-            response = self.client.models.generate_content_stream(
-                model="gemini-2.5-flash",
-                contents=prompt,
-                config={
-                    "temperature": 0.7
-                }
-            )
+            config = await self._with_system_instruction({"temperature": 0.7}, system_instruction)
+            with span("gemini.stream", prompt_chars=len(prompt)) as stream_span:
+                response = await self.client.aio.models.generate_content_stream(
+                    model=self.MODEL,
+                    contents=prompt,
+                    config=config
+                )
 
-            for chunk in response:
-                if chunk.text:
-                    yield chunk.text
-                    
+                async for chunk in response:
+                    # Token counts arrive with the final chunk
+                    usage = chunk.usage_metadata or usage
+                    if chunk.text:
+                        if chunk_count == 0:
+                            first_token_s = time.perf_counter() - start
+                            STAGE_LATENCY.labels("gemini", "stream_first_token").observe(first_token_s)
+                            stream_span.set_attribute("first_token_ms", round(first_token_s * 1000, 3))
+                        chunk_count += 1
+                        stream_span.set_attribute("chunk_count", chunk_count)
+                        yield chunk.text
+
+            record_llm_usage("stream", usage)
         except Exception as e:
-            import logging
+            record_llm_error("stream", e)
+            if raise_quota_errors and chunk_count == 0 and is_quota_error(e):
+                raise QuotaExceededError(str(e)) from e
             logging.error(f"Gemini streaming failed: {e}")
             yield f"Error generating response: {str(e)}"
+        finally:
+            _inflight.dec()
+            STAGE_LATENCY.labels("gemini", "stream").observe(time.perf_counter() - start)
 
-    async def embed(self, text: str) -> list[float]:
+    async def embed(self, text: str, raise_quota_errors: bool = False) -> list[float]:
         """
         Generate embeddings for the given text using Gemini's embedding model.
         """
+        _inflight.inc()
         try:
-            response = self.client.models.embed_content(
-                model="models/text-embedding-004",
-                contents=text
-            )
+            with observe_stage("gemini", "embed", text_chars=len(text)):
+                response = await self.client.aio.models.embed_content(
+                    model="models/text-embedding-004",
+                    contents=text
+                )
             return response.embeddings[0].values
         except Exception as e:
+            record_llm_error("embed", e)
+            if raise_quota_errors and is_quota_error(e):
+                raise QuotaExceededError(str(e)) from e
             # Return empty embedding on failure to allow graceful degradation
-            import logging
             logging.warning(f"Gemini embedding failed: {e}")
-            return []
\ No newline at end of file
+            return []
+        finally:
+            _inflight.dec()
\ No newline at end of file
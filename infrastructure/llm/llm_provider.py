@@ -0,0 +1,58 @@
+"""
+One Gemini client, one scheduler and one single-flight group per worker
+process. Controllers ask for an LLM at the priority of the work they do.
+"""
+
+import redis.asyncio as redis
+
+from config.settings import (
+    GEMINI_REQUESTS_PER_MINUTE,
+    GEMINI_TOKENS_PER_MINUTE,
+    LLM_DEADLINE_BACKGROUND,
+    LLM_DEADLINE_INTERACTIVE,
+    LLM_DEADLINE_REPORT,
+    REDIS_URL,
+    SINGLE_FLIGHT_LOCK_TTL,
+    SINGLE_FLIGHT_RESULT_TTL,
+)
+from core.services.cache.single_flight import SingleFlight
+from infrastructure.llm import gemini_llm
+from infrastructure.llm.llm_scheduler import LLMScheduler, Priority, ScheduledLLM
+
+_gemini = None
+_scheduler = None
+_single_flight = None
+
+
+def get_scheduler() -> LLMScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = LLMScheduler(
+            requests_per_minute=GEMINI_REQUESTS_PER_MINUTE,
+            tokens_per_minute=GEMINI_TOKENS_PER_MINUTE,
+            deadlines={
+                Priority.INTERACTIVE: LLM_DEADLINE_INTERACTIVE,
+                Priority.REPORT: LLM_DEADLINE_REPORT,
+                Priority.BACKGROUND: LLM_DEADLINE_BACKGROUND,
+            },
+        )
+    return _scheduler
+
+
+def get_single_flight() -> SingleFlight:
+    global _single_flight
+    if _single_flight is None:
+        _single_flight = SingleFlight(
+            "llm",
+            redis_client=redis.from_url(REDIS_URL, decode_responses=True),
+            lock_ttl=SINGLE_FLIGHT_LOCK_TTL,
+            result_ttl=SINGLE_FLIGHT_RESULT_TTL,
+        )
+    return _single_flight
+
+
+def get_llm(priority: Priority = Priority.INTERACTIVE) -> ScheduledLLM:
+    global _gemini
+    if _gemini is None:
+        _gemini = gemini_llm.GeminiLLM()
+    return ScheduledLLM(_gemini, get_scheduler(), priority, single_flight=get_single_flight())
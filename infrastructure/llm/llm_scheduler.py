@@ -0,0 +1,316 @@
+"""
+Central rate limiter and priority scheduler in front of Gemini.
+
+Every LLM call first asks the scheduler for admission. Admission is
+granted from two token buckets (requests/minute and tokens/minute) in
+priority order: interactive chat > report analysis > background jobs.
+Lower priorities must also leave a reserve in the buckets, so background
+work only soaks up spare quota and never delays the next chat turn.
+
+Queued calls carry a deadline and fail fast once it passes. A 429 from
+Gemini halves the refill rate and pauses admissions with exponential
+backoff; successes slowly restore the rate (AIMD).
+"""
+
+import asyncio
+import hashlib
+import heapq
+import itertools
+import logging
+import random
+import time
+from enum import IntEnum
+from typing import Optional
+
+from core.services.cache.single_flight import SingleFlight
+from core.observability.metrics import LLM_ERRORS, QUEUE_DEPTH, STAGE_LATENCY
+from infrastructure.llm.gemini_llm import QUOTA_EXCEEDED_RESPONSE, QuotaExceededError
+from infrastructure.llm.token_estimator import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0  # chat turns, titles, query embeddings
+    REPORT = 1       # report analysis, document ingestion
+    BACKGROUND = 2   # profile updates and other deferred work
+
+
+class DeadlineExceededError(RuntimeError):
+    """The call could not be admitted before its deadline."""
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute  # allow up to one minute of burst
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, rate_scale: float):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate * rate_scale)
+        self.updated = now
+
+    def wait_time(self, amount: float, reserve: float, rate_scale: float) -> float:
+        """Seconds until `amount` can be taken while leaving `reserve` (fraction of capacity)."""
+        self._refill(rate_scale)
+        amount = min(amount, self.capacity)
+        missing = amount + reserve * self.capacity - self.tokens
+        if missing <= 0:
+            return 0.0
+        return missing / (self.rate * rate_scale)
+
+    def consume(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+
+class LLMScheduler:
+    # Fraction of each bucket a priority class must leave untouched
+    RESERVES = {
+        Priority.INTERACTIVE: 0.0,
+        Priority.REPORT: 0.1,
+        Priority.BACKGROUND: 0.25,
+    }
+    MIN_RATE_SCALE = 0.1
+    MAX_BACKOFF = 60.0
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        deadlines: dict
+    ):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.deadlines = deadlines
+
+        self.rate_scale = 1.0
+        self._backoff_until = 0.0
+        self._consecutive_429 = 0
+
+        self._heap: list = []
+        self._seq = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._queued = {p: QUEUE_DEPTH.labels(f"llm_{p.name.lower()}") for p in Priority}
+
+    # ----------------------------------
+    # Admission
+    # ----------------------------------
+    def deadline_for(self, priority: Priority) -> float:
+        return time.monotonic() + self.deadlines[priority]
+
+    async def acquire(self, priority: Priority, tokens: int, deadline: float):
+        """Wait until the call may run. Raises DeadlineExceededError if it can't start in time."""
+        loop = asyncio.get_running_loop()
+        self._ensure_dispatcher(loop)
+
+        future = loop.create_future()
+        heapq.heappush(self._heap, (priority, next(self._seq), deadline, tokens, future))
+        self._queued[priority].inc()
+        self._wakeup.set()
+
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(future, timeout=max(0.0, deadline - start))
+        except asyncio.TimeoutError:
+            LLM_ERRORS.labels(f"schedule_{priority.name.lower()}", "deadline_exceeded").inc()
+            raise DeadlineExceededError(
+                f"{priority.name} LLM call not admitted within its deadline"
+            ) from None
+        finally:
+            STAGE_LATENCY.labels("llm_scheduler", priority.name.lower()).observe(
+                time.monotonic() - start
+            )
+
+    def record_success(self):
+        self._consecutive_429 = 0
+        if self.rate_scale < 1.0:
+            self.rate_scale = min(1.0, self.rate_scale + 0.05)
+
+    def record_quota_error(self):
+        """Gemini said 429: halve the admission rate and back off exponentially."""
+        self._consecutive_429 += 1
+        self.rate_scale = max(self.MIN_RATE_SCALE, self.rate_scale * 0.5)
+        backoff = min(self.MAX_BACKOFF, 2 ** (self._consecutive_429 - 1))
+        self._backoff_until = max(
+            self._backoff_until, time.monotonic() + backoff * random.uniform(0.8, 1.2)
+        )
+        logger.warning(
+            f"Gemini quota exceeded; backing off {backoff:.1f}s at {self.rate_scale:.0%} rate"
+        )
+
+    # ----------------------------------
+    # Dispatcher
+    # ----------------------------------
+    def _ensure_dispatcher(self, loop: asyncio.AbstractEventLoop):
+        if self._loop is loop and self._dispatcher is not None and not self._dispatcher.done():
+            return
+        if self._loop is loop and self._dispatcher is not None:
+            # The dispatcher died: restart it on the same queue, so calls
+            # already waiting are still admitted
+            if not self._dispatcher.cancelled() and self._dispatcher.exception() is not None:
+                logger.error("LLM dispatcher stopped; restarting", exc_info=self._dispatcher.exception())
+            self._dispatcher = loop.create_task(self._dispatch())
+            return
+        # First use, or a new event loop (e.g. tests / benchmark restarts):
+        # calls queued on the old loop can never be admitted, fail them now
+        for priority, _, _, _, future in self._heap:
+            self._queued[priority].dec()
+            if not future.done():
+                try:
+                    future.set_exception(DeadlineExceededError("LLM scheduler moved to a new event loop"))
+                except RuntimeError:
+                    pass  # their loop is already closed
+        self._loop = loop
+        self._heap = []
+        self._wakeup = asyncio.Event()
+        self._dispatcher = loop.create_task(self._dispatch())
+
+    def _admission_wait(self, priority: Priority, tokens: int) -> float:
+        reserve = self.RESERVES[priority]
+        return max(
+            self._backoff_until - time.monotonic(),
+            self.requests.wait_time(1, reserve, self.rate_scale),
+            self.tokens.wait_time(tokens, reserve, self.rate_scale),
+        )
+
+    async def _dispatch(self):
+        while True:
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            priority, _, deadline, tokens, future = self._heap[0]
+            if future.done() or time.monotonic() >= deadline:
+                # Caller gave up (deadline or cancellation)
+                heapq.heappop(self._heap)
+                self._queued[priority].dec()
+                continue
+
+            wait = self._admission_wait(priority, tokens)
+            if wait > 0:
+                # Sleep until quota refills, but wake early for new arrivals:
+                # a higher-priority call may now be at the head of the queue
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(
+                        self._wakeup.wait(),
+                        timeout=min(wait, max(0.0, deadline - time.monotonic()))
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._heap)
+            self._queued[priority].dec()
+            self.requests.consume(1)
+            self.tokens.consume(tokens)
+            future.set_result(None)
+
+
+def _fingerprint(text: str, kwargs: dict) -> str:
+    payload = text + "\0" + repr(sorted(kwargs.items())) if kwargs else text
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ScheduledLLM:
+    """
+    LLM facade that sends every call through the shared scheduler at a
+    fixed priority. Services use it exactly like GeminiLLM.
+    Identical concurrent generate/embed calls are coalesced via
+    `single_flight` before they are queued; streams are never shared.
+    """
+
+    def __init__(
+        self,
+        llm,
+        scheduler: LLMScheduler,
+        priority: Priority,
+        expected_output_tokens: int = 512,
+        single_flight: Optional[SingleFlight] = None
+    ):
+        self.llm = llm
+        self.scheduler = scheduler
+        self.priority = priority
+        self.expected_output_tokens = expected_output_tokens
+        self.single_flight = single_flight
+
+    async def generate(self, prompt: str, **kwargs) -> str:
+        if self.single_flight is None:
+            return await self._generate(prompt, **kwargs)
+        return await self.single_flight.do(
+            "generate",
+            _fingerprint(prompt, kwargs),
+            lambda: self._generate(prompt, **kwargs),
+            cacheable=lambda result: bool(result) and result != QUOTA_EXCEEDED_RESPONSE,
+        )
+
+    async def embed(self, text: str, **kwargs) -> list[float]:
+        if self.single_flight is None:
+            return await self._embed(text, **kwargs)
+        return await self.single_flight.do(
+            "embed",
+            _fingerprint(text, kwargs),
+            lambda: self._embed(text, **kwargs),
+        )
+
+    def _cost(self, prompt: str, kwargs: dict) -> int:
+        system_instruction = kwargs.get("system_instruction") or ""
+        return estimate_tokens(prompt) + estimate_tokens(system_instruction) + self.expected_output_tokens
+
+    async def _generate(self, prompt: str, **kwargs) -> str:
+        deadline = self.scheduler.deadline_for(self.priority)
+        cost = self._cost(prompt, kwargs)
+        while True:
+            try:
+                await self.scheduler.acquire(self.priority, cost, deadline)
+            except DeadlineExceededError as e:
+                logger.warning(str(e))
+                return QUOTA_EXCEEDED_RESPONSE
+            try:
+                result = await self.llm.generate(prompt, raise_quota_errors=True, **kwargs)
+            except QuotaExceededError:
+                self.scheduler.record_quota_error()
+                continue
+            self.scheduler.record_success()
+            return result
+
+    async def stream(self, prompt: str, **kwargs):
+        deadline = self.scheduler.deadline_for(self.priority)
+        cost = self._cost(prompt, kwargs)
+        while True:
+            try:
+                await self.scheduler.acquire(self.priority, cost, deadline)
+            except DeadlineExceededError as e:
+                logger.warning(str(e))
+                yield "Error generating response: Gemini API quota exceeded. Please try again later."
+                return
+            try:
+                async for chunk in self.llm.stream(prompt, raise_quota_errors=True, **kwargs):
+                    yield chunk
+            except QuotaExceededError:
+                # Only raised before the first chunk, so retrying is safe
+                self.scheduler.record_quota_error()
+                continue
+            self.scheduler.record_success()
+            return
+
+    async def _embed(self, text: str, **kwargs) -> list[float]:
+        deadline = self.scheduler.deadline_for(self.priority)
+        while True:
+            try:
+                await self.scheduler.acquire(self.priority, estimate_tokens(text), deadline)
+            except DeadlineExceededError as e:
+                logger.warning(str(e))
+                return []
+            try:
+                result = await self.llm.embed(text, raise_quota_errors=True, **kwargs)
+            except QuotaExceededError:
+                self.scheduler.record_quota_error()
+                continue
+            self.scheduler.record_success()
+            return result
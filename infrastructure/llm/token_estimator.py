@@ -0,0 +1,9 @@
+def estimate_tokens(text: str) -> int:
+    """
+    Fast local token estimate, no tokenizer round trip.
+    English prose averages ~4 characters per token; short words, numbers and
+    lab codes ("HbA1c", "LDL-C") tokenize denser, so word count is a floor.
+    """
+    if not text:
+        return 0
+    return max(len(text) // 4, int(len(text.split()) * 1.3)) + 1
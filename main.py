@@ -1,16 +1,44 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 from api.report_controller import router as report_router
-from api.chat_controller import router as chat_router
+from api.chat_controller import router as chat_router, redis_memory
 from api.health_controller import router as health_router
 from api.doctor_summary_controller import router as doctor_summary_router
 from api.user_profile_controller import router as user_profile_router
 from api.chat_document_controller import router as chat_document_router
 from api.account_controller import router as account_router
 from api.auth_controller import router as auth_router
+from api.metrics_controller import router as metrics_router
+from core.observability.metrics import metrics_middleware
+from core.observability.loop_monitor import loop_monitor
+from core.observability.tracing import tracer, tracing_middleware
+from db.user_loader import user_loader_middleware
 
-app = FastAPI(title="MediBot – AI Medical Assistant")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    loop_monitor.start()
+    # Index Redis chat sessions written before the per-user index (runs once)
+    backfill = asyncio.create_task(redis_memory.backfill_session_index())
+    try:
+        yield
+    finally:
+        backfill.cancel()
+        await loop_monitor.stop()
+        tracer.exporter.shutdown()
+
+
+app = FastAPI(title="MediBot – AI Medical Assistant", lifespan=lifespan)
+
+# Request-scoped memo of loaded user documents
+app.middleware("http")(user_loader_middleware)
+# Per-route latency histograms, exported on /metrics
+app.middleware("http")(metrics_middleware)
+# Request id + sampled trace spans (added last so it wraps everything else)
+app.middleware("http")(tracing_middleware)
 
 # Mount static files for uploaded profile photos
 uploads_dir = Path("uploads")
@@ -18,6 +46,7 @@ if uploads_dir.exists():
     app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
 app.include_router(health_router)
+app.include_router(metrics_router)
 app.include_router(chat_router)
 app.include_router(chat_document_router)
 app.include_router(report_router)
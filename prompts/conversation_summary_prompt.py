@@ -0,0 +1,30 @@
+def build_conversation_summary_prompt(previous_summary: str, messages_text: str) -> str:
+    """
+    Folds older chat turns into the running summary of a session.
+    Output is JSON: {"summary": "..."}.
+    """
+    previous = previous_summary.strip() if previous_summary else "None yet."
+
+    return f"""
+You are maintaining a running summary of a conversation between a user and
+MediBot, an AI medical assistant.
+
+SUMMARY SO FAR:
+{previous}
+
+OLDER MESSAGES TO FOLD IN:
+\"\"\"{messages_text}\"\"\"
+
+TASK:
+- Produce ONE updated summary covering the summary so far and these messages.
+- Keep: symptoms (with onset, duration, severity), medications and doses,
+  allergies, test results, advice already given, open questions.
+- Drop greetings, small talk and repeated information.
+- Write in third person ("The user reports ..."), at most 150 words.
+- Do NOT add facts that are not in the input. Do NOT diagnose.
+
+OUTPUT JSON FORMAT:
+{{
+  "summary": "string"
+}}
+"""
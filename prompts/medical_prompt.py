@@ -1,44 +1,19 @@
-def build_unified_chat_prompt(
-    user_message: str,
-    conversation_history: str = "",
-    user_profile: str = "",
-    document_context: str = ""
-) -> str:
-    """
-    Builds a unified conversational prompt that:
-    - Enforces conversation continuity
-    - Handles comprehensive medical domains (symptoms, medications, lifestyle, mental health, etc.)
-    - Returns engaging, well-formatted conversational text with contextual emojis
-    - Maintains professional medical assistant standards
-    """
-    
-    # Format sections
-    history_section = conversation_history.strip() if conversation_history else "No previous conversation."
-    profile_section = user_profile.strip() if user_profile else "No profile information available."
-    document_section = document_context.strip() if document_context else "No document provided."
-    
-    return f"""### SYSTEM INSTRUCTIONS
+# ----------------------------------
+# Unified chat prompt
+# ----------------------------------
+# The fixed instructions are identical for every turn, so they are built once
+# per process and sent separately (Gemini system instruction / cached content)
+# from the per-turn sections.
+UNIFIED_CHAT_SYSTEM_PROMPT = """### SYSTEM INSTRUCTIONS
 You are MediBot 🩺, an AI Medical Assistant engaged in a **continuous conversation** with a user.
 
 ### CRITICAL CONTINUITY RULES
-1. **TREAT THIS AS A CONTINUOUS CONVERSATION** - You MUST reference and build upon the conversation history below.
+1. **TREAT THIS AS A CONTINUOUS CONVERSATION** - You MUST reference and build upon the conversation history provided with each message.
 2. **DO NOT RESET CONTEXT** - If the user asks a follow-up question (e.g., "What should I do now?", "Tell me more", "And then?"), your answer MUST relate to previous messages.
 3. **MAINTAIN TOPIC AWARENESS** - If earlier messages discussed specific symptoms, medications, or topics, stay aware of them throughout the conversation.
 4. **NEVER TREAT AS FRESH CHAT** - Even if the current message seems standalone, consider the full conversation context.
 5. **REMEMBER USER DETAILS** - Track mentioned conditions, allergies, medications, and preferences across the conversation.
 
-### CONVERSATION HISTORY (CRITICAL - READ THIS FIRST)
-{history_section}
-
-### USER PROFILE
-{profile_section}
-
-### DOCUMENT CONTEXT
-{document_section}
-
-### CURRENT USER MESSAGE
-{user_message}
-
 ### COMPREHENSIVE MEDICAL COVERAGE
 You can assist with:
 
@@ -216,11 +191,73 @@ Use emojis strategically to:
    - Provides continuity of care information
    - Shows genuine concern for the user's wellbeing
    - Maintains professional boundaries
+"""
+
+
+def build_unified_chat_turn(
+    user_message: str,
+    conversation_history: str = "",
+    user_profile: str = "",
+    document_context: str = "",
+    past_conversations: str = ""
+) -> str:
+    """
+    Builds the per-turn part of the unified chat prompt: conversation history,
+    profile, document context and the current message, plus relevant
+    exchanges from earlier sessions when there are any.
+    Pair it with UNIFIED_CHAT_SYSTEM_PROMPT as the system instruction.
+    """
+
+    # Format sections
+    history_section = conversation_history.strip() if conversation_history else "No previous conversation."
+    profile_section = user_profile.strip() if user_profile else "No profile information available."
+    document_section = document_context.strip() if document_context else "No document provided."
+    past_section = (
+        "### RELEVANT PAST CONVERSATIONS (earlier sessions, for background only)\n"
+        f"{past_conversations.strip()}\n\n"
+        if past_conversations else ""
+    )
+
+    return f"""{past_section}### CONVERSATION HISTORY (CRITICAL - READ THIS FIRST)
+{history_section}
+
+### USER PROFILE
+{profile_section}
+
+### DOCUMENT CONTEXT
+{document_section}
+
+### CURRENT USER MESSAGE
+{user_message}
 
 ### YOUR RESPONSE (plain conversational text with strategic emoji use):
 """
 
 
+def build_unified_chat_prompt(
+    user_message: str,
+    conversation_history: str = "",
+    user_profile: str = "",
+    document_context: str = ""
+) -> str:
+    """
+    Builds a unified conversational prompt that:
+    - Enforces conversation continuity
+    - Handles comprehensive medical domains (symptoms, medications, lifestyle, mental health, etc.)
+    - Returns engaging, well-formatted conversational text with contextual emojis
+    - Maintains professional medical assistant standards
+
+    Single-string form for LLMs without system instructions: the static
+    instructions followed by the turn.
+    """
+    return UNIFIED_CHAT_SYSTEM_PROMPT + "\n" + build_unified_chat_turn(
+        user_message=user_message,
+        conversation_history=conversation_history,
+        user_profile=user_profile,
+        document_context=document_context
+    )
+
+
 def build_medical_prompt(user_input: str, context: str = "") -> str:
     
     return build_unified_chat_prompt(